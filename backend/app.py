@@ -9,9 +9,16 @@ sys.path.insert(0, os.path.abspath(os.path.dirname(os.path.dirname(__file__))))
 
 from backend.models import db
 from backend.routes import api
-from backend import utils
+from backend.cache import response_cache
+from backend.events import event_broker
+from backend.image_cache import image_cache
+from backend.scan_index import barcode_index
+from backend.serialization import FastJSONProvider
+from backend.scheduler import JobScheduler
+from backend.database import database_uri, engine_options, configure_engine
+from backend.metrics import request_metrics
+from backend.sharding import store_router
 import threading
-import time
 import logging
 from datetime import datetime
 
@@ -29,59 +36,103 @@ logger = logging.getLogger(__name__)
 
 # Create Flask app
 app = Flask(__name__, static_folder='../frontend/build')
+app.json = FastJSONProvider(app)
 CORS(app)
 
-# Configure app
+# Configure app; APP_ENV=production turns off debug mode and sizes pools for gunicorn workers
 import os
 base_dir = os.path.abspath(os.path.dirname(os.path.dirname(__file__)))
-app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{os.path.join(base_dir, "database/waste_management.db")}'
+app.config['APP_ENV'] = os.environ.get('APP_ENV', 'development')
+production = app.config['APP_ENV'] == 'production'
+app.config['DEBUG'] = not production
+
+# Configure database (SQLite by default, PostgreSQL or another server via DATABASE_URL)
+app.config['SQLALCHEMY_DATABASE_URI'] = database_uri(os.path.join(base_dir, 'database/waste_management.db'))
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(app.config['SQLALCHEMY_DATABASE_URI'], production)
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 
-# Configure mail
-app.config['MAIL_SERVER'] = 'smtp.example.com'
-app.config['MAIL_PORT'] = 587
-app.config['MAIL_USE_TLS'] = True
-app.config['MAIL_USERNAME'] = 'your-email@example.com'
-app.config['MAIL_PASSWORD'] = 'your-password'
-app.config['MAIL_DEFAULT_SENDER'] = 'your-email@example.com'
+# Configure instrumentation (?_profile=1 returns a cProfile summary instead of the response)
+app.config['PROFILING_ENABLED'] = os.environ.get('PROFILING_ENABLED', str(not production)).lower() == 'true'
+
+# Configure mail (point MAIL_SERVER/MAIL_PORT at a local SMTP sink for testing)
+app.config['MAIL_SERVER'] = os.environ.get('MAIL_SERVER', 'smtp.example.com')
+app.config['MAIL_PORT'] = int(os.environ.get('MAIL_PORT', 587))
+app.config['MAIL_USE_TLS'] = os.environ.get('MAIL_USE_TLS', 'true').lower() == 'true'
+app.config['MAIL_USERNAME'] = os.environ.get('MAIL_USERNAME', 'your-email@example.com')
+app.config['MAIL_PASSWORD'] = os.environ.get('MAIL_PASSWORD', 'your-password')
+app.config['MAIL_DEFAULT_SENDER'] = os.environ.get('MAIL_DEFAULT_SENDER', 'your-email@example.com')
+
+# Configure notification dispatcher
+app.config['NOTIFICATION_WORKERS'] = 4
+app.config['NOTIFICATION_CHUNK_SIZE'] = 500
+app.config['NOTIFICATION_MAX_ATTEMPTS'] = 3
+app.config['NOTIFICATION_RETRY_BACKOFF'] = 300  # Seconds, doubled per failed attempt
+app.config['NOTIFICATION_RATE_LIMITS'] = {'email': 10}  # Messages per second per channel
+
+# Configure response cache ('memory' per worker, or 'redis' shared across workers)
+app.config['CACHE_BACKEND'] = os.environ.get('CACHE_BACKEND', 'memory')
+app.config['CACHE_REDIS_URL'] = os.environ.get('CACHE_REDIS_URL', 'redis://localhost:6379/0')
+app.config['CACHE_DEFAULT_TTL'] = 30
+app.config['CACHE_MAX_ENTRIES'] = 1024
+
+# Configure the scan endpoints' per-worker LRU of scanned products
+app.config['SCAN_INDEX_MAX_ENTRIES'] = int(os.environ.get('SCAN_INDEX_MAX_ENTRIES', 50000))
+
+# Configure rendered barcode/QR image cache (memory LRU per worker, disk shared by all workers)
+app.config['IMAGE_CACHE_DIR'] = os.environ.get('IMAGE_CACHE_DIR', os.path.join(base_dir, 'database/image_cache'))
+app.config['IMAGE_CACHE_MAX_BYTES'] = 32 * 1024 * 1024
+app.config['IMAGE_CACHE_DISK_MAX_BYTES'] = int(os.environ.get('IMAGE_CACHE_DISK_MAX_BYTES', 256 * 1024 * 1024))
+
+# Configure label sheet rendering (processes per /products/labels request)
+app.config['LABEL_WORKERS'] = int(os.environ.get('LABEL_WORKERS', os.cpu_count() or 1))
+
+# Configure streaming exports (rows fetched per database round trip and written per chunk)
+app.config['EXPORT_BATCH_SIZE'] = 1000
+
+# Configure change events pushed to /api/events. Use 'redis' (CACHE_REDIS_URL) when several
+# processes serve or write, so every stream sees every commit; each open stream holds a server thread,
+# so under gunicorn the stream cap defaults to half of a worker's threads (see gunicorn.conf.py).
+app.config['EVENT_BACKEND'] = os.environ.get('EVENT_BACKEND', app.config['CACHE_BACKEND'])
+app.config['EVENT_HEARTBEAT'] = 15
+app.config['EVENT_STREAM_TIMEOUT'] = int(os.environ.get('EVENT_STREAM_TIMEOUT', 300))
+app.config['EVENT_MAX_STREAMS'] = int(os.environ['EVENT_MAX_STREAMS']) if os.environ.get('EVENT_MAX_STREAMS') else None
+
+# Configure stores. Every store's data lives in the main database unless STORE_DATABASE_DIR is set,
+# in which case each store gets its own SQLite file there and chain-wide reads fan out over the files.
+app.config['STORE_DATABASE_DIR'] = os.environ.get('STORE_DATABASE_DIR') or None
+app.config['STORE_FAN_OUT_WORKERS'] = int(os.environ.get('STORE_FAN_OUT_WORKERS', 8))
+
+# Configure background jobs; each job runs in one process at a time, whichever wins its lock.
+# Run `python -m backend.worker` next to gunicorn, or let `python app.py` run them in a thread.
+app.config['SCHEDULER_IN_PROCESS'] = os.environ.get('SCHEDULER_IN_PROCESS', str(not production)).lower() == 'true'
+app.config['SCHEDULER_POLL_INTERVAL'] = 30
+app.config['SCHEDULER_LOCK_TIMEOUT'] = 1800
+app.config['SCHEDULER_INTERVALS'] = {
+    'check_expiring_products': 3600,
+    'process_expired_products': 3600,
+    'process_pending_notifications': 900
+}
 
 # Initialize extensions
 db.init_app(app)
+with app.app_context():
+    configure_engine(db.engine)
+request_metrics.init_app(app)
+store_router.init_app(app)
 mail = Mail(app)
+response_cache.init_app(app)
+event_broker.init_app(app)
+image_cache.init_app(app)
+barcode_index.init_app(app)
 
 # Register blueprints
 app.register_blueprint(api, url_prefix='/api')
+app.register_blueprint(api, url_prefix='/api/stores/<store_code>', name='store_api')
 
 # Background tasks
 def run_scheduled_tasks():
-    """Run scheduled tasks in the background"""
-    while True:
-        try:
-            # Create a new application context for each iteration
-            with app.app_context():
-                logger.info("Running scheduled tasks...")
-                
-                # Check for expiring products
-                updated_products = utils.check_expiring_products()
-                if updated_products:
-                    logger.info(f"Updated {len(updated_products)} expiring products")
-                
-                # Process expired products
-                processed_records = utils.process_expired_products()
-                if processed_records:
-                    logger.info(f"Processed {len(processed_records)} expired products")
-                
-                # Process pending notifications
-                notification_results = utils.process_pending_notifications(mail)
-                if notification_results['sent'] > 0 or notification_results['failed'] > 0:
-                    logger.info(f"Processed notifications: {notification_results}")
-                
-                logger.info("Scheduled tasks completed")
-        except Exception as e:
-            logger.error(f"Error in scheduled tasks: {str(e)}")
-        
-        # Sleep for 1 hour
-        time.sleep(3600)
+    """Run due scheduled jobs in the background"""
+    JobScheduler(app).run_forever()
 
 # Serve frontend
 @app.route('/', defaults={'path': ''})
@@ -106,9 +157,10 @@ if __name__ == '__main__':
         db.create_all()
     
     # Start background task thread
-    scheduler_thread = threading.Thread(target=run_scheduled_tasks)
-    scheduler_thread.daemon = True
-    scheduler_thread.start()
+    if app.config['SCHEDULER_IN_PROCESS']:
+        scheduler_thread = threading.Thread(target=run_scheduled_tasks)
+        scheduler_thread.daemon = True
+        scheduler_thread.start()
     
-    # Run the app on port 5001
-    app.run(debug=True, host='0.0.0.0', port=5001)
+    # Run the app on port 5001 (use gunicorn with gunicorn.conf.py in production)
+    app.run(debug=app.config['DEBUG'], host='0.0.0.0', port=5001)
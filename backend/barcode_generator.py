@@ -1,28 +1,20 @@
 import os
 import barcode
-from barcode.writer import ImageWriter
+from barcode.writer import ImageWriter, SVGWriter
 import qrcode
+import qrcode.image.svg
 from datetime import datetime
 import json
 from io import BytesIO
 import base64
+from backend.image_cache import image_cache, image_key, MEDIA_TYPES
 
 class BarcodeGenerator:
     """Utility class for generating barcodes and QR codes for products"""
     
     @staticmethod
-    def generate_barcode(product_data, barcode_type='code128'):
-        """
-        Generate a barcode for a product
-        
-        Args:
-            product_data (dict): Product data to encode in the barcode
-            barcode_type (str): Type of barcode to generate (default: code128)
-            
-        Returns:
-            str: Base64 encoded image data
-        """
-        # Create barcode data
+    def barcode_payload(product_data):
+        """Return the normalized string encoded in a product's barcode"""
         if isinstance(product_data, dict):
             # Use barcode as the data if available, otherwise use product name
             barcode_data = product_data.get('barcode', product_data.get('name', str(datetime.now().timestamp())))
@@ -30,21 +22,97 @@ class BarcodeGenerator:
             barcode_data = str(product_data)
         
         # Ensure barcode data is valid
-        barcode_data = barcode_data.replace(' ', '_').upper()
+        return barcode_data.replace(' ', '_').upper()
+    
+    @staticmethod
+    def qr_payload(product_data):
+        """Return the string encoded in a product's QR code"""
+        # Convert product data to JSON string
+        if isinstance(product_data, dict):
+            return json.dumps(product_data)
+        return str(product_data)
+    
+    @staticmethod
+    def render_barcode(barcode_data, barcode_type='code128', image_format='png'):
+        """
+        Render an already normalized barcode payload, reusing cached images
         
-        # Create barcode
-        barcode_class = barcode.get_barcode_class(barcode_type)
-        barcode_instance = barcode_class(barcode_data, writer=ImageWriter())
+        Args:
+            barcode_data (str): Data to encode, e.g. from barcode_payload
+            barcode_type (str): Type of barcode to generate (default: code128)
+            image_format (str): 'png' or 'svg'
+            
+        Returns:
+            bytes: Image file contents
+        """
+        def render():
+            writer = SVGWriter() if image_format == 'svg' else ImageWriter()
+            barcode_class = barcode.get_barcode_class(barcode_type)
+            barcode_instance = barcode_class(barcode_data, writer=writer)
+            
+            buffer = BytesIO()
+            barcode_instance.write(buffer)
+            return buffer.getvalue()
         
-        # Save barcode to BytesIO
-        buffer = BytesIO()
-        barcode_instance.write(buffer)
+        key = image_key(barcode_type, barcode_data, image_format)
+        return image_cache.get_or_render(key, render)
+    
+    @staticmethod
+    def render_qr_code(qr_data, image_format='png'):
+        """
+        Render a QR code payload, reusing cached images
+        
+        Args:
+            qr_data (str): Data to encode, e.g. from qr_payload
+            image_format (str): 'png' or 'svg'
+            
+        Returns:
+            bytes: Image file contents
+        """
+        def render():
+            qr = qrcode.QRCode(
+                version=1,
+                error_correction=qrcode.constants.ERROR_CORRECT_L,
+                box_size=10,
+                border=4,
+                image_factory=qrcode.image.svg.SvgPathImage if image_format == 'svg' else None
+            )
+            qr.add_data(qr_data)
+            qr.make(fit=True)
+            
+            if image_format == 'svg':
+                img = qr.make_image()
+            else:
+                img = qr.make_image(fill_color="black", back_color="white")
+            
+            buffer = BytesIO()
+            img.save(buffer)
+            return buffer.getvalue()
         
-        # Convert to base64
-        buffer.seek(0)
-        image_data = base64.b64encode(buffer.read()).decode('utf-8')
+        key = image_key('qrcode', qr_data, image_format)
+        return image_cache.get_or_render(key, render)
+    
+    @staticmethod
+    def data_uri(image_bytes, image_format='png'):
+        """Encode image bytes as a base64 data URI"""
+        image_data = base64.b64encode(image_bytes).decode('utf-8')
+        return f"data:{MEDIA_TYPES[image_format]};base64,{image_data}"
+    
+    @staticmethod
+    def generate_barcode(product_data, barcode_type='code128'):
+        """
+        Generate a barcode for a product
         
-        return f"data:image/png;base64,{image_data}"
+        Args:
+            product_data (dict): Product data to encode in the barcode
+            barcode_type (str): Type of barcode to generate (default: code128)
+            
+        Returns:
+            str: Base64 encoded image data
+        """
+        barcode_data = BarcodeGenerator.barcode_payload(product_data)
+        image_bytes = BarcodeGenerator.render_barcode(barcode_data, barcode_type)
+        return BarcodeGenerator.data_uri(image_bytes)
     
     @staticmethod
     def generate_qr_code(product_data):
@@ -57,34 +125,9 @@ class BarcodeGenerator:
         Returns:
             str: Base64 encoded image data
         """
-        # Convert product data to JSON string
-        if isinstance(product_data, dict):
-            qr_data = json.dumps(product_data)
-        else:
-            qr_data = str(product_data)
-        
-        # Create QR code
-        qr = qrcode.QRCode(
-            version=1,
-            error_correction=qrcode.constants.ERROR_CORRECT_L,
-            box_size=10,
-            border=4,
-        )
-        qr.add_data(qr_data)
-        qr.make(fit=True)
-        
-        # Create image
-        img = qr.make_image(fill_color="black", back_color="white")
-        
-        # Save QR code to BytesIO
-        buffer = BytesIO()
-        img.save(buffer)
-        
-        # Convert to base64
-        buffer.seek(0)
-        image_data = base64.b64encode(buffer.read()).decode('utf-8')
-        
-        return f"data:image/png;base64,{image_data}"
+        qr_data = BarcodeGenerator.qr_payload(product_data)
+        image_bytes = BarcodeGenerator.render_qr_code(qr_data)
+        return BarcodeGenerator.data_uri(image_bytes)
     
     @staticmethod
     def decode_barcode(barcode_data):
@@ -105,12 +148,13 @@ class BarcodeGenerator:
         }
     
     @staticmethod
-    def generate_sample_barcodes(num_samples=5):
+    def generate_sample_barcodes(num_samples=5, inline=True):
         """
         Generate sample barcodes for demo purposes
         
         Args:
             num_samples (int): Number of sample barcodes to generate
+            inline (bool): Include base64 images; otherwise only the encoded payloads
             
         Returns:
             list: List of dictionaries containing sample product data and barcodes
@@ -130,14 +174,17 @@ class BarcodeGenerator:
                 'price': round(1.99 + i, 2)
             }
             
+            sample = {
+                'product_data': product_data,
+                'barcode_payload': BarcodeGenerator.barcode_payload(product_data),
+                'qr_payload': BarcodeGenerator.qr_payload(product_data)
+            }
+            
             # Generate barcode and QR code
-            barcode_image = BarcodeGenerator.generate_barcode(product_data)
-            qr_code_image = BarcodeGenerator.generate_qr_code(product_data)
+            if inline:
+                sample['barcode_image'] = BarcodeGenerator.generate_barcode(product_data)
+                sample['qr_code_image'] = BarcodeGenerator.generate_qr_code(product_data)
             
-            samples.append({
-                'product_data': product_data,
-                'barcode_image': barcode_image,
-                'qr_code_image': qr_code_image
-            })
+            samples.append(sample)
         
         return samples
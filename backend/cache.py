@@ -0,0 +1,263 @@
+from collections import OrderedDict
+from datetime import datetime
+from functools import wraps
+from flask import current_app, request
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from backend.models import db, TableVersion, dialect_insert
+import hashlib
+import pickle
+import threading
+import time
+
+DEFAULT_TTL = 30  # Seconds a cached response stays valid
+DEFAULT_MAX_ENTRIES = 1024
+
+class MemoryCacheBackend:
+    """In-process LRU cache with per-entry TTL; shared by the threads of one worker"""
+    
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            
+            value, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            
+            self._entries.move_to_end(key)
+            return value
+    
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + ttl)
+            self._entries.move_to_end(key)
+            
+            # Evict least recently used entries
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+    
+    def __len__(self):
+        return len(self._entries)
+
+class RedisCacheBackend:
+    """Redis (or any Redis-compatible server) backend shared by every gunicorn worker"""
+    
+    def __init__(self, url, prefix='wm-cache:'):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("CACHE_BACKEND 'redis' requires the redis package: pip install redis")
+        
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+    
+    def get(self, key):
+        value = self.client.get(self.prefix + key)
+        return pickle.loads(value) if value is not None else None
+    
+    def set(self, key, value, ttl):
+        self.client.set(self.prefix + key, pickle.dumps(value), ex=max(int(ttl), 1))
+    
+    def clear(self):
+        for key in self.client.scan_iter(f'{self.prefix}*'):
+            self.client.delete(key)
+    
+    def __len__(self):
+        return sum(1 for _ in self.client.scan_iter(f'{self.prefix}*'))
+
+class ResponseCache:
+    """
+    Caches GET responses keyed by route, normalized query args and the change
+    versions of the tables the route reads
+    
+    Versions live in the table_versions table and every write bumps the
+    versions of the tables it touched in its own transaction, so commits
+    made by other gunicorn workers or the job worker move them too. The
+    affected entries are never served again and age out of the backend. The
+    same key yields a strong ETag, letting clients revalidate with
+    If-None-Match and get a 304 without the route running at all.
+    """
+    
+    def __init__(self, backend=None, default_ttl=DEFAULT_TTL):
+        self.backend = backend or MemoryCacheBackend()
+        self.default_ttl = default_ttl
+        self.enabled = True
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+        self._lock = threading.Lock()
+    
+    def init_app(self, app):
+        """Configure the backend from CACHE_* settings"""
+        backend = app.config.get('CACHE_BACKEND', 'memory')
+        max_entries = app.config.get('CACHE_MAX_ENTRIES', DEFAULT_MAX_ENTRIES)
+        
+        if backend == 'redis':
+            self.backend = RedisCacheBackend(app.config.get('CACHE_REDIS_URL', 'redis://localhost:6379/0'))
+        elif backend == 'memory':
+            self.backend = MemoryCacheBackend(max_entries)
+        else:
+            raise ValueError(f"Unknown CACHE_BACKEND: {backend}")
+        
+        self.default_ttl = app.config.get('CACHE_DEFAULT_TTL', DEFAULT_TTL)
+        self.enabled = app.config.get('CACHE_ENABLED', True)
+    
+    def make_key(self, versions):
+        """Build the cache key for the current request from the given table versions"""
+        # Empty values mean "no filter" to every route, so they are dropped
+        args = sorted((key, value) for key, value in request.args.items(multi=True) if value != '')
+        query_string = '&'.join(f'{key}={value}' for key, value in args)
+        return f'{request.path}?{query_string}#{".".join(str(version) for version in versions)}'
+    
+    def make_etag(self, key):
+        """Derive a strong ETag from a cache key"""
+        # Responses carry days_until_expiry and default date ranges, so the day is part of the tag
+        today = datetime.utcnow().date().isoformat()
+        return hashlib.sha1(f'{today}|{key}'.encode('utf-8')).hexdigest()
+    
+    def cached(self, *tables, ttl=None, versions=None):
+        """
+        Decorator caching a GET view and answering If-None-Match until one of `tables` changes
+        
+        Args:
+            tables (str): Tables the view reads
+            ttl (int): Seconds a cached response stays valid, defaults to CACHE_DEFAULT_TTL
+            versions (callable): Returns the versions of `tables`, for views reading other databases
+        """
+        versions = versions or self.versions
+        
+        def decorator(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                key = self.make_key(versions(tables))
+                etag = self.make_etag(key)
+                
+                if request.if_none_match.contains(etag):
+                    self._count('not_modified')
+                    response = current_app.response_class(status=304)
+                    return self._add_validators(response, etag)
+                
+                if self.enabled:
+                    entry = self.backend.get(key)
+                    
+                    if entry is not None:
+                        self._count('hits')
+                        body, status, mimetype = entry
+                        response = current_app.response_class(body, status=status, mimetype=mimetype)
+                        return self._add_validators(response, etag)
+                    
+                    self._count('misses')
+                
+                response = current_app.make_response(view(*args, **kwargs))
+                
+                if response.status_code != 200 or response.is_streamed:
+                    return response
+                
+                if self.enabled:
+                    self.backend.set(key, (response.get_data(), response.status_code, response.mimetype),
+                                     ttl or self.default_ttl)
+                
+                return self._add_validators(response, etag)
+            return wrapper
+        return decorator
+    
+    def versions(self, tables):
+        """Return the committed change versions of `tables` in the current session's database"""
+        if not tables:
+            return []
+        rows = dict(
+            db.session.query(TableVersion.table_name, TableVersion.version)
+            .filter(TableVersion.table_name.in_(tables))
+        )
+        return [rows.get(table, 0) for table in tables]
+    
+    def clear(self):
+        """Drop every cached response and reset the counters"""
+        self.backend.clear()
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+            self.not_modified = 0
+    
+    def stats(self):
+        """Return hit/miss counters for this process"""
+        with self._lock:
+            hits, misses, not_modified = self.hits, self.misses, self.not_modified
+        
+        return {
+            'backend': type(self.backend).__name__,
+            'entries': len(self.backend),
+            'hits': hits,
+            'misses': misses,
+            'not_modified': not_modified,
+            'hit_ratio': hits / (hits + misses) if hits + misses > 0 else 0
+        }
+    
+    def _count(self, counter):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+    
+    def _add_validators(self, response, etag):
+        response.set_etag(etag)
+        # Let browsers keep the body but revalidate it on every use
+        response.headers['Cache-Control'] = 'no-cache'
+        return response
+
+response_cache = ResponseCache()
+
+def bump_versions(connection, tables):
+    """Increment the change versions of `tables` on a connection, as part of its transaction"""
+    table = TableVersion.__table__
+    statement = dialect_insert(table, connection).values([{'table_name': name, 'version': 1} for name in tables])
+    connection.execute(statement.on_conflict_do_update(
+        index_elements=[table.c.table_name],
+        set_={'version': table.c.version + 1}
+    ))
+
+# Track which tables a transaction writes, and bump their versions before it commits
+def _changed_tables(session):
+    return session.info.setdefault('changed_tables', set())
+
+@event.listens_for(Session, 'after_flush')
+def _track_flushed_tables(session, flush_context):
+    for instance in list(session.new) + list(session.dirty) + list(session.deleted):
+        table = getattr(instance, '__table__', None)
+        if table is not None:
+            _changed_tables(session).add(table.name)
+
+@event.listens_for(Session, 'do_orm_execute')
+def _track_executed_tables(orm_execute_state):
+    # Bulk INSERT/UPDATE/DELETE statements bypass the unit of work
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        table = getattr(orm_execute_state.statement, 'table', None)
+        if table is not None:
+            _changed_tables(orm_execute_state.session).add(table.name)
+
+@event.listens_for(Session, 'before_commit')
+def _bump_changed_tables(session):
+    # Pending changes are flushed after this hook; flush them now so their tables are known
+    session.flush()
+    tables = session.info.get('changed_tables')
+    if tables:
+        # Written on the session's own connection, so the bump commits or rolls back with the data
+        bump_versions(session.connection(), sorted(tables))
+
+@event.listens_for(Session, 'after_commit')
+def _forget_committed_tables(session):
+    session.info.pop('changed_tables', None)
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_rolled_back_tables(session):
+    session.info.pop('changed_tables', None)
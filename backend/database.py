@@ -0,0 +1,78 @@
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import QueuePool
+import os
+
+# Applied to every new SQLite connection. WAL lets readers run alongside the one writer,
+# and the busy timeout makes writers wait for each other instead of failing with "database is locked".
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,  # Milliseconds
+    'mmap_size': 256 * 1024 * 1024,
+    'temp_store': 'MEMORY'
+}
+
+def database_uri(default_sqlite_path):
+    """Return DATABASE_URL if set, else the SQLite file at default_sqlite_path"""
+    uri = os.environ.get('DATABASE_URL')
+    if not uri:
+        return f'sqlite:///{default_sqlite_path}'
+    
+    # Hosting providers often hand out the scheme SQLAlchemy 1.4 dropped
+    if uri.startswith('postgres://'):
+        uri = 'postgresql://' + uri[len('postgres://'):]
+    return uri
+
+def engine_options(uri, production=False):
+    """
+    Return SQLALCHEMY_ENGINE_OPTIONS tuned for the database backend
+    
+    Args:
+        uri (str): Database URI
+        production (bool): Size pools for gunicorn workers rather than the dev server
+    
+    Returns:
+        dict: Engine options
+    """
+    url = make_url(uri)
+    backend = url.get_backend_name()
+    
+    if backend == 'sqlite':
+        connect_args = {'timeout': SQLITE_PRAGMAS['busy_timeout'] / 1000, 'check_same_thread': False}
+        
+        # An in-memory database lives in a single connection (a StaticPool), so there is no pool to size
+        if url.database in (None, '', ':memory:') or url.query.get('mode') == 'memory':
+            return {'connect_args': connect_args}
+        
+        # Connections are cheap and there is a single writer; a small pool is plenty,
+        # and waiting on it for longer than the busy timeout only hides lock contention
+        return {
+            'poolclass': QueuePool,
+            'pool_size': int(os.environ.get('DB_POOL_SIZE', 5)),
+            'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW', 10)),
+            'pool_timeout': 10,
+            'connect_args': connect_args
+        }
+    
+    if backend == 'postgresql':
+        return {
+            'pool_size': int(os.environ.get('DB_POOL_SIZE', 10 if production else 5)),
+            'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW', 20 if production else 5)),
+            'pool_timeout': 30,
+            'pool_recycle': 1800,  # Drop connections before server or proxy idle timeouts do
+            'pool_pre_ping': True
+        }
+    
+    return {}
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    for name, value in SQLITE_PRAGMAS.items():
+        cursor.execute(f'PRAGMA {name}={value}')
+    cursor.close()
+
+def configure_engine(engine):
+    """Register per-connection settings on an engine; call before its first connection"""
+    if engine.dialect.name == 'sqlite':
+        event.listen(engine, 'connect', _set_sqlite_pragmas)
@@ -0,0 +1,357 @@
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+from backend.models import Product, WasteRecord, DiscountNotification
+import json
+import logging
+import queue
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HEARTBEAT = 15  # Seconds between keep-alive comments on an idle stream
+DEFAULT_STREAM_TIMEOUT = 300  # Seconds before a stream ends and the client reconnects, freeing the thread
+DEFAULT_MAX_STREAMS = None  # Open streams per worker; under gunicorn, half of its threads unless configured
+DEFAULT_QUEUE_SIZE = 1000  # Events buffered per slow client before it is told to resync
+MAX_EVENTS_PER_COMMIT = 200  # Larger changes of a table are announced as one invalidate event
+
+# Tables whose bulk statements are announced as invalidate events
+WATCHED_TABLES = {Product.__tablename__, WasteRecord.__tablename__, DiscountNotification.__tablename__}
+
+# Table each event type belongs to, for collapsing into invalidate events
+TABLE_BY_TYPE = {
+    'product.created': 'products',
+    'product.status': 'products',
+    'product.deleted': 'products',
+    'waste_record.created': 'waste_records',
+    'notification.status': 'discount_notifications'
+}
+
+class MemoryEventBackend:
+    """Fans events out to the streams of this process"""
+    
+    def __init__(self):
+        self._subscribers = set()
+        self._lock = threading.Lock()
+    
+    def publish(self, events):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscriber in subscribers:
+            subscriber.put(events)
+    
+    def subscribe(self, queue_size):
+        subscriber = _Subscription(queue_size, self._unsubscribe)
+        with self._lock:
+            self._subscribers.add(subscriber)
+        return subscriber
+    
+    def _unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+class RedisEventBackend:
+    """Redis pub/sub backend, so streams see the commits of every worker and of the job worker"""
+    
+    def __init__(self, url, channel='wm-events'):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("EVENT_BACKEND 'redis' requires the redis package: pip install redis")
+        
+        self.client = redis.Redis.from_url(url)
+        self.channel = channel
+    
+    def publish(self, events):
+        self.client.publish(self.channel, json.dumps(events, default=str))
+    
+    def subscribe(self, queue_size):
+        pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe(self.channel)
+        return _RedisSubscription(pubsub)
+
+class _Subscription:
+    def __init__(self, queue_size, on_close):
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._on_close = on_close
+        self.overflowed = False
+    
+    def put(self, events):
+        try:
+            self._queue.put_nowait(events)
+        except queue.Full:
+            # The client fell behind; it refetches instead of receiving a partial history
+            self.overflowed = True
+    
+    def get(self, timeout):
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+    
+    def close(self):
+        self._on_close(self)
+
+class _RedisSubscription:
+    def __init__(self, pubsub):
+        self._pubsub = pubsub
+        self.overflowed = False
+    
+    def get(self, timeout):
+        message = self._pubsub.get_message(timeout=timeout)
+        return json.loads(message['data']) if message else None
+    
+    def close(self):
+        self._pubsub.close()
+
+def format_event(event_type, data, event_id=None):
+    """Encode one server-sent event"""
+    lines = []
+    if event_id is not None:
+        lines.append(f'id: {event_id}')
+    lines.append(f'event: {event_type}')
+    lines.append(f'data: {json.dumps(data, separators=(",", ":"), default=str)}')
+    return '\n'.join(lines) + '\n\n'
+
+class EventBroker:
+    """
+    Publishes compact change events of committed transactions to server-sent event streams
+    
+    Session hooks collect product status changes, new waste records and
+    notification status changes while a transaction flushes, and publish
+    them once it commits, so routes and scheduler jobs emit events without
+    any code of their own and rolled back work is never announced. The
+    memory backend reaches the streams of one process; use EVENT_BACKEND
+    'redis' when gunicorn runs several workers or jobs run in
+    `python -m backend.worker`.
+    """
+    
+    def __init__(self, backend=None):
+        self.backend = backend or MemoryEventBackend()
+        self.heartbeat = DEFAULT_HEARTBEAT
+        self.stream_timeout = DEFAULT_STREAM_TIMEOUT
+        self.max_streams = DEFAULT_MAX_STREAMS
+        self.queue_size = DEFAULT_QUEUE_SIZE
+        self.published = 0
+        self._open_streams = 0
+        self._lock = threading.Lock()
+    
+    def init_app(self, app):
+        """Configure the backend and stream limits from EVENT_* settings"""
+        backend = app.config.get('EVENT_BACKEND', 'memory')
+        
+        if backend == 'redis':
+            self.backend = RedisEventBackend(app.config.get('CACHE_REDIS_URL', 'redis://localhost:6379/0'))
+        elif backend == 'memory':
+            self.backend = MemoryEventBackend()
+        else:
+            raise ValueError(f"Unknown EVENT_BACKEND: {backend}")
+        
+        self.heartbeat = app.config.get('EVENT_HEARTBEAT', DEFAULT_HEARTBEAT)
+        self.stream_timeout = app.config.get('EVENT_STREAM_TIMEOUT', DEFAULT_STREAM_TIMEOUT)
+        self.max_streams = app.config.get('EVENT_MAX_STREAMS', DEFAULT_MAX_STREAMS)
+    
+    def limit_to_threads(self, threads):
+        """
+        Cap the streams of a worker serving requests on `threads` threads
+        
+        Each stream holds a thread until it ends, so an unconfigured cap becomes half
+        of the threads, and no cap may leave API requests without a free thread.
+        """
+        max_streams = self.max_streams if self.max_streams is not None else threads // 2
+        self.max_streams = min(max_streams, max(threads - 1, 0))
+    
+    def publish(self, events):
+        """Send a committed transaction's events to every open stream"""
+        if not events:
+            return
+        self.backend.publish(events)
+        with self._lock:
+            self.published += len(events)
+    
+    def open_stream(self, store_id=None):
+        """
+        Return the SSE body for one client, or None if this worker has no stream slot free
+        
+        Args:
+            store_id (int): Only pass events of this store (and events without a store)
+        """
+        with self._lock:
+            if self.max_streams is not None and self._open_streams >= self.max_streams:
+                return None
+            self._open_streams += 1
+        
+        try:
+            subscription = self.backend.subscribe(self.queue_size)
+        except Exception:
+            self._release()
+            raise
+        
+        return EventStream(self, subscription, store_id)
+    
+    def stats(self):
+        return {
+            'open_streams': self._open_streams,
+            'max_streams': self.max_streams,
+            'published': self.published
+        }
+    
+    def _release(self):
+        with self._lock:
+            self._open_streams -= 1
+
+class EventStream:
+    """SSE response body of one client; closing it, even before the first chunk, frees its slot"""
+    
+    def __init__(self, broker, subscription, store_id):
+        self.broker = broker
+        self.subscription = subscription
+        self.store_id = store_id
+        self._closed = False
+    
+    def __iter__(self):
+        return self._events()
+    
+    def close(self):
+        if not self._closed:
+            self._closed = True
+            self.subscription.close()
+            self.broker._release()
+    
+    def _events(self):
+        deadline = time.monotonic() + self.broker.stream_timeout
+        event_id = 0
+        
+        try:
+            # Clients load their data on `ready`, so nothing committed before the subscription is missed
+            yield f'retry: 3000\n{format_event("ready", {})}'
+            
+            while time.monotonic() < deadline:
+                timeout = min(self.broker.heartbeat, max(deadline - time.monotonic(), 0))
+                events = self.subscription.get(timeout=timeout)
+                
+                if self.subscription.overflowed:
+                    yield format_event('resync', {})
+                    return
+                
+                if events is None:
+                    yield ': keep-alive\n\n'
+                    continue
+                
+                chunk = []
+                for change in events:
+                    if self.store_id is not None and change.get('store_id') not in (None, self.store_id):
+                        continue
+                    event_id += 1
+                    chunk.append(format_event(change['type'], change, event_id))
+                if chunk:
+                    yield ''.join(chunk)
+        finally:
+            self.close()
+
+event_broker = EventBroker()
+
+# Collect the changes a transaction writes and publish them once it commits
+def _pending_events(session):
+    return session.info.setdefault('pending_events', [])
+
+def _status_change(instance):
+    """Return (old, new) status if the instance's status changed in this flush, else None"""
+    history = inspect(instance).attrs.status.history
+    if not history.has_changes():
+        return None
+    old = history.deleted[0] if history.deleted else None
+    return old, instance.status
+
+@event.listens_for(Session, 'after_flush')
+def _track_flushed_events(session, flush_context):
+    events = []
+    
+    for instance in session.new:
+        if isinstance(instance, Product):
+            events.append({'type': 'product.created', 'id': instance.id, 'store_id': instance.store_id,
+                           'status': instance.status})
+        elif isinstance(instance, WasteRecord):
+            events.append({'type': 'waste_record.created', 'id': instance.id, 'product_id': instance.product_id,
+                           'store_id': instance.store_id, 'quantity': instance.quantity,
+                           'waste_type': instance.waste_type, 'recyclable': instance.recyclable})
+        elif isinstance(instance, DiscountNotification):
+            events.append({'type': 'notification.status', 'id': instance.id, 'customer_id': instance.customer_id,
+                           'product_id': instance.product_id, 'status': instance.status})
+    
+    for instance in session.dirty:
+        if isinstance(instance, Product):
+            change = _status_change(instance)
+            if change:
+                events.append({'type': 'product.status', 'id': instance.id, 'store_id': instance.store_id,
+                               'old_status': change[0], 'status': change[1],
+                               'discounted_price': instance.discounted_price})
+        elif isinstance(instance, DiscountNotification):
+            change = _status_change(instance)
+            if change:
+                events.append({'type': 'notification.status', 'id': instance.id,
+                               'customer_id': instance.customer_id, 'product_id': instance.product_id,
+                               'status': change[1]})
+    
+    for instance in session.deleted:
+        if isinstance(instance, Product):
+            events.append({'type': 'product.deleted', 'id': instance.id, 'store_id': instance.store_id})
+    
+    if events:
+        _pending_events(session).extend(events)
+
+@event.listens_for(Session, 'do_orm_execute')
+def _track_bulk_events(orm_execute_state):
+    if not (orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    
+    # ORM statements carry an annotated copy of the table, so compare by name
+    table_name = getattr(getattr(orm_execute_state.statement, 'table', None), 'name', None)
+    if table_name not in WATCHED_TABLES:
+        return
+    
+    # The notification dispatcher writes statuses as a bulk UPDATE by primary key
+    parameters = orm_execute_state.parameters
+    if (table_name == DiscountNotification.__tablename__ and orm_execute_state.is_update
+            and isinstance(parameters, list) and all('id' in row and 'status' in row for row in parameters)):
+        _pending_events(orm_execute_state.session).extend(
+            {'type': 'notification.status', 'id': row['id'], 'status': row['status']} for row in parameters
+        )
+        return
+    
+    # Other bulk statements do not say which rows they touch
+    _pending_events(orm_execute_state.session).append({'type': 'invalidate', 'table': table_name})
+
+def _compact(events):
+    """Collapse large or repeated changes into one invalidate event per table"""
+    counts = {}
+    for change in events:
+        counts[change['type']] = counts.get(change['type'], 0) + 1
+    
+    tables = {change['table'] for change in events if change['type'] == 'invalidate'}
+    for change in events:
+        if counts[change['type']] > MAX_EVENTS_PER_COMMIT and change['type'] != 'invalidate':
+            tables.add(TABLE_BY_TYPE[change['type']])
+    
+    compacted = [
+        change for change in events
+        if change['type'] != 'invalidate' and TABLE_BY_TYPE[change['type']] not in tables
+    ]
+    compacted.extend({'type': 'invalidate', 'table': table} for table in sorted(tables))
+    return compacted
+
+@event.listens_for(Session, 'after_commit')
+def _publish_committed_events(session):
+    events = session.info.pop('pending_events', None)
+    if not events:
+        return
+    
+    # The transaction is already committed; a broken event channel must not fail the request
+    try:
+        event_broker.publish(_compact(events))
+    except Exception as e:
+        logger.error(f"Could not publish change events: {e}")
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_rolled_back_events(session):
+    session.info.pop('pending_events', None)
@@ -0,0 +1,69 @@
+from flask import current_app
+from backend.models import db
+import csv
+import io
+import zlib
+
+EXPORT_BATCH_SIZE = 1000  # Rows fetched from the cursor and written per chunk
+GZIP_LEVEL = 6
+MEDIA_TYPES = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv'
+}
+
+def stream_rows(query, serializer, fields, output_format, compress=False, batch_size=EXPORT_BATCH_SIZE):
+    """
+    Yield `query` rows encoded as NDJSON or CSV, one chunk per fetched batch
+    
+    Rows are read with yield_per, so only one batch is held in memory however
+    large the table is. Must run inside the request's app context
+    (stream_with_context) since the query uses its session.
+    
+    Args:
+        query: Row query from RowSpec.query
+        serializer: Function from RowSpec.serializer turning a row into a dict
+        fields (list): Field names selected by the query, in order
+        output_format (str): 'ndjson' or 'csv'
+        compress (bool): Gzip the stream, flushing after every chunk
+        batch_size (int): Rows per database fetch and per chunk
+    
+    Yields:
+        bytes: Encoded (and optionally compressed) chunk
+    """
+    if output_format == 'csv':
+        chunks = _csv_chunks(query, serializer, fields, batch_size)
+    else:
+        chunks = _ndjson_chunks(query, serializer, batch_size)
+    
+    if not compress:
+        yield from chunks
+        return
+    
+    # wbits=31 writes a gzip header; a sync flush per chunk keeps bytes flowing to the client
+    compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        yield compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+    yield compressor.flush()
+
+def _batches(query, batch_size):
+    result = db.session.execute(query.statement.execution_options(yield_per=batch_size))
+    return result.partitions()
+
+def _ndjson_chunks(query, serializer, batch_size):
+    dumps = current_app.json.dumps
+    for batch in _batches(query, batch_size):
+        yield ''.join(dumps(serializer(row)) + '\n' for row in batch).encode('utf-8')
+
+def _csv_chunks(query, serializer, fields, batch_size):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    
+    # The header goes out before the first fetch, so the first byte is immediate
+    writer.writerow(fields)
+    yield buffer.getvalue().encode('utf-8')
+    
+    for batch in _batches(query, batch_size):
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(serializer(row).values() for row in batch)
+        yield buffer.getvalue().encode('utf-8')
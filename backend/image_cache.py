@@ -0,0 +1,200 @@
+from collections import OrderedDict
+import hashlib
+import json
+import os
+import tempfile
+import threading
+
+DEFAULT_MAX_BYTES = 32 * 1024 * 1024  # Memory tier budget
+DEFAULT_DISK_MAX_BYTES = 256 * 1024 * 1024  # Disk tier budget, shared by every worker
+DISK_PRUNE_TARGET = 0.9  # Pruning deletes down to this fraction of the budget, so it runs rarely
+MEDIA_TYPES = {
+    'png': 'image/png',
+    'svg': 'image/svg+xml'
+}
+
+def image_key(code_type, payload, image_format, options=None):
+    """Return the content address of a rendered code"""
+    spec = json.dumps([code_type, payload, image_format, options or {}], sort_keys=True)
+    return hashlib.sha256(spec.encode('utf-8')).hexdigest()
+
+class ImageCache:
+    """
+    Two-tier cache of rendered barcode and QR images keyed by image_key
+    
+    The memory tier is an LRU bounded by total bytes and shared by the threads
+    of one worker; the optional disk tier is shared by every worker and
+    survives restarts. A key fully determines the image, so entries never
+    need invalidating. The disk tier is bounded too: reads refresh a file's
+    mtime, and once the directory outgrows its budget the least recently
+    used files are deleted.
+    """
+    
+    def __init__(self, directory=None, max_bytes=DEFAULT_MAX_BYTES, disk_max_bytes=DEFAULT_DISK_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.disk_max_bytes = disk_max_bytes
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.disk_evictions = 0
+        self._entries = OrderedDict()
+        self._size = 0
+        self._disk_size = None  # Estimate; other workers write too, so pruning measures the directory
+        self._lock = threading.Lock()
+        self._prune_lock = threading.Lock()
+    
+    def init_app(self, app):
+        """Configure the tiers from IMAGE_CACHE_* settings"""
+        self.directory = app.config.get('IMAGE_CACHE_DIR')
+        self.max_bytes = app.config.get('IMAGE_CACHE_MAX_BYTES', DEFAULT_MAX_BYTES)
+        self.disk_max_bytes = app.config.get('IMAGE_CACHE_DISK_MAX_BYTES', DEFAULT_DISK_MAX_BYTES)
+    
+    def get_or_render(self, key, render):
+        """Return the cached bytes for key, calling render() and storing its result on a miss"""
+        data = self._get_memory(key)
+        if data is not None:
+            self._count('hits')
+            return data
+        
+        data = self._read_disk(key)
+        if data is not None:
+            self._count('disk_hits')
+        else:
+            self._count('misses')
+            data = render()
+            self._write_disk(key, data)
+        
+        self._set_memory(key, data)
+        return data
+    
+    def clear(self):
+        """Drop the memory tier and reset the counters; the disk tier is left in place"""
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+            self.hits = 0
+            self.disk_hits = 0
+            self.misses = 0
+            self.disk_evictions = 0
+    
+    def stats(self):
+        """Return hit/miss counters for this process"""
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self._size,
+                'hits': self.hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'disk_bytes': self._disk_size,
+                'disk_evictions': self.disk_evictions
+            }
+    
+    def _count(self, counter):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+    
+    def _get_memory(self, key):
+        with self._lock:
+            data = self._entries.get(key)
+            if data is not None:
+                self._entries.move_to_end(key)
+            return data
+    
+    def _set_memory(self, key, data):
+        if len(data) > self.max_bytes:
+            return
+        
+        with self._lock:
+            if key in self._entries:
+                return
+            self._entries[key] = data
+            self._size += len(data)
+            
+            # Evict least recently used images
+            while self._size > self.max_bytes:
+                evicted_key, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+    
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], key)
+    
+    def _read_disk(self, key):
+        if not self.directory:
+            return None
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            # Mark the file as recently used for pruning
+            os.utime(path)
+            return data
+        except OSError:
+            return None
+    
+    def _write_disk(self, key, data):
+        if not self.directory:
+            return
+        
+        path = self._path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            
+            # Write under a temporary name so concurrent workers never read a partial file
+            fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(temp_path, path)
+        except OSError as e:
+            print(f"Error writing image cache entry {key}: {str(e)}")
+            return
+        
+        with self._lock:
+            if self._disk_size is not None:
+                self._disk_size += len(data)
+            over_budget = self._disk_size is None or self._disk_size > self.disk_max_bytes
+        
+        if over_budget:
+            self._prune_disk()
+    
+    def _prune_disk(self):
+        """Measure the disk tier and delete least recently used files until it is back under budget"""
+        # One thread per worker prunes; the others keep serving
+        if not self._prune_lock.acquire(blocking=False):
+            return
+        
+        try:
+            files = []
+            for root, _, names in os.walk(self.directory):
+                for name in names:
+                    path = os.path.join(root, name)
+                    try:
+                        stat = os.stat(path)
+                    except OSError:
+                        continue
+                    files.append((stat.st_mtime, stat.st_size, path))
+            
+            size = sum(file_size for _, file_size, _ in files)
+            evicted = 0
+            if size > self.disk_max_bytes:
+                target = self.disk_max_bytes * DISK_PRUNE_TARGET
+                files.sort()
+                for _, file_size, path in files:
+                    if size <= target:
+                        break
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        # Already removed by another worker
+                        pass
+                    size -= file_size
+                    evicted += 1
+            
+            with self._lock:
+                self._disk_size = size
+                self.disk_evictions += evicted
+        finally:
+            self._prune_lock.release()
+
+image_cache = ImageCache()
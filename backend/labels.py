@@ -0,0 +1,238 @@
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from io import BytesIO
+from PIL import Image, ImageDraw, ImageFont
+from backend.barcode_generator import BarcodeGenerator
+from backend.image_cache import image_cache
+import multiprocessing
+import os
+import tempfile
+import threading
+import uuid
+import zipfile
+
+DEFAULT_WORKERS = os.cpu_count() or 1
+SERIAL_THRESHOLD = 50  # Smaller jobs render in-process; starting a pool costs more than it saves
+RENDER_CHUNK_SIZE = 16  # Labels handed to a pool worker at a time
+PDF_BATCH_SIZE = 100  # Pages decoded and appended to the PDF at a time
+PDF_RESOLUTION = 200.0
+MAX_TRACKED_JOBS = 100
+
+# Pool workers start from a clean process rather than a fork of a threaded server worker,
+# whose copied database pool and held locks could deadlock the child
+POOL_CONTEXT = multiprocessing.get_context(
+    'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+)
+
+LABEL_WIDTH = 800
+LABEL_HEIGHT = 400
+LABEL_MARGIN = 20
+LABEL_TEXT_HEIGHT = 90
+
+def label_fields(product):
+    """Return the product fields printed on a label"""
+    return {
+        'id': product.id,
+        'name': product.name,
+        'barcode': product.barcode,
+        'category': product.category,
+        'price': product.price,
+        'discounted_price': product.discounted_price,
+        'expiry_date': product.expiry_date.isoformat()
+    }
+
+def render_label(product, code_type='barcode'):
+    """
+    Render one printable label as a grayscale PNG
+    
+    Args:
+        product (dict): Fields from label_fields
+        code_type (str): 'barcode', 'qrcode' or 'both'
+    
+    Returns:
+        bytes: PNG file contents
+    """
+    label = Image.new('L', (LABEL_WIDTH, LABEL_HEIGHT), 255)
+    draw = ImageDraw.Draw(label)
+    font = ImageFont.load_default()
+    
+    price = f"${product['price']:.2f}"
+    if product.get('discounted_price') is not None:
+        price = f"${product['discounted_price']:.2f} (was {price})"
+    
+    lines = [product['name'], f"{product['category']}  |  {price}", f"Best before {product['expiry_date']}"]
+    for i, line in enumerate(lines):
+        draw.text((LABEL_MARGIN, LABEL_MARGIN + i * 22), line, fill=0, font=font)
+    
+    codes = []
+    if code_type in ('barcode', 'both'):
+        codes.append(BarcodeGenerator.render_barcode(BarcodeGenerator.barcode_payload(product)))
+    if code_type in ('qrcode', 'both'):
+        codes.append(BarcodeGenerator.render_qr_code(BarcodeGenerator.qr_payload(product)))
+    
+    # Share the space below the text evenly between the codes
+    slot_width = (LABEL_WIDTH - LABEL_MARGIN * (len(codes) + 1)) // len(codes)
+    slot_height = LABEL_HEIGHT - LABEL_TEXT_HEIGHT - LABEL_MARGIN
+    for i, code in enumerate(codes):
+        image = Image.open(BytesIO(code)).convert('L')
+        image.thumbnail((slot_width, slot_height))
+        x = LABEL_MARGIN + i * (slot_width + LABEL_MARGIN) + (slot_width - image.width) // 2
+        label.paste(image, (x, LABEL_TEXT_HEIGHT))
+    
+    buffer = BytesIO()
+    label.save(buffer, 'PNG')
+    return buffer.getvalue()
+
+def _render_label_task(args):
+    product, code_type = args
+    return render_label(product, code_type)
+
+def _init_pool_worker(cache_directory, cache_max_bytes):
+    # Workers started with spawn/forkserver share the parent's disk tier
+    image_cache.directory = cache_directory
+    image_cache.max_bytes = cache_max_bytes
+
+def render_labels(products, code_type='barcode', max_workers=DEFAULT_WORKERS):
+    """
+    Yield rendered label PNGs in input order, across a process pool for large jobs
+    
+    Pillow and the barcode writers hold the GIL, so threads would not help;
+    each pool worker renders whole chunks of labels instead.
+    """
+    tasks = [(product, code_type) for product in products]
+    
+    if max_workers <= 1 or len(tasks) < SERIAL_THRESHOLD:
+        for task in tasks:
+            yield _render_label_task(task)
+        return
+    
+    with ProcessPoolExecutor(max_workers=max_workers, mp_context=POOL_CONTEXT, initializer=_init_pool_worker,
+                             initargs=(image_cache.directory, image_cache.max_bytes)) as executor:
+        for png in executor.map(_render_label_task, tasks, chunksize=RENDER_CHUNK_SIZE):
+            yield png
+
+class _ChunkWriter:
+    """Write-only file object collecting bytes for a streaming response"""
+    
+    def __init__(self):
+        self.chunks = []
+    
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+    
+    def flush(self):
+        pass
+    
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+class LabelJob:
+    """Progress of one label sheet request"""
+    
+    def __init__(self, total, output_format, code_type):
+        self.id = uuid.uuid4().hex
+        self.total = total
+        self.rendered = 0
+        self.output_format = output_format
+        self.code_type = code_type
+        self.status = 'running'
+        self.error = None
+        self.started_at = datetime.utcnow()
+        self.finished_at = None
+    
+    def to_dict(self):
+        elapsed = ((self.finished_at or datetime.utcnow()) - self.started_at).total_seconds()
+        return {
+            'id': self.id,
+            'status': self.status,
+            'total': self.total,
+            'rendered': self.rendered,
+            'progress': self.rendered / self.total if self.total else 1.0,
+            'format': self.output_format,
+            'code_type': self.code_type,
+            'labels_per_second': self.rendered / elapsed if elapsed > 0 else None,
+            'error': self.error,
+            'started_at': self.started_at.isoformat(),
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
+
+# Jobs of this process, most recent last
+_jobs = {}
+_jobs_lock = threading.Lock()
+
+def create_job(total, output_format, code_type):
+    """Register a label job so its progress can be polled"""
+    job = LabelJob(total, output_format, code_type)
+    with _jobs_lock:
+        _jobs[job.id] = job
+        while len(_jobs) > MAX_TRACKED_JOBS:
+            _jobs.pop(next(iter(_jobs)))
+    return job
+
+def get_job(job_id):
+    """Return a label job of this process, or None"""
+    with _jobs_lock:
+        return _jobs.get(job_id)
+
+def stream_labels(job, products, max_workers=DEFAULT_WORKERS):
+    """Yield the label sheet for `products` as ZIP or PDF bytes, updating `job` as labels are rendered"""
+    try:
+        if job.output_format == 'zip':
+            yield from _stream_zip(job, products, max_workers)
+        else:
+            yield from _stream_pdf(job, products, max_workers)
+        job.status = 'done'
+    except Exception as e:
+        job.status = 'failed'
+        job.error = str(e)
+        raise
+    finally:
+        job.finished_at = datetime.utcnow()
+
+def _stream_zip(job, products, max_workers):
+    # A write-only stream makes zipfile emit data descriptors, so entries go out as they are rendered
+    writer = _ChunkWriter()
+    with zipfile.ZipFile(writer, 'w', zipfile.ZIP_STORED) as archive:
+        for product, png in zip(products, render_labels(products, job.code_type, max_workers)):
+            archive.writestr(f"label_{product['id']}_{product['barcode']}.png", png)
+            job.rendered += 1
+            yield writer.drain()
+    yield writer.drain()
+
+def _stream_pdf(job, products, max_workers):
+    # PDF offsets are only known once every page is written, so pages are appended
+    # to a temporary file in batches and the file is streamed at the end
+    fd, path = tempfile.mkstemp(suffix='.pdf')
+    os.close(fd)
+    
+    try:
+        batch = []
+        first = True
+        
+        def append_pages(batch, first):
+            images = [Image.open(BytesIO(png)) for png in batch]
+            images[0].save(path, 'PDF', resolution=PDF_RESOLUTION, save_all=True,
+                           append_images=images[1:], append=not first)
+        
+        for png in render_labels(products, job.code_type, max_workers):
+            batch.append(png)
+            job.rendered += 1
+            if len(batch) >= PDF_BATCH_SIZE:
+                append_pages(batch, first)
+                batch = []
+                first = False
+        
+        if batch:
+            append_pages(batch, first)
+        
+        with open(path, 'rb') as f:
+            while True:
+                chunk = f.read(65536)
+                if not chunk:
+                    break
+                yield chunk
+    finally:
+        os.remove(path)
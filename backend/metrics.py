@@ -0,0 +1,192 @@
+from collections import Counter
+from flask import current_app, g, has_request_context, jsonify, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+import cProfile
+import io
+import logging
+import pstats
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 250)
+QUERY_LATENCY_BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0)
+N_PLUS_ONE_THRESHOLD = 10  # Executions of one statement in one request that flag an N+1 pattern
+PROFILE_LINES = 40
+
+class Histogram:
+    """Cumulative Prometheus-style histogram, one series per label tuple"""
+    
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.series = {}
+    
+    def observe(self, labels, value):
+        counts, total = self.series.get(labels, (None, 0.0))
+        if counts is None:
+            counts = [0] * (len(self.buckets) + 1)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                counts[i] += 1
+        counts[-1] += 1
+        self.series[labels] = (counts, total + value)
+    
+    def render(self, name, label_names):
+        lines = []
+        for labels, (counts, total) in sorted(self.series.items()):
+            base = _labels(label_names, labels)
+            for bound, count in zip(self.buckets, counts):
+                lines.append(f'{name}_bucket{{{base},le="{bound}"}} {count}')
+            lines.append(f'{name}_bucket{{{base},le="+Inf"}} {counts[-1]}')
+            lines.append(f'{name}_sum{{{base}}} {total}')
+            lines.append(f'{name}_count{{{base}}} {counts[-1]}')
+        return lines
+
+def _labels(names, values):
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for value in values)
+    return ','.join(f'{name}="{value}"' for name, value in zip(names, escaped))
+
+class RequestMetrics:
+    """
+    Per-route latency and SQL statement instrumentation for one worker process
+    
+    Requests are timed from before_request to after_request; SQL statements
+    are timed with engine cursor events and attributed to the request running
+    on the same thread. A statement executed N_PLUS_ONE_THRESHOLD times or
+    more within one request is logged and counted as an N+1 pattern. Streamed
+    response bodies run after after_request and are not included.
+    """
+    
+    def __init__(self):
+        self.request_latency = Histogram(LATENCY_BUCKETS)
+        self.request_queries = Histogram(QUERY_COUNT_BUCKETS)
+        self.query_latency = Histogram(QUERY_LATENCY_BUCKETS)
+        self.n_plus_one = Counter()
+        self.started_at = time.time()
+        self._lock = threading.Lock()
+        self._engine_hooked = False
+    
+    def init_app(self, app):
+        """Register request hooks and the engine-wide statement listeners"""
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        
+        if not self._engine_hooked:
+            event.listen(Engine, 'before_cursor_execute', self._before_cursor_execute)
+            event.listen(Engine, 'after_cursor_execute', self._after_cursor_execute)
+            self._engine_hooked = True
+    
+    def _before_request(self):
+        g.metrics_started = time.perf_counter()
+        g.metrics_queries = Counter()
+        g.metrics_query_time = 0.0
+        
+        if request.args.get('_profile') == '1' and _profiling_allowed():
+            g.metrics_profiler = cProfile.Profile()
+            g.metrics_profiler.enable()
+    
+    def _after_request(self, response):
+        started = g.pop('metrics_started', None)
+        if started is None:
+            return response
+        
+        profiler = g.pop('metrics_profiler', None)
+        if profiler is not None:
+            profiler.disable()
+        
+        duration = time.perf_counter() - started
+        queries = g.pop('metrics_queries')
+        query_time = g.pop('metrics_query_time')
+        query_count = sum(queries.values())
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        repeated = [(statement, count) for statement, count in queries.items() if count >= N_PLUS_ONE_THRESHOLD]
+        
+        with self._lock:
+            self.request_latency.observe((request.method, route, response.status_code), duration)
+            self.request_queries.observe((request.method, route), query_count)
+            if repeated:
+                self.n_plus_one[(request.method, route)] += len(repeated)
+        
+        for statement, count in repeated:
+            logger.warning("Possible N+1 on %s %s: %d executions of %s", request.method, route, count,
+                           _shorten(statement))
+        
+        response.headers['Server-Timing'] = f'app;dur={duration * 1000:.1f}, db;dur={query_time * 1000:.1f}'
+        response.headers['X-Query-Count'] = str(query_count)
+        
+        if profiler is not None:
+            return self._profile_response(profiler, response, duration, queries, query_time)
+        return response
+    
+    def _profile_response(self, profiler, response, duration, queries, query_time):
+        output = io.StringIO()
+        stats = pstats.Stats(profiler, stream=output)
+        stats.sort_stats('cumulative').print_stats(PROFILE_LINES)
+        
+        return jsonify({
+            'status': response.status_code,
+            'duration_ms': round(duration * 1000, 2),
+            'queries': sum(queries.values()),
+            'query_time_ms': round(query_time * 1000, 2),
+            'statements': [
+                {'statement': statement, 'count': count}
+                for statement, count in queries.most_common(20)
+            ],
+            'profile': output.getvalue()
+        })
+    
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        # The start time lives on the statement's own execution context, so a statement that
+        # fails between the two events leaves nothing behind on the pooled connection
+        if context is not None:
+            context._metrics_started = time.perf_counter()
+    
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        started = getattr(context, '_metrics_started', None)
+        if started is None:
+            return
+        duration = time.perf_counter() - started
+        operation = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else 'OTHER'
+        
+        with self._lock:
+            self.query_latency.observe((operation,), duration)
+        
+        if has_request_context() and 'metrics_queries' in g:
+            g.metrics_queries[statement] += 1
+            g.metrics_query_time += duration
+    
+    def render(self):
+        """Return this process's metrics in the Prometheus text exposition format"""
+        with self._lock:
+            lines = [
+                '# HELP http_request_duration_seconds Request latency by route',
+                '# TYPE http_request_duration_seconds histogram',
+                *self.request_latency.render('http_request_duration_seconds', ('method', 'route', 'status')),
+                '# HELP http_request_sql_queries SQL statements executed per request by route',
+                '# TYPE http_request_sql_queries histogram',
+                *self.request_queries.render('http_request_sql_queries', ('method', 'route')),
+                '# HELP sql_query_duration_seconds SQL statement latency by operation',
+                '# TYPE sql_query_duration_seconds histogram',
+                *self.query_latency.render('sql_query_duration_seconds', ('operation',)),
+                '# HELP http_request_n_plus_one_total Statements repeated at least '
+                f'{N_PLUS_ONE_THRESHOLD} times within one request',
+                '# TYPE http_request_n_plus_one_total counter',
+                *(f'http_request_n_plus_one_total{{{_labels(("method", "route"), labels)}}} {count}'
+                  for labels, count in sorted(self.n_plus_one.items())),
+                '# HELP process_start_time_seconds Start time of this worker',
+                '# TYPE process_start_time_seconds gauge',
+                f'process_start_time_seconds {self.started_at}'
+            ]
+        return '\n'.join(lines) + '\n'
+
+def _profiling_allowed():
+    return current_app.config.get('PROFILING_ENABLED', False)
+
+def _shorten(statement, limit=200):
+    statement = ' '.join(statement.split())
+    return statement if len(statement) <= limit else statement[:limit] + '...'
+
+request_metrics = RequestMetrics()
@@ -1,8 +1,15 @@
 from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime, timedelta
+from backend.sharding import StoreSession
 import enum
+import json
 
-db = SQLAlchemy()
+# Sessions bind to a store's own database when STORE_DATABASE_DIR is set (see backend/sharding.py)
+db = SQLAlchemy(session_options={'class_': StoreSession})
+
+# Bump together with database/schema.sql whenever tables or indexes change,
+# so `python setup_database.py --migrate` knows an existing database is behind
+SCHEMA_VERSION = 8
 
 class ProductStatus(enum.Enum):
     ACTIVE = "active"
@@ -26,8 +33,82 @@ class NotificationStatus(enum.Enum):
     SENT = "sent"
     FAILED = "failed"
 
+# Progressive discount bounds, in percent
+BASE_DISCOUNT = 30  # Discount applied when a product enters its category's discount window
+MAX_DISCOUNT = 70   # Discount applied on the last day before expiry
+DEFAULT_DISCOUNT_THRESHOLD = 7
+
+def calculate_discounted_price(price, days_until_expiry, discount_threshold):
+    """Calculate the progressive discounted price for a product inside its discount window"""
+    # Calculate discount percentage proportionally to how close to expiry
+    # The closer to expiry, the higher the discount
+    days_left_percentage = days_until_expiry / discount_threshold
+    
+    # Progressive discount: increases as expiry date approaches
+    # At threshold days: minimal discount, At 0 days: maximum discount
+    discount_percentage = BASE_DISCOUNT + (MAX_DISCOUNT - BASE_DISCOUNT) * (1 - days_left_percentage)
+    discount_percentage = round(discount_percentage, 0)  # Round to nearest integer percentage
+    
+    return round(price * (1 - discount_percentage / 100), 2)
+
+def classify_expiry(status, price, discounted_price, days_until_expiry, discount_threshold):
+    """Return the (status, discounted_price) a product should have given its days until expiry"""
+    if days_until_expiry <= 0:
+        return ProductStatus.EXPIRED.value, discounted_price
+    
+    if days_until_expiry <= discount_threshold and status == ProductStatus.ACTIVE.value:
+        # Apply discount based on category and days until expiry
+        return (
+            ProductStatus.DISCOUNTED.value,
+            calculate_discounted_price(price, days_until_expiry, discount_threshold)
+        )
+    
+    return status, discounted_price
+
+def transition_date_for(status, expiry_date, discount_threshold):
+    """Return the first date on which the expiry sweeps will change a product in this status, if any"""
+    if status == ProductStatus.ACTIVE.value:
+        # Enters its category's discount window
+        return expiry_date - timedelta(days=discount_threshold)
+    if status == ProductStatus.DISCOUNTED.value:
+        # Expires
+        return expiry_date
+    if status == ProductStatus.EXPIRED.value:
+        # Disposed of by process_expired_products the day after expiry
+        return expiry_date + timedelta(days=1)
+    return None
+
+class Store(db.Model):
+    """A dark store; inventory, waste and purchases are scoped to one"""
+    __tablename__ = 'stores'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    code = db.Column(db.String(32), unique=True, nullable=False)  # Used in /api/stores/<code>/... URLs
+    name = db.Column(db.String(100), nullable=False)
+    address = db.Column(db.String(200))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<Store {self.code}>'
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'code': self.code,
+            'name': self.name,
+            'address': self.address,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
+
 class Product(db.Model):
     __tablename__ = 'products'
+    __table_args__ = (
+        db.Index('ix_products_status_expiry', 'status', 'expiry_date'),
+        db.Index('ix_products_category_status_expiry', 'category', 'status', 'expiry_date'),
+        db.Index('ix_products_expiry_date', 'expiry_date'),
+        db.Index('ix_products_next_transition', 'next_transition_date'),
+        db.Index('ix_products_store_status_expiry', 'store_id', 'status', 'expiry_date'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
@@ -40,7 +121,9 @@ class Product(db.Model):
     price = db.Column(db.Float, nullable=False)
     discounted_price = db.Column(db.Float)
     location = db.Column(db.String(50), nullable=False)
+    store_id = db.Column(db.Integer, db.ForeignKey('stores.id'))
     status = db.Column(db.String(20), default=ProductStatus.ACTIVE.value)
+    next_transition_date = db.Column(db.Date)  # See transition_date_for; NULL once disposed
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
@@ -64,6 +147,7 @@ class Product(db.Model):
             'price': self.price,
             'discounted_price': self.discounted_price,
             'location': self.location,
+            'store_id': self.store_id,
             'status': self.status,
             'days_until_expiry': (self.expiry_date - datetime.utcnow().date()).days if self.expiry_date else None,
             'created_at': self.created_at.isoformat() if self.created_at else None,
@@ -71,63 +155,28 @@ class Product(db.Model):
         }
     
     def check_expiry_status(self):
-        """Check and update product status based on expiry date"""
+        """
+        Check and update product status based on expiry date
+        
+        The change is written, and customers are notified of a new discount,
+        by the session's next flush (see backend/transitions.py).
+        """
         today = datetime.utcnow().date()
         days_until_expiry = (self.expiry_date - today).days
         
         # Get category to determine discount threshold
         category = Category.query.filter_by(name=self.category).first()
-        discount_threshold = category.discount_threshold if category else 7
+        discount_threshold = category.discount_threshold if category else DEFAULT_DISCOUNT_THRESHOLD
         
-        if days_until_expiry <= 0:
-            self.status = ProductStatus.EXPIRED.value
-        elif days_until_expiry <= discount_threshold and self.status == ProductStatus.ACTIVE.value:
-            # Apply discount based on category and days until expiry
-            # Calculate discount percentage proportionally to how close to expiry
-            # The closer to expiry, the higher the discount
-            days_left_percentage = days_until_expiry / discount_threshold
-            base_discount = 30  # Starting discount percentage
-            max_discount = 70   # Maximum discount percentage
-            
-            # Progressive discount: increases as expiry date approaches
-            # At threshold days: minimal discount, At 0 days: maximum discount
-            discount_percentage = base_discount + (max_discount - base_discount) * (1 - days_left_percentage)
-            discount_percentage = round(discount_percentage, 0)  # Round to nearest integer percentage
-            
-            self.discounted_price = round(self.price * (1 - discount_percentage / 100), 2)
-            self.status = ProductStatus.DISCOUNTED.value
-            
-            # Notify customers who previously purchased this product
-            self.notify_customers()
-        
-        db.session.commit()
+        self.status, self.discounted_price = classify_expiry(
+            self.status, self.price, self.discounted_price, days_until_expiry, discount_threshold
+        )
+        self.next_transition_date = transition_date_for(self.status, self.expiry_date, discount_threshold)
         return self.status
     
     def notify_customers(self):
-        """Notify customers who previously purchased this product about the discount"""
-        # Find customers who purchased this product
-        customer_purchases = PurchaseHistory.query.filter_by(product_id=self.id).all()
-        customer_ids = set(purchase.customer_id for purchase in customer_purchases)
-        
-        for customer_id in customer_ids:
-            # Check if notification already exists
-            existing_notification = DiscountNotification.query.filter_by(
-                customer_id=customer_id,
-                product_id=self.id,
-                status=NotificationStatus.PENDING.value
-            ).first()
-            
-            if not existing_notification:
-                notification = DiscountNotification(
-                    customer_id=customer_id,
-                    product_id=self.id,
-                    notification_date=datetime.utcnow().date(),
-                    notification_type=Customer.query.get(customer_id).notification_preference,
-                    status=NotificationStatus.PENDING.value
-                )
-                db.session.add(notification)
-        
-        db.session.commit()
+        """Queue a discount notification for every customer who previously purchased this product"""
+        queue_discount_notifications([self.id])
 
 class Category(db.Model):
     __tablename__ = 'categories'
@@ -156,9 +205,15 @@ class Category(db.Model):
 
 class WasteRecord(db.Model):
     __tablename__ = 'waste_records'
+    __table_args__ = (
+        db.Index('ix_waste_records_disposal_date', 'disposal_date'),
+        db.Index('ix_waste_records_product_id', 'product_id'),
+        db.Index('ix_waste_records_store_disposal_date', 'store_id', 'disposal_date'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     product_id = db.Column(db.Integer, db.ForeignKey('products.id'), nullable=False)
+    store_id = db.Column(db.Integer, db.ForeignKey('stores.id'))  # The product's store
     quantity = db.Column(db.Integer, nullable=False)
     waste_type = db.Column(db.String(20), nullable=False)
     recyclable = db.Column(db.Boolean, nullable=False)
@@ -175,6 +230,7 @@ class WasteRecord(db.Model):
             'id': self.id,
             'product_id': self.product_id,
             'product_name': self.product.name if self.product else None,
+            'store_id': self.store_id,
             'quantity': self.quantity,
             'waste_type': self.waste_type,
             'recyclable': self.recyclable,
@@ -184,6 +240,37 @@ class WasteRecord(db.Model):
             'created_at': self.created_at.isoformat() if self.created_at else None
         }
 
+class WasteDailyRollup(db.Model):
+    """Daily waste totals maintained incrementally alongside waste_records"""
+    __tablename__ = 'waste_daily_rollup'
+    __table_args__ = (
+        db.UniqueConstraint('disposal_date', 'store_id', 'category', 'waste_type', 'recyclable',
+                            name='uq_waste_daily_rollup_key'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    disposal_date = db.Column(db.Date, nullable=False)
+    store_id = db.Column(db.Integer, nullable=False, default=0)  # 0 for records without a store
+    category = db.Column(db.String(50), nullable=False, default='')  # '' when the product is unknown
+    waste_type = db.Column(db.String(20), nullable=False)
+    recyclable = db.Column(db.Boolean, nullable=False)
+    total_quantity = db.Column(db.Integer, nullable=False, default=0)
+    record_count = db.Column(db.Integer, nullable=False, default=0)
+    
+    def __repr__(self):
+        return f'<WasteDailyRollup {self.disposal_date} {self.category}>'
+    
+    def to_dict(self):
+        return {
+            'disposal_date': self.disposal_date.isoformat() if self.disposal_date else None,
+            'store_id': self.store_id,
+            'category': self.category,
+            'waste_type': self.waste_type,
+            'recyclable': self.recyclable,
+            'total_quantity': self.total_quantity,
+            'record_count': self.record_count
+        }
+
 class Customer(db.Model):
     __tablename__ = 'customers'
     
@@ -214,10 +301,16 @@ class Customer(db.Model):
 
 class PurchaseHistory(db.Model):
     __tablename__ = 'purchase_history'
+    __table_args__ = (
+        db.Index('ix_purchase_history_product_id', 'product_id'),
+        db.Index('ix_purchase_history_customer_id', 'customer_id'),
+        db.Index('ix_purchase_history_store_date', 'store_id', 'purchase_date'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     customer_id = db.Column(db.Integer, db.ForeignKey('customers.id'), nullable=False)
     product_id = db.Column(db.Integer, db.ForeignKey('products.id'), nullable=False)
+    store_id = db.Column(db.Integer, db.ForeignKey('stores.id'))  # The product's store
     quantity = db.Column(db.Integer, nullable=False)
     purchase_date = db.Column(db.Date, nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
@@ -232,6 +325,7 @@ class PurchaseHistory(db.Model):
             'customer_name': self.customer.name if self.customer else None,
             'product_id': self.product_id,
             'product_name': self.product.name if self.product else None,
+            'store_id': self.store_id,
             'quantity': self.quantity,
             'purchase_date': self.purchase_date.isoformat() if self.purchase_date else None,
             'created_at': self.created_at.isoformat() if self.created_at else None
@@ -239,6 +333,13 @@ class PurchaseHistory(db.Model):
 
 class DiscountNotification(db.Model):
     __tablename__ = 'discount_notifications'
+    __table_args__ = (
+        db.Index('ix_discount_notifications_customer_product_status', 'customer_id', 'product_id', 'status'),
+        db.Index('ix_discount_notifications_status', 'status'),
+        # At most one pending notification per customer and product
+        db.Index('uq_discount_notifications_pending', 'customer_id', 'product_id', unique=True,
+                 sqlite_where=db.text("status = 'pending'"), postgresql_where=db.text("status = 'pending'")),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     customer_id = db.Column(db.Integer, db.ForeignKey('customers.id'), nullable=False)
@@ -246,6 +347,8 @@ class DiscountNotification(db.Model):
     notification_date = db.Column(db.Date, nullable=False)
     notification_type = db.Column(db.String(10), nullable=False)
     status = db.Column(db.String(10), default=NotificationStatus.PENDING.value)
+    attempts = db.Column(db.Integer, nullable=False, default=0)  # Delivery attempts so far
+    last_attempt_at = db.Column(db.DateTime)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     def __repr__(self):
@@ -261,5 +364,114 @@ class DiscountNotification(db.Model):
             'notification_date': self.notification_date.isoformat() if self.notification_date else None,
             'notification_type': self.notification_type,
             'status': self.status,
+            'attempts': self.attempts,
+            'last_attempt_at': self.last_attempt_at.isoformat() if self.last_attempt_at else None,
             'created_at': self.created_at.isoformat() if self.created_at else None
         }
+
+class ScheduledJob(db.Model):
+    """Schedule, leader lock and run metrics of one background job"""
+    __tablename__ = 'scheduled_jobs'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(50), unique=True, nullable=False)
+    interval_seconds = db.Column(db.Integer, nullable=False)
+    next_run_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    locked_by = db.Column(db.String(100))  # Worker currently running the job
+    locked_until = db.Column(db.DateTime)  # Lease expiry, so a crashed worker's lock is eventually released
+    last_started_at = db.Column(db.DateTime)
+    last_finished_at = db.Column(db.DateTime)
+    last_success_at = db.Column(db.DateTime)
+    last_duration = db.Column(db.Float)  # Seconds
+    last_error = db.Column(db.Text)
+    last_result = db.Column(db.Text)  # JSON summary returned by the job
+    run_count = db.Column(db.Integer, nullable=False, default=0)
+    failure_count = db.Column(db.Integer, nullable=False, default=0)
+    
+    def __repr__(self):
+        return f'<ScheduledJob {self.name}>'
+    
+    def to_dict(self):
+        return {
+            'name': self.name,
+            'interval_seconds': self.interval_seconds,
+            'next_run_at': self.next_run_at.isoformat() if self.next_run_at else None,
+            'running': bool(self.locked_until and self.locked_until > datetime.utcnow()),
+            'locked_by': self.locked_by,
+            'last_started_at': self.last_started_at.isoformat() if self.last_started_at else None,
+            'last_finished_at': self.last_finished_at.isoformat() if self.last_finished_at else None,
+            'last_success_at': self.last_success_at.isoformat() if self.last_success_at else None,
+            'last_duration': self.last_duration,
+            'last_error': self.last_error,
+            'last_result': json.loads(self.last_result) if self.last_result else None,
+            'run_count': self.run_count,
+            'failure_count': self.failure_count
+        }
+
+class TableVersion(db.Model):
+    """Change version of one table, bumped in the transaction of every write to it"""
+    __tablename__ = 'table_versions'
+    
+    table_name = db.Column(db.String(64), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    
+    def __repr__(self):
+        return f'<TableVersion {self.table_name} {self.version}>'
+
+def dialect_insert(table, bind=None):
+    """Return an INSERT for `table` that supports ON CONFLICT on SQLite and PostgreSQL"""
+    bind = bind if bind is not None else db.session.get_bind()
+    if bind.dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert(table)
+
+# Maximum product ids bound into one IN (...) list
+FAN_OUT_CHUNK_SIZE = 500
+
+def queue_discount_notifications(product_ids):
+    """
+    Queue a pending notification for every past buyer of the given products
+    
+    Runs as INSERT ... SELECT DISTINCT over purchase_history joined with
+    customers. Pairs that already have a pending notification are rejected
+    by the uq_discount_notifications_pending partial index via
+    ON CONFLICT DO NOTHING, so nothing is read back before writing.
+    
+    Returns:
+        int: Number of notifications queued
+    """
+    product_ids = list(product_ids)
+    today = datetime.utcnow().date()
+    now = datetime.utcnow()
+    queued = 0
+    
+    for start in range(0, len(product_ids), FAN_OUT_CHUNK_SIZE):
+        buyers = db.select(
+            PurchaseHistory.customer_id,
+            PurchaseHistory.product_id,
+            db.literal(today, db.Date),
+            db.func.coalesce(Customer.notification_preference, NotificationType.EMAIL.value),
+            db.literal(NotificationStatus.PENDING.value),
+            db.literal(0),
+            db.literal(now, db.DateTime)
+        ).join(
+            Customer, Customer.id == PurchaseHistory.customer_id
+        ).where(
+            PurchaseHistory.product_id.in_(product_ids[start:start + FAN_OUT_CHUNK_SIZE])
+        ).distinct()
+        
+        statement = dialect_insert(DiscountNotification.__table__).from_select(
+            ['customer_id', 'product_id', 'notification_date', 'notification_type', 'status', 'attempts',
+             'created_at'],
+            buyers
+        ).on_conflict_do_nothing()
+        
+        result = db.session.execute(statement)
+        queued += max(result.rowcount, 0)
+    
+    return queued
+
+# Registers the flush hook that classifies changed products; imported last because it uses the models above
+from backend import transitions
@@ -0,0 +1,271 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from flask import current_app
+from flask_mail import Message
+from backend.models import db, Product, Customer, DiscountNotification, NotificationStatus
+import smtplib
+import threading
+import time
+
+DEFAULT_WORKERS = 4
+DEFAULT_CHUNK_SIZE = 500
+DEFAULT_MAX_ATTEMPTS = 3
+DEFAULT_RETRY_BACKOFF = 300  # Seconds before the first retry of a FAILED notification; doubles per attempt
+DEFAULT_RATE_LIMITS = {'email': 10}  # Messages per second per channel
+SEND_RETRIES = 2  # Immediate retries of a single message on transient SMTP errors
+SEND_RETRY_DELAY = 0.5
+
+class RateLimiter:
+    """Thread-safe limiter spacing calls at most `rate` per second"""
+    
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate else 0
+        self._next_slot = time.monotonic()
+        self._lock = threading.Lock()
+    
+    def acquire(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(self._next_slot, now)
+            self._next_slot = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+def channel_for(notification_type):
+    """Return the delivery channel for a customer's notification preference"""
+    # There is no SMS gateway yet, so every preference is delivered by email as before
+    return 'email'
+
+def build_discount_message(customer_name, customer_email, product_name, price, discounted_price, expiry_date):
+    """Build the discount alert email for one customer"""
+    subject = f"Discount Alert: {product_name} now at {discounted_price:.2f}"
+    body = f"""
+    Hello {customer_name},
+    
+    Good news! A product you've purchased before is now on discount:
+    
+    {product_name}
+    Original Price: ${price:.2f}
+    Discounted Price: ${discounted_price:.2f}
+    Expiry Date: {expiry_date.isoformat()}
+    
+    Hurry and grab it before it's gone!
+    
+    Thank you for shopping with us.
+    """
+    
+    return Message(
+        subject=subject,
+        recipients=[customer_email],
+        body=body
+    )
+
+def close_connection(connection):
+    """QUIT a flask_mail connection opened with __enter__, or drop its socket if the server is already gone"""
+    if connection is None or connection.host is None:
+        return
+    try:
+        connection.__exit__(None, None, None)
+    except (smtplib.SMTPException, OSError):
+        connection.host.close()
+
+class NotificationDispatcher:
+    """
+    Sends pending discount notifications in chunks over a bounded thread pool
+    
+    Customers and products are preloaded with the notifications in one joined
+    query, each worker thread reuses a single SMTP connection for its share of
+    a chunk, and statuses are written back with one bulk UPDATE per chunk.
+    FAILED notifications are retried on later runs with exponential backoff
+    until max_attempts is reached.
+    """
+    
+    def __init__(self, mail, max_workers=DEFAULT_WORKERS, chunk_size=DEFAULT_CHUNK_SIZE,
+                 max_attempts=DEFAULT_MAX_ATTEMPTS, retry_backoff=DEFAULT_RETRY_BACKOFF, rate_limits=None):
+        self.mail = mail
+        self.max_workers = max_workers
+        self.chunk_size = chunk_size
+        self.max_attempts = max_attempts
+        self.retry_backoff = retry_backoff
+        self.rate_limiters = {
+            channel: RateLimiter(rate)
+            for channel, rate in (rate_limits if rate_limits is not None else DEFAULT_RATE_LIMITS).items()
+        }
+    
+    @classmethod
+    def from_config(cls, mail, config):
+        """Create a dispatcher from NOTIFICATION_* settings"""
+        return cls(
+            mail,
+            max_workers=config.get('NOTIFICATION_WORKERS', DEFAULT_WORKERS),
+            chunk_size=config.get('NOTIFICATION_CHUNK_SIZE', DEFAULT_CHUNK_SIZE),
+            max_attempts=config.get('NOTIFICATION_MAX_ATTEMPTS', DEFAULT_MAX_ATTEMPTS),
+            retry_backoff=config.get('NOTIFICATION_RETRY_BACKOFF', DEFAULT_RETRY_BACKOFF),
+            rate_limits=config.get('NOTIFICATION_RATE_LIMITS', DEFAULT_RATE_LIMITS)
+        )
+    
+    def dispatch(self):
+        """Send every due notification and return totals"""
+        results = {
+            'total': 0,
+            'sent': 0,
+            'failed': 0,
+            'retried': 0
+        }
+        
+        app = current_app._get_current_object()
+        last_id = 0
+        
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while True:
+                rows = self._load_due(last_id)
+                if not rows:
+                    break
+                last_id = rows[-1].id
+                
+                now = datetime.utcnow()
+                rows = [row for row in rows if self._is_due(row, now)]
+                updates, outgoing = self._prepare(rows, now)
+                
+                # Split the chunk so each worker sends its share over one connection
+                batches = [outgoing[i::self.max_workers] for i in range(self.max_workers) if outgoing[i::self.max_workers]]
+                for batch_results in executor.map(lambda batch: self._send_batch(app, batch), batches):
+                    updates.extend(batch_results)
+                
+                for row in rows:
+                    if row.status == NotificationStatus.FAILED.value:
+                        results['retried'] += 1
+                
+                for update in updates:
+                    results['total'] += 1
+                    if update['status'] == NotificationStatus.SENT.value:
+                        results['sent'] += 1
+                    else:
+                        results['failed'] += 1
+                
+                if updates:
+                    db.session.execute(db.update(DiscountNotification), updates)
+                db.session.commit()
+        
+        return results
+    
+    def _load_due(self, last_id):
+        return db.session.query(
+            DiscountNotification.id,
+            DiscountNotification.status,
+            DiscountNotification.notification_type,
+            DiscountNotification.attempts,
+            DiscountNotification.last_attempt_at,
+            Customer.name.label('customer_name'),
+            Customer.email.label('customer_email'),
+            Product.name.label('product_name'),
+            Product.price,
+            Product.discounted_price,
+            Product.expiry_date
+        ).outerjoin(
+            Customer, Customer.id == DiscountNotification.customer_id
+        ).outerjoin(
+            Product, Product.id == DiscountNotification.product_id
+        ).filter(
+            db.or_(
+                DiscountNotification.status == NotificationStatus.PENDING.value,
+                db.and_(
+                    DiscountNotification.status == NotificationStatus.FAILED.value,
+                    db.func.coalesce(DiscountNotification.attempts, 0) < self.max_attempts
+                )
+            ),
+            DiscountNotification.id > last_id
+        ).order_by(
+            DiscountNotification.id.asc()
+        ).limit(self.chunk_size).all()
+    
+    def _is_due(self, row, now):
+        if row.status != NotificationStatus.FAILED.value or row.last_attempt_at is None:
+            return True
+        backoff = self.retry_backoff * 2 ** max((row.attempts or 1) - 1, 0)
+        return row.last_attempt_at + timedelta(seconds=backoff) <= now
+    
+    def _prepare(self, rows, now):
+        """Build messages for deliverable rows; rows that can never be sent fail permanently"""
+        updates = []
+        outgoing = []
+        
+        for row in rows:
+            attempts = (row.attempts or 0) + 1
+            
+            if not row.customer_email or row.product_name is None or row.discounted_price is None:
+                updates.append({
+                    'id': row.id,
+                    'status': NotificationStatus.FAILED.value,
+                    'attempts': self.max_attempts,
+                    'last_attempt_at': now
+                })
+                continue
+            
+            message = build_discount_message(
+                row.customer_name, row.customer_email, row.product_name,
+                row.price, row.discounted_price, row.expiry_date
+            )
+            outgoing.append((row.id, attempts, channel_for(row.notification_type), message))
+        
+        return updates, outgoing
+    
+    def _send_batch(self, app, batch):
+        """Send a batch over one reused SMTP connection and return the status updates"""
+        updates = []
+        
+        with app.app_context():
+            connection = None
+            try:
+                for notification_id, attempts, channel, message in batch:
+                    limiter = self.rate_limiters.get(channel)
+                    sent = False
+                    
+                    for retry in range(SEND_RETRIES + 1):
+                        if limiter:
+                            limiter.acquire()
+                        try:
+                            if connection is None:
+                                connection = self.mail.connect().__enter__()
+                            connection.send(message)
+                            sent = True
+                            break
+                        except (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError) as e:
+                            # The connection is unusable; close it and reopen on the next try
+                            close_connection(connection)
+                            connection = None
+                            error = e
+                        except smtplib.SMTPResponseException as e:
+                            error = e
+                            # Only 4xx replies are worth retrying straight away
+                            if not 400 <= e.smtp_code < 500:
+                                break
+                        except smtplib.SMTPException as e:
+                            error = e
+                            break
+                        except OSError as e:
+                            close_connection(connection)
+                            connection = None
+                            error = e
+                        except Exception as e:
+                            error = e
+                            break
+                        
+                        if retry < SEND_RETRIES:
+                            time.sleep(SEND_RETRY_DELAY * 2 ** retry)
+                    
+                    if not sent:
+                        print(f"Error sending notification {notification_id}: {str(error)}")
+                    
+                    updates.append({
+                        'id': notification_id,
+                        'status': NotificationStatus.SENT.value if sent else NotificationStatus.FAILED.value,
+                        'attempts': attempts,
+                        'last_attempt_at': datetime.utcnow()
+                    })
+            finally:
+                close_connection(connection)
+        
+        return updates
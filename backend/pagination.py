@@ -0,0 +1,107 @@
+from datetime import date, datetime
+from sqlalchemy import tuple_
+import base64
+import json
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+class PaginationError(ValueError):
+    """Raised when limit, after or fields query parameters are invalid"""
+
+def encode_cursor(values):
+    """Encode the sort key of the last row on a page as an opaque cursor string"""
+    payload = [value.isoformat() if isinstance(value, (date, datetime)) else value for value in values]
+    return base64.urlsafe_b64encode(json.dumps(payload).encode('utf-8')).decode('ascii')
+
+def decode_cursor(cursor, columns):
+    """Decode a cursor back into values typed like the sort columns"""
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+    except (ValueError, UnicodeError):
+        raise PaginationError('Invalid cursor')
+    
+    if not isinstance(payload, list) or len(payload) != len(columns):
+        raise PaginationError('Invalid cursor')
+    
+    values = []
+    for column, value in zip(columns, payload):
+        python_type = column.type.python_type
+        try:
+            if python_type is date:
+                value = date.fromisoformat(value)
+            elif python_type is datetime:
+                value = datetime.fromisoformat(value)
+            else:
+                value = python_type(value)
+        except (TypeError, ValueError):
+            raise PaginationError('Invalid cursor')
+        values.append(value)
+    
+    return values
+
+def parse_fields(fields, allowed_fields):
+    """Parse a comma separated `fields` projection, or None to return every field"""
+    if not fields:
+        return None
+    
+    requested = [field.strip() for field in fields.split(',') if field.strip()]
+    unknown = [field for field in requested if field not in allowed_fields]
+    if unknown:
+        raise PaginationError(f"Unknown fields: {', '.join(unknown)}")
+    
+    return requested
+
+def project(item, fields):
+    """Restrict a serialized row to the requested fields"""
+    if fields is None:
+        return item
+    return {field: item[field] for field in fields}
+
+def paginate(query, sort_columns, args, serialize, allowed_fields, project_rows=True):
+    """
+    Apply the keyset pagination contract shared by the list endpoints
+    
+    Args:
+        query: Query over the listed model
+        sort_columns (list): Columns forming a unique sort key, the last one being the primary key
+        args: Request query arguments carrying `limit`, `after` and `fields`
+        serialize (callable): Turns a model instance into a dict
+        allowed_fields (iterable): Field names accepted by the `fields` projection
+        project_rows (bool): Apply the projection to serialized rows; False when `serialize` already does
+    
+    Returns:
+        A dict with `items` and `next_cursor` (None on the last page); pages hold
+        DEFAULT_PAGE_SIZE rows unless `limit` asks for another size
+    """
+    fields = parse_fields(args.get('fields'), allowed_fields) if project_rows else None
+    limit = args.get('limit') or None
+    after = args.get('after') or None
+    
+    try:
+        limit = int(limit) if limit is not None else DEFAULT_PAGE_SIZE
+    except ValueError:
+        raise PaginationError('Invalid limit parameter')
+    if limit < 1:
+        raise PaginationError('Invalid limit parameter')
+    limit = min(limit, MAX_PAGE_SIZE)
+    
+    if after is not None:
+        after_values = decode_cursor(after, sort_columns)
+        if len(sort_columns) == 1:
+            query = query.filter(sort_columns[0] > after_values[0])
+        else:
+            query = query.filter(tuple_(*sort_columns) > tuple_(*after_values))
+    
+    # Fetch one extra row to learn whether another page exists
+    rows = query.order_by(*[column.asc() for column in sort_columns]).limit(limit + 1).all()
+    
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor([getattr(rows[-1], column.key) for column in sort_columns])
+    
+    return {
+        'items': [project(serialize(row), fields) for row in rows],
+        'next_cursor': next_cursor
+    }
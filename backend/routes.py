@@ -1,46 +1,174 @@
-from flask import Blueprint, request, jsonify
-from backend.models import db, Product, Category, WasteRecord, Customer, PurchaseHistory, DiscountNotification
+from flask import Blueprint, request, jsonify, current_app, url_for, stream_with_context, g, abort
+from backend.models import db, Product, Category, WasteRecord, Customer, PurchaseHistory, DiscountNotification, ScheduledJob, Store
 from backend.models import ProductStatus, WasteType, NotificationType, NotificationStatus
 from datetime import datetime, timedelta
 from backend import utils
+from backend import labels
+from backend import export
 from backend.barcode_generator import BarcodeGenerator
+from backend.pagination import paginate, parse_fields, PaginationError
+from backend.serialization import PRODUCT_ROWS, WASTE_RECORD_ROWS, CUSTOMER_ROWS, PURCHASE_ROWS, NOTIFICATION_ROWS
+from backend.cache import response_cache
+from backend.scan_index import barcode_index
+from backend.image_cache import image_cache, image_key, MEDIA_TYPES
+from backend.metrics import request_metrics
+from backend.events import event_broker
+from backend.sharding import store_router, STORE_CODE_PATTERN
+from backend.stores import current_store_id, store_id_for, resolve_store_scope, for_each_store, merge_waste_statistics
+from backend.stores import chain_versions
 import json
 import csv
 import io
 
 api = Blueprint('api', __name__)
 
-# Product Routes
-@api.route('/products', methods=['GET'])
-def get_products():
-    """Get all products with optional filtering"""
+# The blueprint is also mounted under /api/stores/<store_code>; this scopes those requests to the store
+api.url_value_preprocessor(resolve_store_scope)
+
+# Largest number of barcodes accepted by /products/scan/batch
+MAX_SCAN_BATCH = 1000
+
+# Largest number of labels rendered by one /products/labels request
+MAX_LABELS = 5000
+
+# Longest payload rendered by /products/barcode/image
+MAX_CODE_PAYLOAD = 2048
+
+def paginated_rows(spec, sort_columns, filters=()):
+    """Serialize a filtered list from row tuples using the shared limit/after/fields cursor contract"""
+    try:
+        fields = parse_fields(request.args.get('fields'), spec.field_names)
+        query = spec.query(fields, sort_columns).filter(*filters)
+        return jsonify(paginate(query, sort_columns, request.args, spec.serializer(fields), spec.field_names,
+                                project_rows=False))
+    except PaginationError as e:
+        return jsonify({'error': str(e)}), 400
+
+def export_rows(spec, filters, filename):
+    """Stream every row matching `filters` as NDJSON or CSV, optionally gzipped"""
+    output_format = request.args.get('format', 'ndjson')
+    compress = request.args.get('gzip', 'false').lower() == 'true'
+    
+    if output_format not in export.MEDIA_TYPES:
+        return jsonify({'error': 'format must be ndjson or csv'}), 400
+    
+    try:
+        fields = parse_fields(request.args.get('fields'), spec.field_names) or list(spec.field_names)
+    except PaginationError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    # Primary key order reads the table front to back without a sort
+    query = spec.query(fields).filter(*filters).order_by(spec.entity.id)
+    chunks = export.stream_rows(query, spec.serializer(fields), fields, output_format, compress,
+                                current_app.config.get('EXPORT_BATCH_SIZE', export.EXPORT_BATCH_SIZE))
+    
+    response = current_app.response_class(stream_with_context(chunks), mimetype=export.MEDIA_TYPES[output_format])
+    response.headers['Content-Disposition'] = f'attachment; filename={filename}.{output_format}'
+    response.headers['X-Accel-Buffering'] = 'no'  # Let proxies pass chunks through as they are written
+    if compress:
+        response.headers['Content-Encoding'] = 'gzip'
+    return response
+
+def lookup_barcodes(barcodes):
+    """Return {barcode: product dict} for the scan routes, limited to the request's store"""
+    # The scan index covers the main database only; a store's own file is read directly
+    if g.get('store_shard'):
+        return {product.barcode: product.to_dict() for product in Product.query.filter(Product.barcode.in_(barcodes))}
+    
+    products = barcode_index.lookup(barcodes)
+    store_id = current_store_id()
+    if store_id is not None:
+        products = {barcode: product for barcode, product in products.items() if product['store_id'] == store_id}
+    return products
+
+def store_product_or_404(product_id):
+    """Return a product, or abort with 404 if it does not exist or belongs to another store than the request's"""
+    product = db.get_or_404(Product, product_id)
+    store_id = current_store_id()
+    if store_id is not None and product.store_id != store_id:
+        abort(404)
+    return product
+
+def product_filters():
+    """Build product filter criteria from the store and status/category/location/expiry_days query parameters"""
     status = request.args.get('status')
     category = request.args.get('category')
+    location = request.args.get('location')
     expiry_days = request.args.get('expiry_days')
+    store_id = current_store_id()
     
-    query = Product.query
+    filters = []
+    
+    if store_id is not None:
+        filters.append(Product.store_id == store_id)
     
     if status:
-        query = query.filter_by(status=status)
+        filters.append(Product.status == status)
     
     if category:
-        query = query.filter_by(category=category)
+        filters.append(Product.category == category)
+    
+    if location:
+        filters.append(Product.location == location)
     
     if expiry_days:
         try:
             days = int(expiry_days)
-            target_date = datetime.utcnow().date() + timedelta(days=days)
-            query = query.filter(Product.expiry_date <= target_date)
         except ValueError:
-            return jsonify({'error': 'Invalid expiry_days parameter'}), 400
+            raise ValueError('Invalid expiry_days parameter')
+        target_date = datetime.utcnow().date() + timedelta(days=days)
+        filters.append(Product.expiry_date <= target_date)
+    
+    return filters
+
+def waste_record_filters():
+    """Build waste record filter criteria from the store and start_date/end_date/waste_type query parameters"""
+    start_date = request.args.get('start_date')
+    end_date = request.args.get('end_date')
+    waste_type = request.args.get('waste_type')
+    store_id = current_store_id()
+    
+    filters = []
+    
+    if store_id is not None:
+        filters.append(WasteRecord.store_id == store_id)
+    
+    if start_date:
+        try:
+            start = datetime.fromisoformat(start_date.replace('Z', '+00:00')).date()
+        except ValueError:
+            raise ValueError('Invalid start_date format')
+        filters.append(WasteRecord.disposal_date >= start)
+    
+    if end_date:
+        try:
+            end = datetime.fromisoformat(end_date.replace('Z', '+00:00')).date()
+        except ValueError:
+            raise ValueError('Invalid end_date format')
+        filters.append(WasteRecord.disposal_date <= end)
+    
+    if waste_type:
+        filters.append(WasteRecord.waste_type == waste_type)
+    
+    return filters
+
+# Product Routes
+@api.route('/products', methods=['GET'])
+@response_cache.cached('products')
+def get_products():
+    """Get all products with optional filtering and keyset pagination"""
+    try:
+        filters = product_filters()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     
-    products = query.all()
-    return jsonify([product.to_dict() for product in products])
+    return paginated_rows(PRODUCT_ROWS, [Product.expiry_date, Product.id], filters)
 
 @api.route('/products/<int:product_id>', methods=['GET'])
+@response_cache.cached('products')
 def get_product(product_id):
     """Get a single product by ID"""
-    product = Product.query.get_or_404(product_id)
+    product = store_product_or_404(product_id)
     return jsonify(product.to_dict())
 
 @api.route('/products', methods=['POST'])
@@ -76,24 +204,62 @@ def create_product():
         unit=data.get('unit', 'unit'),
         price=data.get('price', 0.0),
         location=data.get('location', 'Unknown'),
+        store_id=store_id_for(data),
         status=data.get('status', ProductStatus.ACTIVE.value)
     )
     
     db.session.add(product)
     
     try:
+        # Status and discounted price are classified by the flush (see backend/transitions.py)
         db.session.commit()
-        # Check expiry status immediately
-        product.check_expiry_status()
         return jsonify(product.to_dict()), 201
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 400
 
+@api.route('/products/bulk', methods=['POST'])
+def bulk_create_products():
+    """Create products in bulk from a streamed CSV or NDJSON body"""
+    file_format = request.args.get('format', '').lower()
+    
+    if request.mimetype == 'multipart/form-data':
+        if 'file' not in request.files:
+            return jsonify({'error': 'No file provided'}), 400
+        stream = request.files['file'].stream
+        file_format = file_format or request.form.get('format', '').lower()
+    else:
+        stream = request.stream
+        if not file_format:
+            file_format = {
+                'text/csv': 'csv',
+                'application/x-ndjson': 'ndjson',
+                'application/jsonl': 'ndjson'
+            }.get(request.mimetype, '')
+    
+    # Decode incrementally so the body is never held in memory as a whole
+    text_stream = io.TextIOWrapper(stream, encoding='utf-8', newline='')
+    
+    if file_format == 'csv':
+        rows = utils.iter_csv_rows(text_stream)
+    elif file_format in ('ndjson', 'jsonl'):
+        rows = utils.iter_ndjson_rows(text_stream)
+    else:
+        return jsonify({'error': 'Unsupported format, use csv or ndjson'}), 400
+    
+    try:
+        results = utils.bulk_insert_products(rows, store_id=current_store_id())
+    except (UnicodeDecodeError, csv.Error) as e:
+        db.session.rollback()
+        return jsonify({'error': f'Could not parse file: {str(e)}'}), 400
+    
+    status_code = 201 if results['inserted'] > 0 else 400
+    return jsonify(results), status_code
+
 @api.route('/products/<int:product_id>', methods=['PUT'])
 def update_product(product_id):
     """Update an existing product"""
-    product = Product.query.get_or_404(product_id)
+    product = store_product_or_404(product_id)
     data = request.json
     
     # Update fields
@@ -125,9 +291,8 @@ def update_product(product_id):
         product.status = data['status']
     
     try:
+        # Changed expiry dates, prices or statuses are reclassified by the flush
         db.session.commit()
-        # Check expiry status after update
-        product.check_expiry_status()
         return jsonify(product.to_dict())
     except Exception as e:
         db.session.rollback()
@@ -136,7 +301,7 @@ def update_product(product_id):
 @api.route('/products/<int:product_id>', methods=['DELETE'])
 def delete_product(product_id):
     """Delete a product"""
-    product = Product.query.get_or_404(product_id)
+    product = store_product_or_404(product_id)
     
     try:
         db.session.delete(product)
@@ -155,8 +320,8 @@ def scan_product():
     if not barcode:
         return jsonify({'error': 'Barcode is required'}), 400
     
-    # Look up product by barcode
-    product = Product.query.filter_by(barcode=barcode).first()
+    # Served from the in-process scan index; status changes are written by the expiry sweep
+    product = lookup_barcodes([barcode]).get(barcode)
     
     if not product:
         # If product doesn't exist, return placeholder data
@@ -166,14 +331,118 @@ def scan_product():
             'message': 'Product not found'
         })
     
-    # Check expiry status
-    product.check_expiry_status()
-    
     return jsonify({
         'found': True,
-        'product': product.to_dict()
+        'product': product
     })
 
+@api.route('/products/scan/batch', methods=['POST'])
+def scan_products_batch():
+    """Scan many barcodes in one request"""
+    data = request.json or {}
+    barcodes = data.get('barcodes')
+    
+    if not isinstance(barcodes, list) or not barcodes:
+        return jsonify({'error': 'barcodes must be a non-empty list'}), 400
+    
+    if len(barcodes) > MAX_SCAN_BATCH:
+        return jsonify({'error': f'At most {MAX_SCAN_BATCH} barcodes per request'}), 400
+    
+    barcodes = [str(barcode) for barcode in barcodes]
+    products = lookup_barcodes(set(barcodes))
+    
+    results = []
+    for barcode in barcodes:
+        product = products.get(barcode)
+        if product:
+            results.append({'found': True, 'barcode': barcode, 'product': product})
+        else:
+            results.append({'found': False, 'barcode': barcode, 'message': 'Product not found'})
+    
+    return jsonify({
+        'total': len(results),
+        'found': sum(1 for result in results if result['found']),
+        'results': results
+    })
+
+@api.route('/products/labels', methods=['POST'])
+def generate_labels():
+    """Render printable labels for many products as a multi-page PDF or a ZIP of PNGs"""
+    data = request.json or {}
+    product_ids = data.get('product_ids')
+    filters = data.get('filter') or {}
+    output_format = data.get('format', 'pdf')
+    code_type = data.get('code_type', 'barcode')
+    
+    if output_format not in ('pdf', 'zip'):
+        return jsonify({'error': 'format must be pdf or zip'}), 400
+    if code_type not in ('barcode', 'qrcode', 'both'):
+        return jsonify({'error': 'code_type must be barcode, qrcode or both'}), 400
+    
+    if product_ids is not None:
+        if not isinstance(product_ids, list) or not product_ids:
+            return jsonify({'error': 'product_ids must be a non-empty list'}), 400
+        if len(product_ids) > MAX_LABELS:
+            return jsonify({'error': f'At most {MAX_LABELS} labels per request'}), 400
+        
+        # Products of other stores are reported as missing, like the single product routes do
+        query = Product.query.filter(Product.id.in_(product_ids))
+        store_id = current_store_id()
+        if store_id is not None:
+            query = query.filter(Product.store_id == store_id)
+        products_by_id = {product.id: product for product in query}
+        missing = [product_id for product_id in product_ids if product_id not in products_by_id]
+        if missing:
+            return jsonify({'error': f'Products not found: {missing[:20]}'}), 404
+        products = [products_by_id[product_id] for product_id in product_ids]
+    else:
+        query = Product.query
+        
+        store_id = current_store_id()
+        if store_id is not None:
+            query = query.filter_by(store_id=store_id)
+        if filters.get('status'):
+            query = query.filter_by(status=filters['status'])
+        if filters.get('category'):
+            query = query.filter_by(category=filters['category'])
+        if filters.get('location'):
+            query = query.filter_by(location=filters['location'])
+        if filters.get('expiry_days') is not None:
+            try:
+                target_date = datetime.utcnow().date() + timedelta(days=int(filters['expiry_days']))
+            except (TypeError, ValueError):
+                return jsonify({'error': 'Invalid expiry_days filter'}), 400
+            query = query.filter(Product.expiry_date <= target_date)
+        
+        products = query.order_by(Product.expiry_date, Product.id).limit(MAX_LABELS + 1).all()
+        if len(products) > MAX_LABELS:
+            return jsonify({'error': f'Filter matches more than {MAX_LABELS} products'}), 400
+    
+    if not products:
+        return jsonify({'error': 'No products to label'}), 400
+    
+    # Rendering happens while the response streams, outside the request's session
+    fields = [labels.label_fields(product) for product in products]
+    job = labels.create_job(len(fields), output_format, code_type)
+    workers = current_app.config.get('LABEL_WORKERS', labels.DEFAULT_WORKERS)
+    
+    response = current_app.response_class(
+        labels.stream_labels(job, fields, workers),
+        mimetype='application/pdf' if output_format == 'pdf' else 'application/zip'
+    )
+    response.headers['Content-Disposition'] = f'attachment; filename=labels.{output_format}'
+    response.headers['X-Label-Job-Id'] = job.id
+    response.headers['X-Label-Count'] = str(job.total)
+    return response
+
+@api.route('/products/labels/<job_id>', methods=['GET'])
+def get_label_job(job_id):
+    """Get the progress of a label request made to this worker"""
+    job = labels.get_job(job_id)
+    if job is None:
+        return jsonify({'error': 'Label job not found'}), 404
+    return jsonify(job.to_dict())
+
 @api.route('/products/barcode/generate', methods=['POST'])
 def generate_barcode():
     """Generate a barcode or QR code for a product"""
@@ -186,32 +455,78 @@ def generate_barcode():
     
     try:
         if code_type == 'qrcode':
+            payload = BarcodeGenerator.qr_payload(product_data)
             image_data = BarcodeGenerator.generate_qr_code(product_data)
         else:
+            payload = BarcodeGenerator.barcode_payload(product_data)
             image_data = BarcodeGenerator.generate_barcode(product_data)
         
         return jsonify({
             'image_data': image_data,
+            'image_url': url_for('api.get_barcode_image', code_type=code_type, data=payload),
             'code_type': code_type
         })
     except Exception as e:
         return jsonify({'error': str(e)}), 400
 
+@api.route('/products/barcode/image', methods=['GET'])
+def get_barcode_image():
+    """Serve a rendered barcode or QR code as raw PNG or SVG bytes"""
+    payload = request.args.get('data')
+    code_type = request.args.get('code_type', 'barcode')
+    image_format = request.args.get('format', 'png')
+    
+    if not payload:
+        return jsonify({'error': 'data is required'}), 400
+    if len(payload) > MAX_CODE_PAYLOAD:
+        return jsonify({'error': f'data must be at most {MAX_CODE_PAYLOAD} characters'}), 400
+    if code_type not in ('barcode', 'qrcode'):
+        return jsonify({'error': 'code_type must be barcode or qrcode'}), 400
+    if image_format not in MEDIA_TYPES:
+        return jsonify({'error': 'format must be png or svg'}), 400
+    
+    # The URL fully determines the image, so the content address is a strong ETag
+    etag = image_key(code_type, payload, image_format)
+    if request.if_none_match.contains(etag):
+        response = current_app.response_class(status=304)
+    else:
+        try:
+            if code_type == 'qrcode':
+                image_bytes = BarcodeGenerator.render_qr_code(payload, image_format)
+            else:
+                image_bytes = BarcodeGenerator.render_barcode(payload, image_format=image_format)
+        except Exception as e:
+            return jsonify({'error': str(e)}), 400
+        response = current_app.response_class(image_bytes, mimetype=MEDIA_TYPES[image_format])
+    
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+    return response
+
 @api.route('/products/barcode/samples', methods=['GET'])
 def get_sample_barcodes():
     """Get sample barcodes for demo purposes"""
     count = request.args.get('count', 5, type=int)
-    samples = BarcodeGenerator.generate_sample_barcodes(count)
+    # ?inline=false returns image URLs instead of base64 images
+    inline = request.args.get('inline', 'true').lower() == 'true'
+    samples = BarcodeGenerator.generate_sample_barcodes(count, inline=inline)
+    
+    for sample in samples:
+        sample['barcode_url'] = url_for('api.get_barcode_image', code_type='barcode', data=sample['barcode_payload'])
+        sample['qr_code_url'] = url_for('api.get_barcode_image', code_type='qrcode', data=sample['qr_payload'])
+    
     return jsonify(samples)
 
 # Category Routes
 @api.route('/categories', methods=['GET'])
+@response_cache.cached('categories')
 def get_categories():
     """Get all categories"""
     categories = Category.query.all()
     return jsonify([category.to_dict() for category in categories])
 
 @api.route('/categories/<int:category_id>', methods=['GET'])
+@response_cache.cached('categories')
 def get_category(category_id):
     """Get a single category by ID"""
     category = Category.query.get_or_404(category_id)
@@ -253,13 +568,8 @@ def update_category(category_id):
     category.discount_threshold = data.get('discount_threshold', category.discount_threshold)
     
     try:
+        # A changed discount threshold reclassifies the category's active products in the same commit
         db.session.commit()
-        
-        # Check all products in this category for expiry status updates
-        products = Product.query.filter_by(category=category.name).all()
-        for product in products:
-            product.check_expiry_status()
-        
         return jsonify(category.to_dict())
     except Exception as e:
         db.session.rollback()
@@ -287,38 +597,25 @@ def delete_category(category_id):
 
 # Waste Record Routes
 @api.route('/waste-records', methods=['GET'])
+@response_cache.cached('waste_records', 'products')
 def get_waste_records():
     """Get all waste records with optional filtering"""
-    start_date = request.args.get('start_date')
-    end_date = request.args.get('end_date')
-    waste_type = request.args.get('waste_type')
-    
-    query = WasteRecord.query
-    
-    if start_date:
-        try:
-            start = datetime.fromisoformat(start_date.replace('Z', '+00:00')).date()
-            query = query.filter(WasteRecord.disposal_date >= start)
-        except ValueError:
-            return jsonify({'error': 'Invalid start_date format'}), 400
-    
-    if end_date:
-        try:
-            end = datetime.fromisoformat(end_date.replace('Z', '+00:00')).date()
-            query = query.filter(WasteRecord.disposal_date <= end)
-        except ValueError:
-            return jsonify({'error': 'Invalid end_date format'}), 400
-    
-    if waste_type:
-        query = query.filter_by(waste_type=waste_type)
+    try:
+        filters = waste_record_filters()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     
-    waste_records = query.all()
-    return jsonify([record.to_dict() for record in waste_records])
+    return paginated_rows(WASTE_RECORD_ROWS, [WasteRecord.disposal_date, WasteRecord.id], filters)
 
 @api.route('/waste-records', methods=['POST'])
 def create_waste_record():
     """Create a new waste record"""
-    data = request.json
+    data = request.json or {}
+    
+    try:
+        product = store_product_or_404(int(data['product_id']))
+    except (KeyError, TypeError, ValueError):
+        return jsonify({'error': 'product_id is required'}), 400
     
     # Convert string date to datetime object
     if 'disposal_date' in data:
@@ -329,8 +626,10 @@ def create_waste_record():
     else:
         data['disposal_date'] = datetime.utcnow()
     
+    # Waste is recorded against the store holding the product
     waste_record = WasteRecord(
-        product_id=data.get('product_id'),
+        product_id=product.id,
+        store_id=product.store_id,
         quantity=data.get('quantity', 0),
         waste_type=data.get('waste_type', WasteType.MIXED.value),
         recyclable=data.get('recyclable', False),
@@ -343,12 +642,20 @@ def create_waste_record():
     
     # Update product status if needed
     if data.get('update_product_status', True):
-        product = Product.query.get(data.get('product_id'))
-        if product:
-            product.status = ProductStatus.DISPOSED.value
-            product.quantity = 0
+        product.status = ProductStatus.DISPOSED.value
+        product.next_transition_date = None
+        product.quantity = 0
     
     try:
+        # Keep the daily rollup in the same transaction as the record
+        utils.record_waste_rollup([(
+            waste_record.disposal_date,
+            waste_record.store_id,
+            product.category,
+            waste_record.waste_type,
+            waste_record.recyclable,
+            waste_record.quantity
+        )])
         db.session.commit()
         return jsonify(waste_record.to_dict()), 201
     except Exception as e:
@@ -356,6 +663,7 @@ def create_waste_record():
         return jsonify({'error': str(e)}), 400
 
 @api.route('/waste-statistics', methods=['GET'])
+@response_cache.cached('waste_daily_rollup')
 def get_waste_statistics():
     """Get waste statistics"""
     start_date = request.args.get('start_date')
@@ -373,10 +681,11 @@ def get_waste_statistics():
         except ValueError:
             return jsonify({'error': 'Invalid end_date format'}), 400
     
-    statistics = utils.get_waste_statistics(start_date, end_date)
+    statistics = utils.get_waste_statistics(start_date, end_date, current_store_id())
     return jsonify(statistics)
 
 @api.route('/waste-statistics/by-category', methods=['GET'])
+@response_cache.cached('waste_daily_rollup')
 def get_waste_by_category():
     """Get waste statistics grouped by category"""
     start_date = request.args.get('start_date')
@@ -394,41 +703,11 @@ def get_waste_by_category():
         except ValueError:
             return jsonify({'error': 'Invalid end_date format'}), 400
     
-    # Query waste records for the given date range
-    query = WasteRecord.query
-    
-    if start_date:
-        query = query.filter(WasteRecord.disposal_date >= start_date)
-    
-    if end_date:
-        query = query.filter(WasteRecord.disposal_date <= end_date)
-    
-    waste_records = query.all()
-    
-    # Group by category
-    waste_by_category = []
-    category_totals = {}
-    
-    for record in waste_records:
-        product = Product.query.get(record.product_id)
-        if not product:
-            continue
-            
-        category = product.category
-        if category not in category_totals:
-            category_totals[category] = 0
-        
-        category_totals[category] += record.quantity
-    
-    for category, total_quantity in category_totals.items():
-        waste_by_category.append({
-            'category': category,
-            'total_quantity': total_quantity
-        })
-    
+    waste_by_category = utils.get_waste_by_category(start_date, end_date, current_store_id())
     return jsonify(waste_by_category)
 
 @api.route('/waste-statistics/over-time', methods=['GET'])
+@response_cache.cached('waste_daily_rollup')
 def get_waste_over_time():
     """Get waste statistics over time"""
     start_date = request.args.get('start_date')
@@ -451,52 +730,19 @@ def get_waste_over_time():
     else:
         end_date = datetime.utcnow().date()
     
-    # Generate a list of all dates in the range
-    date_range = []
-    current_date = start_date
-    while current_date <= end_date:
-        date_range.append(current_date)
-        current_date += timedelta(days=1)
-    
-    # Query waste records for the given date range
-    waste_records = WasteRecord.query.filter(
-        WasteRecord.disposal_date >= start_date,
-        WasteRecord.disposal_date <= end_date
-    ).all()
-    
-    # Initialize data structure
-    waste_over_time = []
-    date_data = {date.isoformat(): {'total_quantity': 0, 'recyclable_quantity': 0} for date in date_range}
-    
-    # Populate with actual data
-    for record in waste_records:
-        date_str = record.disposal_date.isoformat()
-        if date_str in date_data:
-            date_data[date_str]['total_quantity'] += record.quantity
-            if record.recyclable:
-                date_data[date_str]['recyclable_quantity'] += record.quantity
-    
-    # Convert to list format
-    for date_str, data in date_data.items():
-        waste_over_time.append({
-            'date': date_str,
-            'total_quantity': data['total_quantity'],
-            'recyclable_quantity': data['recyclable_quantity']
-        })
-    
-    # Sort by date
-    waste_over_time.sort(key=lambda x: x['date'])
+    waste_over_time = utils.get_waste_over_time(start_date, end_date, current_store_id())
     
     return jsonify(waste_over_time)
 
 # Customer Routes
 @api.route('/customers', methods=['GET'])
+@response_cache.cached('customers')
 def get_customers():
     """Get all customers"""
-    customers = Customer.query.all()
-    return jsonify([customer.to_dict() for customer in customers])
+    return paginated_rows(CUSTOMER_ROWS, [Customer.id])
 
 @api.route('/customers/<int:customer_id>', methods=['GET'])
+@response_cache.cached('customers')
 def get_customer(customer_id):
     """Get a single customer by ID"""
     customer = Customer.query.get_or_404(customer_id)
@@ -552,91 +798,29 @@ def import_customers():
     if not file.filename:
         return jsonify({'error': 'No file selected'}), 400
         
+    # Decode incrementally so large loyalty lists are never held in memory
+    text_stream = io.TextIOWrapper(file.stream, encoding='utf-8', newline='')
+    
+    # Process CSV, JSON (array or single object) or TXT (tab or comma separated) files
+    if file_format == 'csv':
+        rows = utils.iter_csv_rows(text_stream)
+    elif file_format == 'json':
+        rows = utils.iter_json_array_rows(text_stream)
+    elif file_format == 'txt':
+        rows = utils.iter_txt_rows(text_stream)
+    else:
+        return jsonify({'error': 'Unsupported file format'}), 400
+    
     try:
-        customers_data = []
-        
-        # Process CSV file
-        if file_format == 'csv':
-            stream = io.StringIO(file.stream.read().decode("UTF8"), newline=None)
-            csv_reader = csv.DictReader(stream)
-            for row in csv_reader:
-                customers_data.append({
-                    'name': row.get('name', ''),
-                    'email': row.get('email', ''),
-                    'phone': row.get('phone', ''),
-                    'address': row.get('address', '')
-                })
-                
-        # Process JSON file
-        elif file_format == 'json':
-            content = file.read().decode('utf-8')
-            json_data = json.loads(content)
-            
-            # Handle both array of objects and single object
-            if isinstance(json_data, list):
-                customers_data = json_data
-            else:
-                customers_data = [json_data]
-                
-        # Process TXT file (assuming tab or comma separated)
-        elif file_format == 'txt':
-            stream = io.StringIO(file.stream.read().decode("UTF8"), newline=None)
-            for line in stream:
-                # Try to split by tab first, then by comma if not enough fields
-                fields = line.strip().split('\t')
-                if len(fields) < 2:
-                    fields = line.strip().split(',')
-                    
-                if len(fields) >= 2:  # At least name and one contact method
-                    customers_data.append({
-                        'name': fields[0],
-                        'email': fields[1] if len(fields) > 1 else '',
-                        'phone': fields[2] if len(fields) > 2 else '',
-                        'address': fields[3] if len(fields) > 3 else ''
-                    })
-        else:
-            return jsonify({'error': 'Unsupported file format'}), 400
-            
-        # Validate and add customers to database
-        added_count = 0
-        errors = []
-        
-        for idx, customer_data in enumerate(customers_data):
-            # Basic validation
-            if not customer_data.get('name'):
-                errors.append(f"Row {idx+1}: Name is required")
-                continue
-                
-            # Check for duplicate email if provided
-            if customer_data.get('email') and Customer.query.filter_by(email=customer_data['email']).first():
-                errors.append(f"Row {idx+1}: Email {customer_data['email']} already exists")
-                continue
-                
-            # Create new customer
-            new_customer = Customer(
-                name=customer_data.get('name', ''),
-                email=customer_data.get('email', ''),
-                phone=customer_data.get('phone', ''),
-                address=customer_data.get('address', '')
-            )
-            
-            db.session.add(new_customer)
-            added_count += 1
-            
-        # Commit all valid customers
-        if added_count > 0:
-            db.session.commit()
-            
-        return jsonify({
-            'message': f'Successfully imported {added_count} customers',
-            'total': len(customers_data),
-            'added': added_count,
-            'errors': errors
-        })
-        
-    except Exception as e:
+        results = utils.bulk_import_customers(rows)
+    except (UnicodeDecodeError, csv.Error) as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 400
+    
+    return jsonify({
+        'message': f"Successfully imported {results['added']} customers",
+        **results
+    })
 
 @api.route('/customers', methods=['POST'])
 def create_customer():
@@ -661,21 +845,25 @@ def create_customer():
 
 # Purchase History Routes
 @api.route('/purchase-history', methods=['GET'])
+@response_cache.cached('purchase_history', 'customers', 'products')
 def get_purchase_history():
     """Get purchase history with optional filtering"""
     customer_id = request.args.get('customer_id', type=int)
     product_id = request.args.get('product_id', type=int)
+    store_id = current_store_id()
+    
+    filters = []
     
-    query = PurchaseHistory.query
+    if store_id is not None:
+        filters.append(PurchaseHistory.store_id == store_id)
     
     if customer_id:
-        query = query.filter_by(customer_id=customer_id)
+        filters.append(PurchaseHistory.customer_id == customer_id)
     
     if product_id:
-        query = query.filter_by(product_id=product_id)
+        filters.append(PurchaseHistory.product_id == product_id)
     
-    purchases = query.all()
-    return jsonify([purchase.to_dict() for purchase in purchases])
+    return paginated_rows(PURCHASE_ROWS, [PurchaseHistory.id], filters)
 
 @api.route('/purchase-history', methods=['POST'])
 def create_purchase():
@@ -691,9 +879,13 @@ def create_purchase():
     else:
         data['purchase_date'] = datetime.utcnow()
     
+    # Purchases are recorded against the store selling the product
+    store_id = db.session.query(Product.store_id).filter(Product.id == data.get('product_id')).scalar()
+    
     purchase = PurchaseHistory(
         customer_id=data.get('customer_id'),
         product_id=data.get('product_id'),
+        store_id=store_id if store_id is not None else store_id_for(data),
         quantity=data.get('quantity', 1),
         purchase_date=data.get('purchase_date')
     )
@@ -711,7 +903,9 @@ def create_purchase():
 @api.route('/inventory/check-expiry', methods=['POST'])
 def check_expiry():
     """Check for products nearing expiry and update their status"""
-    updated_products = utils.check_expiring_products()
+    # ?full=true re-examines every product in the discount window instead of only those due today
+    full = request.args.get('full', 'false').lower() == 'true'
+    updated_products = utils.check_expiring_products(full=full)
     return jsonify({
         'updated_count': len(updated_products),
         'updated_products': updated_products
@@ -727,32 +921,206 @@ def process_expired():
     })
 
 @api.route('/inventory/fefo', methods=['GET'])
+@response_cache.cached('products', 'categories')
 def get_fefo_inventory():
     """Get inventory sorted by First-Expiry-First-Out (FEFO) principle"""
-    sorted_inventory = utils.sort_inventory_by_fefo()
+    # ?category=Dairy,Bakery&location=A1&per_category=5 narrows the pick list
+    categories = [name for name in request.args.get('category', '').split(',') if name]
+    location = request.args.get('location')
+    per_category = request.args.get('per_category')
+    
+    if per_category is not None:
+        try:
+            per_category = int(per_category)
+            if per_category < 1:
+                raise ValueError
+        except ValueError:
+            return jsonify({'error': 'per_category must be a positive integer'}), 400
+    
+    sorted_inventory = utils.sort_inventory_by_fefo(categories, location, per_category, current_store_id())
     return jsonify(sorted_inventory)
 
+@api.route('/inventory/summary', methods=['GET'])
+@response_cache.cached('products', 'discount_notifications')
+def get_inventory_summary():
+    """Count products by status, those expiring within a week and pending notifications"""
+    try:
+        filters = product_filters()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    today = datetime.utcnow().date()
+    counts = dict(
+        db.session.query(Product.status, db.func.count(Product.id))
+        .filter(*filters)
+        .group_by(Product.status)
+        .all()
+    )
+    expiring = db.session.query(db.func.count(Product.id)).filter(
+        *filters,
+        Product.status == ProductStatus.ACTIVE.value,
+        Product.expiry_date > today,
+        Product.expiry_date <= today + timedelta(days=7)
+    ).scalar()
+    
+    notifications = db.session.query(db.func.count(DiscountNotification.id)).filter(
+        DiscountNotification.status == NotificationStatus.PENDING.value,
+        *notification_store_filters()
+    )
+    
+    summary = {status.value: counts.get(status.value, 0) for status in ProductStatus}
+    summary.update({
+        'total': sum(counts.values()),
+        'expiring': expiring,
+        'pending_notifications': notifications.scalar()
+    })
+    return jsonify(summary)
+
 # Notification Routes
+def notification_store_filters():
+    """Scope notifications to the current store; they belong to the store of the product they announce"""
+    store_id = current_store_id()
+    if store_id is None:
+        return []
+    return [DiscountNotification.product_id.in_(db.session.query(Product.id).filter(Product.store_id == store_id))]
+
 @api.route('/notifications', methods=['GET'])
+@response_cache.cached('discount_notifications', 'customers', 'products')
 def get_notifications():
     """Get all notifications with optional filtering"""
     customer_id = request.args.get('customer_id', type=int)
     status = request.args.get('status')
     
-    query = DiscountNotification.query
+    filters = notification_store_filters()
     
     if customer_id:
-        query = query.filter_by(customer_id=customer_id)
+        filters.append(DiscountNotification.customer_id == customer_id)
     
     if status:
-        query = query.filter_by(status=status)
+        filters.append(DiscountNotification.status == status)
     
-    notifications = query.all()
-    return jsonify([notification.to_dict() for notification in notifications])
+    return paginated_rows(NOTIFICATION_ROWS, [DiscountNotification.id], filters)
 
 @api.route('/notifications/process', methods=['POST'])
 def process_notifications():
     """Process pending notifications"""
-    from app import mail
+    mail = current_app.extensions['mail']
     results = utils.process_pending_notifications(mail)
     return jsonify(results)
+
+# Scheduler Routes
+@api.route('/jobs', methods=['GET'])
+def get_jobs():
+    """Get schedule, lock state and last-run metrics of the background jobs"""
+    jobs = ScheduledJob.query.order_by(ScheduledJob.name).all()
+    return jsonify([job.to_dict() for job in jobs])
+
+# Store Routes
+@api.route('/stores', methods=['GET'])
+@response_cache.cached('stores')
+def get_stores():
+    """Get all stores of the chain"""
+    stores = Store.query.order_by(Store.id).all()
+    return jsonify([store.to_dict() for store in stores])
+
+@api.route('/stores', methods=['POST'])
+def create_store():
+    """Register a new store, creating its database file when stores are sharded"""
+    data = request.json or {}
+    code = data.get('code')
+    
+    if not code or not STORE_CODE_PATTERN.match(code):
+        return jsonify({'error': 'code must be 1-32 letters, digits, - or _'}), 400
+    if not data.get('name'):
+        return jsonify({'error': 'name is required'}), 400
+    if Store.query.filter_by(code=code).first():
+        return jsonify({'error': f'Store {code} already exists'}), 400
+    
+    store = Store(code=code, name=data['name'], address=data.get('address'))
+    db.session.add(store)
+    
+    try:
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 400
+    
+    if store_router.enabled:
+        store_router.create_database(code)
+    
+    return jsonify(store.to_dict()), 201
+
+@api.route('/chain/waste-statistics', methods=['GET'])
+@response_cache.cached('waste_daily_rollup', 'stores', versions=chain_versions)
+def get_chain_waste_statistics():
+    """Get waste statistics per store and for the whole chain"""
+    start_date = request.args.get('start_date')
+    end_date = request.args.get('end_date')
+    
+    try:
+        if start_date:
+            start_date = datetime.fromisoformat(start_date.replace('Z', '+00:00')).date()
+        else:
+            start_date = datetime.utcnow().date() - timedelta(days=30)
+        if end_date:
+            end_date = datetime.fromisoformat(end_date.replace('Z', '+00:00')).date()
+        else:
+            end_date = datetime.utcnow().date()
+    except ValueError:
+        return jsonify({'error': 'Invalid date format'}), 400
+    
+    # Each store's statistics come from its own rollup (its own database file when sharded)
+    per_store = for_each_store(lambda: utils.get_waste_statistics(start_date, end_date, current_store_id()))
+    return jsonify(merge_waste_statistics(per_store, start_date, end_date))
+
+# Export Routes
+@api.route('/export/products', methods=['GET'])
+def export_products():
+    """Stream all products matching the /products filters as NDJSON or CSV"""
+    try:
+        filters = product_filters()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    return export_rows(PRODUCT_ROWS, filters, 'products')
+
+@api.route('/export/waste-records', methods=['GET'])
+def export_waste_records():
+    """Stream the full waste record history matching the /waste-records filters as NDJSON or CSV"""
+    try:
+        filters = waste_record_filters()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    return export_rows(WASTE_RECORD_ROWS, filters, 'waste_records')
+
+# Event Routes
+@api.route('/events', methods=['GET'])
+def stream_events():
+    """Stream product status, waste record and notification changes as server-sent events"""
+    stream = event_broker.open_stream(current_store_id())
+    if stream is None:
+        response = jsonify({'error': 'Too many open event streams, poll instead'})
+        response.headers['Retry-After'] = '30'
+        return response, 503
+    
+    response = current_app.response_class(stream, mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'  # Let proxies pass events through as they are written
+    return response
+
+# Instrumentation Routes
+@api.route('/_metrics', methods=['GET'])
+def get_metrics():
+    """Get request latency, SQL statement and N+1 metrics for this worker in Prometheus text format"""
+    return current_app.response_class(request_metrics.render(), mimetype='text/plain; version=0.0.4')
+
+# Cache Routes
+@api.route('/cache/stats', methods=['GET'])
+def get_cache_stats():
+    """Get response cache counters, the scan index size, image cache counters and event streams for this worker"""
+    stats = response_cache.stats()
+    stats['scan_index'] = barcode_index.stats()
+    stats['image_cache'] = image_cache.stats()
+    stats['events'] = event_broker.stats()
+    return jsonify(stats)
@@ -0,0 +1,240 @@
+from collections import OrderedDict
+from datetime import date, datetime
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from backend.models import db, Product, Category, ProductStatus, DEFAULT_DISCOUNT_THRESHOLD, classify_expiry
+from backend.cache import response_cache
+from backend.sharding import store_router
+import threading
+
+# Product columns kept in the scan index, in Product.to_dict order
+SNAPSHOT_COLUMNS = ('id', 'name', 'barcode', 'category', 'expiry_date', 'manufacture_date', 'quantity', 'unit',
+                    'price', 'discounted_price', 'location', 'store_id', 'status', 'created_at', 'updated_at')
+DATE_COLUMNS = ('expiry_date', 'manufacture_date')
+TRACKED_TABLES = ('products', 'categories')
+DEFAULT_MAX_ENTRIES = 50000  # Cached products per worker
+
+def _snapshot_row(values):
+    """Convert product column values to the stored (expiry_date, serialized dict) pair"""
+    row = {}
+    for column, value in zip(SNAPSHOT_COLUMNS, values):
+        # Routes may assign datetimes to Date columns before the flush; the database keeps the date
+        if column in DATE_COLUMNS and isinstance(value, datetime):
+            value = value.date()
+        row[column] = value.isoformat() if hasattr(value, 'isoformat') else value
+    return date.fromisoformat(row['expiry_date']), row
+
+class BarcodeIndex:
+    """
+    In-process LRU of barcode -> product rows serving the scan endpoints
+    
+    Lookups of cached barcodes never read product rows: days until expiry
+    and the discount status are derived from the entry at read time, and
+    the status write itself is left to the expiry sweep. Barcodes not yet
+    cached are fetched with one indexed barcode IN (...) query, so a worker
+    only holds the products that are actually scanned. Commits made through
+    the ORM in this process are applied to the cached rows by session hooks;
+    any other write (bulk statements, other gunicorn workers, the job
+    worker) moves the database-backed change versions, which are checked on
+    every lookup, and drops the cached rows.
+    """
+    
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._rows = OrderedDict()
+        self._barcodes_by_id = {}
+        self._thresholds = None
+        self._versions = None
+        self._lock = threading.Lock()
+    
+    def init_app(self, app):
+        """Configure the entry limit from SCAN_INDEX_MAX_ENTRIES"""
+        self.max_entries = app.config.get('SCAN_INDEX_MAX_ENTRIES', DEFAULT_MAX_ENTRIES)
+    
+    def lookup(self, barcodes):
+        """Return {barcode: product dict} for the given barcodes that exist"""
+        versions, thresholds = self._ensure_fresh()
+        
+        found = {}
+        misses = []
+        with self._lock:
+            for barcode in barcodes:
+                entry = self._rows.get(barcode)
+                if entry is None:
+                    misses.append(barcode)
+                else:
+                    self._rows.move_to_end(barcode)
+                    found[barcode] = entry
+        
+        if misses:
+            entries = self._load_products(Product.barcode.in_(misses))
+            with self._lock:
+                # Rows read while another commit was applied may predate it, so only cache them
+                # if the versions they were read under are still current
+                cacheable = versions == self._versions
+                for entry in entries:
+                    found[entry[1]['barcode']] = entry
+                    if cacheable:
+                        self._store(entry)
+        
+        today = datetime.utcnow().date()
+        return {barcode: self._effective(entry, today, thresholds) for barcode, entry in found.items()}
+    
+    def invalidate(self):
+        """Drop every cached row and threshold"""
+        with self._lock:
+            self._rows.clear()
+            self._barcodes_by_id.clear()
+            self._thresholds = None
+    
+    def apply(self, rows, touched_tables, reload_products, reload_thresholds):
+        """Apply the product rows written by a committed transaction"""
+        with self._lock:
+            if reload_products:
+                self._rows.clear()
+                self._barcodes_by_id.clear()
+            else:
+                for product_id, entry in rows.items():
+                    # Only rows already cached are refreshed; others are fetched when first scanned
+                    old_barcode = self._barcodes_by_id.pop(product_id, None)
+                    if old_barcode is None:
+                        continue
+                    self._rows.pop(old_barcode, None)
+                    if entry is not None:
+                        self._store(entry)
+            
+            if reload_thresholds:
+                self._thresholds = None
+            
+            # The commit moves exactly the touched versions; anything else came from elsewhere
+            if self._versions is not None:
+                self._versions = [
+                    version + (1 if table in touched_tables else 0)
+                    for table, version in zip(TRACKED_TABLES, self._versions)
+                ]
+    
+    def stats(self):
+        """Return the number of cached rows for this process"""
+        return {
+            'products': len(self._rows),
+            'max_entries': self.max_entries,
+            'versions': self._versions
+        }
+    
+    def _store(self, entry):
+        barcode = entry[1]['barcode']
+        self._rows[barcode] = entry
+        self._rows.move_to_end(barcode)
+        self._barcodes_by_id[entry[1]['id']] = barcode
+        
+        # Evict least recently scanned products
+        while len(self._rows) > self.max_entries:
+            _, (_, evicted) = self._rows.popitem(last=False)
+            self._barcodes_by_id.pop(evicted['id'], None)
+    
+    def _ensure_fresh(self):
+        """Drop cached rows if another process changed their tables; return the versions and thresholds"""
+        versions = response_cache.versions(TRACKED_TABLES)
+        
+        with self._lock:
+            if self._versions is not None and versions != self._versions:
+                products_version, categories_version = self._versions
+                if versions[0] != products_version:
+                    self._rows.clear()
+                    self._barcodes_by_id.clear()
+                if versions[1] != categories_version:
+                    self._thresholds = None
+            self._versions = versions
+            thresholds = self._thresholds
+        
+        if thresholds is None:
+            thresholds = dict(db.session.query(Category.name, Category.discount_threshold).all())
+            with self._lock:
+                if versions == self._versions:
+                    self._thresholds = thresholds
+        
+        return versions, thresholds
+    
+    def _load_products(self, *criteria):
+        columns = [getattr(Product, column) for column in SNAPSHOT_COLUMNS]
+        query = db.session.query(*columns)
+        if criteria:
+            query = query.filter(*criteria)
+        return [_snapshot_row(tuple(values)) for values in query]
+    
+    def _effective(self, entry, today, thresholds):
+        expiry_date, row = entry
+        product = dict(row)
+        days_until_expiry = (expiry_date - today).days
+        
+        discount_threshold = thresholds.get(product['category']) or DEFAULT_DISCOUNT_THRESHOLD
+        
+        # What the expiry sweep will store; disposed products are final
+        if product['status'] != ProductStatus.DISPOSED.value:
+            product['status'], product['discounted_price'] = classify_expiry(
+                product['status'], product['price'], product['discounted_price'], days_until_expiry, discount_threshold
+            )
+        
+        # Keep Product.to_dict key order
+        product['days_until_expiry'] = days_until_expiry
+        product['created_at'] = product.pop('created_at')
+        product['updated_at'] = product.pop('updated_at')
+        return product
+
+barcode_index = BarcodeIndex()
+
+# Capture the products a transaction writes while their attributes are still loaded,
+# and apply them to the index once it commits
+def _scan_changes(session):
+    return session.info.setdefault('scan_index_changes', {
+        'rows': {},
+        'reload_products': False,
+        'reload_thresholds': False
+    })
+
+@event.listens_for(Session, 'after_flush')
+def _track_flushed_products(session, flush_context):
+    for instance in list(session.new) + list(session.dirty):
+        if isinstance(instance, Product):
+            values = tuple(getattr(instance, column) for column in SNAPSHOT_COLUMNS)
+            _scan_changes(session)['rows'][instance.id] = _snapshot_row(values)
+        elif isinstance(instance, Category):
+            _scan_changes(session)['reload_thresholds'] = True
+    
+    for instance in session.deleted:
+        if isinstance(instance, Product):
+            _scan_changes(session)['rows'][instance.id] = None
+        elif isinstance(instance, Category):
+            _scan_changes(session)['reload_thresholds'] = True
+
+@event.listens_for(Session, 'do_orm_execute')
+def _track_bulk_products(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        # ORM statements carry an annotated copy of the table, so compare by name
+        table_name = getattr(getattr(orm_execute_state.statement, 'table', None), 'name', None)
+        if table_name == Product.__tablename__:
+            _scan_changes(orm_execute_state.session)['reload_products'] = True
+        elif table_name == Category.__tablename__:
+            _scan_changes(orm_execute_state.session)['reload_thresholds'] = True
+
+# Inserted ahead of the response cache listener, which consumes changed_tables and bumps the versions
+@event.listens_for(Session, 'after_commit', insert=True)
+def _apply_committed_products(session):
+    changes = session.info.pop('scan_index_changes', None)
+    if changes is None:
+        return
+    
+    # The index mirrors the main database; commits to a store's own file are not part of it
+    if store_router.current_engine() is not None:
+        return
+    
+    barcode_index.apply(
+        changes['rows'],
+        session.info.get('changed_tables', set()),
+        changes['reload_products'],
+        changes['reload_thresholds']
+    )
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_rolled_back_products(session):
+    session.info.pop('scan_index_changes', None)
@@ -0,0 +1,167 @@
+from datetime import datetime, timedelta
+from backend.models import db, ScheduledJob, dialect_insert
+from backend import utils
+from backend.sharding import store_router
+from backend.stores import for_each_store
+import json
+import logging
+import os
+import socket
+import time
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_POLL_INTERVAL = 30  # Seconds between checks for due jobs
+DEFAULT_LOCK_TIMEOUT = 1800  # Seconds a worker may hold a job before another may take it over
+
+def check_expiring_products_job(app):
+    updated_products = utils.check_expiring_products()
+    return {'updated': len(updated_products)}
+
+def process_expired_products_job(app):
+    processed_records = utils.process_expired_products()
+    return {'processed': len(processed_records)}
+
+def process_notifications_job(app):
+    return utils.process_pending_notifications(app.extensions['mail'])
+
+# Registered jobs: name -> (callable, default interval in seconds)
+JOBS = {
+    'check_expiring_products': (check_expiring_products_job, 3600),
+    'process_expired_products': (process_expired_products_job, 3600),
+    'process_pending_notifications': (process_notifications_job, 900),
+}
+
+class JobScheduler:
+    """
+    Runs registered jobs on their intervals using the scheduled_jobs table
+    
+    Any number of web or worker processes may run a scheduler; a job only
+    runs in the process that wins its lease with a conditional UPDATE, so it
+    is never executed twice concurrently. Intervals can be overridden with
+    the SCHEDULER_INTERVALS setting.
+    """
+    
+    def __init__(self, app, jobs=None, worker_id=None):
+        self.app = app
+        self.jobs = jobs if jobs is not None else JOBS
+        self.worker_id = worker_id or f'{socket.gethostname()}:{os.getpid()}'
+        self.lock_timeout = app.config.get('SCHEDULER_LOCK_TIMEOUT', DEFAULT_LOCK_TIMEOUT)
+        self.intervals = {
+            name: app.config.get('SCHEDULER_INTERVALS', {}).get(name, interval)
+            for name, (job, interval) in self.jobs.items()
+        }
+    
+    def register_jobs(self):
+        """Create missing job rows and apply the configured intervals"""
+        now = datetime.utcnow()
+        table = ScheduledJob.__table__
+        
+        for name, interval in self.intervals.items():
+            db.session.execute(dialect_insert(table).values(
+                name=name,
+                interval_seconds=interval,
+                next_run_at=now,
+                run_count=0,
+                failure_count=0
+            ).on_conflict_do_nothing())
+            db.session.execute(
+                db.update(table).where(table.c.name == name).values(interval_seconds=interval)
+            )
+        
+        db.session.commit()
+    
+    def run_pending(self):
+        """Run every job that is due and not locked by another worker"""
+        ran = []
+        for name in self.jobs:
+            if self.run_job(name):
+                ran.append(name)
+        return ran
+    
+    def run_job(self, name, force=False):
+        """Run a job if this worker wins its lease; returns False if it was not run"""
+        if not self._acquire(name, force):
+            return False
+        
+        job, interval = self.jobs[name]
+        started_at = datetime.utcnow()
+        started = time.monotonic()
+        result = None
+        error = None
+        
+        logger.info(f"Running job {name}")
+        try:
+            if store_router.enabled:
+                # Each store's database is swept in its own context; the lease stays in the main database
+                result = {store.code: store_result for store, store_result in for_each_store(lambda: job(self.app))}
+            else:
+                result = job(self.app)
+        except Exception as e:
+            db.session.rollback()
+            error = str(e)
+            logger.error(f"Error in job {name}: {error}")
+        
+        duration = time.monotonic() - started
+        finished_at = datetime.utcnow()
+        table = ScheduledJob.__table__
+        
+        values = {
+            'locked_by': None,
+            'locked_until': None,
+            'next_run_at': started_at + timedelta(seconds=self.intervals[name]),
+            'last_started_at': started_at,
+            'last_finished_at': finished_at,
+            'last_duration': duration,
+            'last_error': error,
+            'run_count': table.c.run_count + 1
+        }
+        if error is None:
+            values['last_success_at'] = finished_at
+            values['last_result'] = json.dumps(result, default=str)
+        else:
+            values['failure_count'] = table.c.failure_count + 1
+        
+        db.session.execute(
+            db.update(table).where(table.c.name == name, table.c.locked_by == self.worker_id).values(**values)
+        )
+        db.session.commit()
+        
+        logger.info(f"Job {name} finished in {duration:.2f}s: {result if error is None else error}")
+        return True
+    
+    def run_forever(self, poll_interval=None):
+        """Poll for due jobs until the process exits"""
+        poll_interval = poll_interval or self.app.config.get('SCHEDULER_POLL_INTERVAL', DEFAULT_POLL_INTERVAL)
+        
+        with self.app.app_context():
+            self.register_jobs()
+        
+        while True:
+            try:
+                # Create a new application context for each iteration
+                with self.app.app_context():
+                    self.run_pending()
+            except Exception as e:
+                logger.error(f"Error in scheduled tasks: {str(e)}")
+            
+            time.sleep(poll_interval)
+    
+    def _acquire(self, name, force):
+        now = datetime.utcnow()
+        table = ScheduledJob.__table__
+        
+        # Only one worker's UPDATE can match while the lease is free
+        conditions = [
+            table.c.name == name,
+            db.or_(table.c.locked_until.is_(None), table.c.locked_until < now)
+        ]
+        if not force:
+            conditions.append(table.c.next_run_at <= now)
+        
+        result = db.session.execute(db.update(table).where(*conditions).values(
+            locked_by=self.worker_id,
+            locked_until=now + timedelta(seconds=self.lock_timeout)
+        ))
+        db.session.commit()
+        return result.rowcount == 1
@@ -0,0 +1,190 @@
+from datetime import datetime
+from flask.json.provider import DefaultJSONProvider
+from backend.models import db, Product, WasteRecord, Customer, PurchaseHistory, DiscountNotification
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+def isoformat(value, today):
+    return value.isoformat() if value else None
+
+def days_until(value, today):
+    return (value - today).days if value else None
+
+class RowSpec:
+    """
+    Maps the fields of a list endpoint to SQL columns and per-field formatters
+    
+    Lists are served from row tuples instead of ORM objects: only the columns
+    behind the requested fields are selected, related names come from explicit
+    outer joins rather than a lazy load per row, and each row becomes a dict in
+    one pass. Field order matches the model's to_dict.
+    """
+    
+    def __init__(self, entity, fields, joins=()):
+        self.entity = entity
+        self.fields = {}
+        for field in fields:
+            name, column = field[:2]
+            self.fields[name] = (column, field[2] if len(field) > 2 else None)
+        self.field_names = tuple(self.fields)
+        self.joins = joins
+    
+    def columns(self, fields=None):
+        """Return the labeled columns behind `fields` (every field if None), in order"""
+        return [self.fields[name][0].label(name) for name in (fields or self.field_names)]
+    
+    def query(self, fields=None, extra_columns=()):
+        """
+        Build a query selecting `fields`, followed by any `extra_columns` not already selected
+        
+        Extra columns such as pagination sort keys are labeled with their
+        column key, so a field of the same name must be the same column.
+        """
+        names = list(fields or self.field_names)
+        columns = self.columns(names)
+        selected = [self.fields[name][0] for name in names]
+        
+        for column in extra_columns:
+            if column.key not in names:
+                columns.append(column.label(column.key))
+                selected.append(column)
+                names.append(column.key)
+        
+        query = db.session.query(*columns).select_from(self.entity)
+        
+        # Join only the tables whose columns were asked for
+        for model, onclause in self.joins:
+            if any(getattr(column, 'class_', None) is model for column in selected):
+                query = query.outerjoin(model, onclause)
+        
+        return query
+    
+    def serializer(self, fields=None):
+        """Return a function turning a row of query(fields) into a dict"""
+        today = datetime.utcnow().date()
+        formatters = [(name, self.fields[name][1]) for name in (fields or self.field_names)]
+        
+        def serialize(row):
+            return {
+                name: formatter(row[i], today) if formatter else row[i]
+                for i, (name, formatter) in enumerate(formatters)
+            }
+        
+        return serialize
+
+PRODUCT_ROWS = RowSpec(Product, [
+    ('id', Product.id),
+    ('name', Product.name),
+    ('barcode', Product.barcode),
+    ('category', Product.category),
+    ('expiry_date', Product.expiry_date, isoformat),
+    ('manufacture_date', Product.manufacture_date, isoformat),
+    ('quantity', Product.quantity),
+    ('unit', Product.unit),
+    ('price', Product.price),
+    ('discounted_price', Product.discounted_price),
+    ('location', Product.location),
+    ('store_id', Product.store_id),
+    ('status', Product.status),
+    ('days_until_expiry', Product.expiry_date, days_until),
+    ('created_at', Product.created_at, isoformat),
+    ('updated_at', Product.updated_at, isoformat)
+])
+
+WASTE_RECORD_ROWS = RowSpec(WasteRecord, [
+    ('id', WasteRecord.id),
+    ('product_id', WasteRecord.product_id),
+    ('product_name', Product.name),
+    ('store_id', WasteRecord.store_id),
+    ('quantity', WasteRecord.quantity),
+    ('waste_type', WasteRecord.waste_type),
+    ('recyclable', WasteRecord.recyclable),
+    ('disposal_method', WasteRecord.disposal_method),
+    ('disposal_date', WasteRecord.disposal_date, isoformat),
+    ('notes', WasteRecord.notes),
+    ('created_at', WasteRecord.created_at, isoformat)
+], joins=[(Product, Product.id == WasteRecord.product_id)])
+
+CUSTOMER_ROWS = RowSpec(Customer, [
+    ('id', Customer.id),
+    ('name', Customer.name),
+    ('email', Customer.email),
+    ('phone', Customer.phone),
+    ('notification_preference', Customer.notification_preference),
+    ('created_at', Customer.created_at, isoformat),
+    ('updated_at', Customer.updated_at, isoformat)
+])
+
+PURCHASE_ROWS = RowSpec(PurchaseHistory, [
+    ('id', PurchaseHistory.id),
+    ('customer_id', PurchaseHistory.customer_id),
+    ('customer_name', Customer.name),
+    ('product_id', PurchaseHistory.product_id),
+    ('product_name', Product.name),
+    ('store_id', PurchaseHistory.store_id),
+    ('quantity', PurchaseHistory.quantity),
+    ('purchase_date', PurchaseHistory.purchase_date, isoformat),
+    ('created_at', PurchaseHistory.created_at, isoformat)
+], joins=[
+    (Customer, Customer.id == PurchaseHistory.customer_id),
+    (Product, Product.id == PurchaseHistory.product_id)
+])
+
+NOTIFICATION_ROWS = RowSpec(DiscountNotification, [
+    ('id', DiscountNotification.id),
+    ('customer_id', DiscountNotification.customer_id),
+    ('customer_name', Customer.name),
+    ('product_id', DiscountNotification.product_id),
+    ('product_name', Product.name),
+    ('notification_date', DiscountNotification.notification_date, isoformat),
+    ('notification_type', DiscountNotification.notification_type),
+    ('status', DiscountNotification.status),
+    ('attempts', DiscountNotification.attempts),
+    ('last_attempt_at', DiscountNotification.last_attempt_at, isoformat),
+    ('created_at', DiscountNotification.created_at, isoformat)
+], joins=[
+    (Customer, Customer.id == DiscountNotification.customer_id),
+    (Product, Product.id == DiscountNotification.product_id)
+])
+
+if orjson is not None:
+    # Sorted keys match the stdlib encoder's output; datetimes are passed through
+    # to Flask's default so they stay HTTP dates
+    ORJSON_OPTIONS = orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+
+class FastJSONProvider(DefaultJSONProvider):
+    """Flask JSON provider encoding with orjson when it is installed, and the stdlib json otherwise"""
+    
+    def dumps(self, obj, **kwargs):
+        if orjson is None or kwargs:
+            return super().dumps(obj, **kwargs)
+        try:
+            return orjson.dumps(obj, default=self.default, option=ORJSON_OPTIONS).decode('utf-8')
+        except orjson.JSONEncodeError:
+            # e.g. integers beyond 64 bits
+            return super().dumps(obj)
+    
+    def loads(self, s, **kwargs):
+        if orjson is None or kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+    
+    def response(self, *args, **kwargs):
+        if orjson is None:
+            return super().response(*args, **kwargs)
+        
+        obj = self._prepare_response_obj(args, kwargs)
+        options = ORJSON_OPTIONS | orjson.OPT_APPEND_NEWLINE
+        if (self.compact is None and self._app.debug) or self.compact is False:
+            options |= orjson.OPT_INDENT_2
+        
+        try:
+            body = orjson.dumps(obj, default=self.default, option=options)
+        except orjson.JSONEncodeError:
+            return super().response(*args, **kwargs)
+        
+        # Encoded straight to bytes, skipping the str round trip
+        return self._app.response_class(body, mimetype=self.mimetype)
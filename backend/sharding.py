@@ -0,0 +1,107 @@
+from contextlib import contextmanager
+from flask import g, has_app_context
+from flask_sqlalchemy.session import Session
+from sqlalchemy import create_engine
+from backend.database import engine_options, configure_engine
+import os
+import re
+import threading
+
+SCHEMA_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'database', 'schema.sql')
+STORE_CODE_PATTERN = re.compile(r'^[A-Za-z0-9_-]{1,32}$')
+
+def _apply_schema(engine):
+    with open(SCHEMA_PATH) as f:
+        schema_sql = f.read()
+    
+    connection = engine.raw_connection()
+    try:
+        connection.executescript(schema_sql)
+        connection.commit()
+    finally:
+        connection.close()
+
+class StoreRouter:
+    """
+    Routes store-scoped sessions to one SQLite file per store
+    
+    Disabled unless STORE_DATABASE_DIR is set. When enabled, the main
+    database keeps the store registry and the job leases, and every session
+    opened in a store context (g.store_shard, set for /api/stores/<code>/...
+    requests and by for_each_store) runs entirely against
+    <STORE_DATABASE_DIR>/<code>.db, a complete database with the full schema.
+    """
+    
+    def __init__(self):
+        self.directory = None
+        self._engines = {}
+        self._lock = threading.Lock()
+    
+    def init_app(self, app):
+        """Enable per-store files if STORE_DATABASE_DIR is set"""
+        self.directory = app.config.get('STORE_DATABASE_DIR')
+        self.production = app.config.get('APP_ENV') == 'production'
+        if self.directory:
+            os.makedirs(self.directory, exist_ok=True)
+    
+    @property
+    def enabled(self):
+        return bool(self.directory)
+    
+    def path_for(self, code):
+        if not STORE_CODE_PATTERN.match(code):
+            raise ValueError(f'Invalid store code: {code}')
+        return os.path.join(self.directory, f'{code}.db')
+    
+    def engine_for(self, code):
+        """Return the engine of a store's database, creating the file from the schema if it is missing"""
+        with self._lock:
+            engine = self._engines.get(code)
+            if engine is None:
+                path = self.path_for(code)
+                missing = not os.path.exists(path)
+                uri = f'sqlite:///{path}'
+                engine = create_engine(uri, **engine_options(uri, self.production))
+                configure_engine(engine)
+                if missing:
+                    _apply_schema(engine)
+                self._engines[code] = engine
+            return engine
+    
+    def current_engine(self):
+        """Return the engine of the store this app context is scoped to, or None"""
+        if not self.enabled or not has_app_context():
+            return None
+        code = g.get('store_shard')
+        return self.engine_for(code) if code else None
+    
+    def create_database(self, code):
+        """Create a store's database file from the schema; existing tables are left alone"""
+        _apply_schema(self.engine_for(code))
+    
+    @contextmanager
+    def store_context(self, app, store_id, code):
+        """Push an app context, with its own session, scoped to one store"""
+        with app.app_context():
+            g.store_id = store_id
+            if self.enabled:
+                g.store_shard = code
+            yield
+    
+    def dispose(self):
+        with self._lock:
+            for engine in self._engines.values():
+                engine.dispose()
+            self._engines.clear()
+
+class StoreSession(Session):
+    """Flask-SQLAlchemy session that binds to the current store's database when sharding is enabled"""
+    
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None:
+            engine = store_router.current_engine()
+            if engine is not None:
+                return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+store_router = StoreRouter()
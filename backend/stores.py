@@ -0,0 +1,132 @@
+from concurrent.futures import ThreadPoolExecutor
+from flask import abort, current_app, g, has_request_context, request
+from backend.models import db, Store
+from backend.cache import response_cache
+from backend.sharding import store_router
+
+DEFAULT_FAN_OUT_WORKERS = 8
+
+def current_store_id():
+    """
+    Return the store the current request is scoped to, or None for chain-wide
+    
+    /api/stores/<code>/... requests are scoped by their URL; other requests
+    may pass ?store_id=.
+    """
+    store_id = g.get('store_id')
+    if store_id is not None:
+        return store_id
+    if has_request_context():
+        return request.args.get('store_id', type=int)
+    return None
+
+def store_id_for(data):
+    """Return the store a new row belongs to: the URL's store, else data['store_id'], else ?store_id="""
+    if g.get('store_id') is not None:
+        return g.store_id
+    return data.get('store_id', current_store_id())
+
+def resolve_store_scope(endpoint, values):
+    """url_value_preprocessor scoping a /api/stores/<store_code>/... request to its store"""
+    if not values or 'store_code' not in values:
+        return
+    
+    code = values.pop('store_code')
+    
+    # The registry lives in the main database, so look the store up before scoping the session
+    store_id = db.session.query(Store.id).filter(Store.code == code).scalar()
+    if store_id is None:
+        abort(404)
+    
+    g.store_id = store_id
+    if store_router.enabled:
+        g.store_shard = code
+
+def list_stores():
+    """Return (id, code, name) of every store, from the main database"""
+    return db.session.query(Store.id, Store.code, Store.name).order_by(Store.id).all()
+
+def for_each_store(fn, max_workers=None):
+    """
+    Call fn() once per store, each call in its own store-scoped app context
+    
+    With per-store databases the calls run in parallel threads, one database
+    file each; with a single database they run one after another.
+    
+    Returns:
+        list: (store row, fn() result) pairs in store order
+    """
+    app = current_app._get_current_object()
+    stores = list_stores()
+    
+    def run(store):
+        with store_router.store_context(app, store.id, store.code):
+            return fn()
+    
+    if store_router.enabled and len(stores) > 1:
+        workers = max_workers or app.config.get('STORE_FAN_OUT_WORKERS', DEFAULT_FAN_OUT_WORKERS)
+        with ThreadPoolExecutor(max_workers=min(workers, len(stores))) as executor:
+            results = list(executor.map(run, stores))
+    else:
+        results = [run(store) for store in stores]
+    
+    return list(zip(stores, results))
+
+def chain_versions(tables):
+    """
+    Return change versions of `tables` for views reading every store
+    
+    With per-store databases each store file keeps its own versions, so they
+    are summed with the main database's; any write anywhere moves the sum.
+    """
+    versions = response_cache.versions(tables)
+    if store_router.enabled:
+        for _, store_versions in for_each_store(lambda: response_cache.versions(tables)):
+            versions = [total + version for total, version in zip(versions, store_versions)]
+    return versions
+
+def merge_waste_statistics(per_store, start_date, end_date):
+    """
+    Combine get_waste_statistics results of several stores into chain-wide totals
+    
+    Args:
+        per_store (list): (store row, statistics dict) pairs from for_each_store
+        start_date (date): First disposal date covered
+        end_date (date): Last disposal date covered
+    
+    Returns:
+        dict: Chain totals in the get_waste_statistics shape, plus a per-store breakdown
+    """
+    total_waste = 0
+    recyclable_waste = 0
+    waste_by_type = {}
+    waste_by_date = {}
+    stores = []
+    
+    for store, statistics in per_store:
+        total_waste += statistics['total_waste']
+        recyclable_waste += statistics['recyclable_waste']
+        for waste_type, quantity in statistics['waste_by_type'].items():
+            waste_by_type[waste_type] = waste_by_type.get(waste_type, 0) + quantity
+        for date_str, quantity in statistics['waste_by_date'].items():
+            waste_by_date[date_str] = waste_by_date.get(date_str, 0) + quantity
+        stores.append({
+            'store_id': store.id,
+            'code': store.code,
+            'name': store.name,
+            'total_waste': statistics['total_waste'],
+            'recyclable_waste': statistics['recyclable_waste'],
+            'recyclable_percentage': statistics['recyclable_percentage']
+        })
+    
+    return {
+        'total_waste': total_waste,
+        'recyclable_waste': recyclable_waste,
+        'non_recyclable_waste': total_waste - recyclable_waste,
+        'recyclable_percentage': (recyclable_waste / total_waste * 100) if total_waste > 0 else 0,
+        'waste_by_type': waste_by_type,
+        'waste_by_date': dict(sorted(waste_by_date.items())),
+        'start_date': start_date.isoformat(),
+        'end_date': end_date.isoformat(),
+        'stores': stores
+    }
@@ -0,0 +1,119 @@
+from datetime import datetime
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+from backend.models import Product, Category, ProductStatus, DEFAULT_DISCOUNT_THRESHOLD
+from backend.models import classify_expiry, calculate_discounted_price, transition_date_for, queue_discount_notifications
+
+# Product attributes the expiry classification depends on
+TRACKED_ATTRIBUTES = ('expiry_date', 'price', 'status', 'category')
+
+# Product attributes the discounted price is computed from; a change to either reprices a discounted product
+PRICING_ATTRIBUTES = ('price', 'expiry_date')
+
+def _changed(instance, *attributes):
+    """Return True if any of the attributes holds a value that differs from the database"""
+    state = inspect(instance)
+    return any(state.attrs[name].history.has_changes() for name in attributes)
+
+def _committed_status(product):
+    history = inspect(product).attrs.status.history
+    committed = history.deleted or history.unchanged
+    return committed[0] if committed else None
+
+def _thresholds(session, products):
+    """Return category name -> discount threshold, including thresholds changed in this flush"""
+    names = {product.category for product in products}
+    thresholds = dict(
+        session.query(Category.name, Category.discount_threshold).filter(Category.name.in_(names))
+    )
+    
+    # Pending categories are not in the database yet, so their values come from the session
+    for instance in list(session.new) + list(session.dirty):
+        if isinstance(instance, Category):
+            thresholds[instance.name] = instance.discount_threshold
+    return thresholds
+
+def _changed_products(session):
+    """Return the products whose expiry classification may differ from the stored one"""
+    products = [instance for instance in session.new if isinstance(instance, Product)]
+    products.extend(
+        instance for instance in session.dirty
+        if isinstance(instance, Product) and _changed(instance, *TRACKED_ATTRIBUTES)
+    )
+    
+    # A new threshold moves the discount window of every active product in the category
+    categories = [
+        instance.name for instance in session.dirty
+        if isinstance(instance, Category) and _changed(instance, 'discount_threshold')
+    ]
+    if categories:
+        seen = set(products)
+        products.extend(
+            product for product in session.query(Product).filter(
+                Product.category.in_(categories),
+                Product.status == ProductStatus.ACTIVE.value
+            )
+            if product not in seen
+        )
+    
+    return products
+
+def apply_transitions(session, products, today=None):
+    """
+    Bring status, discounted price and next transition date of products in line with their expiry date
+    
+    Args:
+        session (Session): Session the products belong to
+        products (list): Products to classify; disposed products are left alone
+        today (date): Date to classify against, defaults to today
+    
+    Returns:
+        list: Persistent products that entered their discount window
+    """
+    today = today or datetime.utcnow().date()
+    thresholds = _thresholds(session, products)
+    discounted = []
+    
+    for product in products:
+        if product.status == ProductStatus.DISPOSED.value or product.expiry_date is None:
+            continue
+        
+        # Routes may assign datetimes to the Date column
+        if isinstance(product.expiry_date, datetime):
+            product.expiry_date = product.expiry_date.date()
+        
+        discount_threshold = thresholds.get(product.category) or DEFAULT_DISCOUNT_THRESHOLD
+        days_until_expiry = (product.expiry_date - today).days
+        status, discounted_price = classify_expiry(
+            product.status or ProductStatus.ACTIVE.value, product.price, product.discounted_price,
+            days_until_expiry, discount_threshold
+        )
+        
+        # A new price or expiry date moves an existing discount with it, unless discounted_price was written too
+        if (status == ProductStatus.DISCOUNTED.value and status == product.status
+                and 0 < days_until_expiry <= discount_threshold
+                and _changed(product, *PRICING_ATTRIBUTES) and not _changed(product, 'discounted_price')):
+            discounted_price = calculate_discounted_price(product.price, days_until_expiry, discount_threshold)
+        
+        # Assigning an equal value leaves the column out of the UPDATE
+        product.status = status
+        product.discounted_price = discounted_price
+        product.next_transition_date = transition_date_for(status, product.expiry_date, discount_threshold)
+        
+        if (status == ProductStatus.DISCOUNTED.value and product.id is not None
+                and _committed_status(product) != ProductStatus.DISCOUNTED.value):
+            discounted.append(product)
+    
+    return discounted
+
+@event.listens_for(Session, 'before_flush')
+def _apply_flushed_transitions(session, flush_context, instances):
+    """Classify products whose expiry inputs changed as part of the flush that writes them"""
+    products = _changed_products(session)
+    if not products:
+        return
+    
+    # New products have no buyers yet, so only persistent ones can queue notifications
+    discounted = apply_transitions(session, products)
+    if discounted:
+        queue_discount_notifications([product.id for product in discounted])
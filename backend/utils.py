@@ -1,8 +1,14 @@
 from datetime import datetime, timedelta
-from backend.models import db, Product, Category, WasteRecord, ProductStatus, WasteType
+from backend.models import db, Product, Category, WasteRecord, WasteDailyRollup, Customer, PurchaseHistory, DiscountNotification
+from backend.models import ProductStatus, WasteType, NotificationType, NotificationStatus
+from backend.models import DEFAULT_DISCOUNT_THRESHOLD, classify_expiry, transition_date_for, dialect_insert
 import random
 import string
-from flask_mail import Message
+import csv
+import json
+from flask import current_app
+from backend.notifications import NotificationDispatcher, build_discount_message
+from backend.serialization import PRODUCT_ROWS
 
 def generate_barcode(prefix='PROD'):
     """Generate a unique barcode for a product"""
@@ -10,72 +16,661 @@ def generate_barcode(prefix='PROD'):
     random_suffix = ''.join(random.choices(string.ascii_uppercase + string.digits, k=4))
     return f"{prefix}{timestamp}{random_suffix}"
 
-def check_expiring_products():
-    """Check for products nearing expiry and update their status"""
+# Number of products classified per transaction by the expiry sweep
+SWEEP_CHUNK_SIZE = 1000
+
+def sweep_passes(today, horizon=None):
+    """
+    Return the (criteria, keyset columns) passes of the expiry sweep
+    
+    Every pass filters and orders along one index, so each chunk is a range
+    scan that starts where the previous chunk's keyset left off.
+    
+    Args:
+        today (date): Products whose next transition date is on or before it are due
+        horizon (date): For a full sweep, the end of the widest discount window
+    """
+    if horizon is None:
+        # `status || ''` keeps the planner off (status, expiry_date), whose equality match it
+        # would otherwise prefer to the keyset index and then sort every due product per chunk
+        return [(
+            [
+                Product.next_transition_date <= today,
+                (Product.status + '').in_([ProductStatus.ACTIVE.value, ProductStatus.DISCOUNTED.value])
+            ],
+            (Product.next_transition_date, Product.id)
+        )]
+    
+    # Active products beyond the widest discount window cannot change status,
+    # so the database filters them out; discounted ones are all re-examined
+    return [
+        (
+            [Product.status == ProductStatus.ACTIVE.value, Product.expiry_date <= horizon],
+            (Product.expiry_date, Product.id)
+        ),
+        (
+            [Product.status == ProductStatus.DISCOUNTED.value],
+            (Product.expiry_date, Product.id)
+        )
+    ]
+
+def sweep_statement(criteria, keyset, chunk_size=SWEEP_CHUNK_SIZE, after=None):
+    """
+    Build the SELECT for one chunk of an expiry sweep pass
+    
+    Args:
+        criteria (list): Filter criteria of the pass
+        keyset (tuple): Sort and keyset columns of the pass
+        chunk_size (int): Maximum rows per chunk
+        after (tuple): Keyset values of the previous chunk's last row
+    
+    Returns:
+        Select: (Product, discount threshold) rows in keyset order
+    """
+    if after is not None:
+        criteria = criteria + [db.tuple_(*keyset) > db.tuple_(*after)]
+    
+    return db.select(
+        Product,
+        db.func.coalesce(Category.discount_threshold, DEFAULT_DISCOUNT_THRESHOLD)
+    ).outerjoin(
+        Category, Category.name == Product.category
+    ).where(
+        *criteria
+    ).order_by(
+        *keyset
+    ).limit(chunk_size)
+
+def check_expiring_products(chunk_size=SWEEP_CHUNK_SIZE, full=False):
+    """
+    Check for products entering their discount window or expiring and update their status in batched chunks
+    
+    By default only products whose next_transition_date has arrived are read,
+    so the cost follows the number of products changing state rather than the
+    catalog size. A full sweep re-examines every discounted product and
+    every active product inside the widest discount window, and repairs stale
+    transition dates on the way.
+    """
     today = datetime.utcnow().date()
-    products = Product.query.filter(
-        Product.status == ProductStatus.ACTIVE.value
-    ).all()
+    horizon = None
+    
+    if full:
+        max_threshold = db.session.query(
+            db.func.max(db.func.coalesce(Category.discount_threshold, DEFAULT_DISCOUNT_THRESHOLD))
+        ).scalar()
+        horizon = today + timedelta(days=max(max_threshold or 0, DEFAULT_DISCOUNT_THRESHOLD))
     
     updated_products = []
     
-    for product in products:
-        old_status = product.status
-        new_status = product.check_expiry_status()
+    for criteria, keyset in sweep_passes(today, horizon):
+        after = None
         
-        if old_status != new_status:
-            updated_products.append({
-                'product': product.to_dict(),
-                'old_status': old_status,
-                'new_status': new_status
-            })
+        while True:
+            rows = db.session.execute(sweep_statement(criteria, keyset, chunk_size, after)).all()
+            
+            if not rows:
+                break
+            
+            # Taken before the loop below moves the row's next transition date
+            after = tuple(getattr(rows[-1][0], column.key) for column in keyset)
+            now = datetime.utcnow()
+            
+            for product, discount_threshold in rows:
+                days_until_expiry = (product.expiry_date - today).days
+                old_status = product.status
+                new_status, discounted_price = classify_expiry(
+                    old_status, product.price, product.discounted_price, days_until_expiry, discount_threshold
+                )
+                product.next_transition_date = transition_date_for(new_status, product.expiry_date, discount_threshold)
+                
+                if new_status == old_status:
+                    continue
+                
+                product.status = new_status
+                product.discounted_price = discounted_price
+                product.updated_at = now
+                
+                updated_products.append({
+                    'product': product.to_dict(),
+                    'old_status': old_status,
+                    'new_status': new_status
+                })
+            
+            # Rows sharing the same changed columns are flushed as one executemany; the flush also
+            # queues notifications for the products entering their discount window (see backend/transitions.py)
+            db.session.commit()
+            
+            if len(rows) < chunk_size:
+                break
     
     return updated_products
 
-def process_expired_products():
-    """Process expired products and create waste records"""
+# Number of rows validated and inserted per transaction by bulk imports
+BULK_CHUNK_SIZE = 1000
+
+def iter_csv_rows(text_stream):
+    """Yield (row_number, dict) pairs from a CSV text stream without reading it all into memory"""
+    for row_number, row in enumerate(csv.DictReader(text_stream), start=1):
+        yield row_number, row
+
+def iter_ndjson_rows(text_stream):
+    """Yield (row_number, dict) pairs from a newline-delimited JSON text stream"""
+    for row_number, line in enumerate(text_stream, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            row = ValueError(f"Invalid JSON: {str(e)}")
+        yield row_number, row
+
+def iter_txt_rows(text_stream):
+    """Yield (row_number, dict) pairs from a tab or comma separated customer list"""
+    for row_number, line in enumerate(text_stream, start=1):
+        # Try to split by tab first, then by comma if not enough fields
+        fields = line.strip().split('\t')
+        if len(fields) < 2:
+            fields = line.strip().split(',')
+        
+        if len(fields) >= 2:  # At least name and one contact method
+            yield row_number, {
+                'name': fields[0],
+                'email': fields[1],
+                'phone': fields[2] if len(fields) > 2 else ''
+            }
+
+def iter_json_array_rows(text_stream, read_size=65536):
+    """Yield (row_number, dict) pairs from a JSON array (or single object) without parsing it all at once"""
+    decoder = json.JSONDecoder()
+    buffer = ''
+    position = 0
+    row_number = 0
+    started = False
+    eof = False
+    
+    while True:
+        # Skip whitespace, the opening bracket and separators between elements
+        while position < len(buffer) and (buffer[position].isspace() or buffer[position] in ',' or
+                                           (not started and buffer[position] == '[')):
+            started = started or buffer[position] == '['
+            position += 1
+        
+        if position < len(buffer) and buffer[position] == ']':
+            return
+        
+        # Elements are objects, so a successful decode is never a truncated prefix
+        try:
+            value, end = decoder.raw_decode(buffer, position)
+        except ValueError:
+            if eof:
+                if buffer[position:].strip():
+                    yield row_number + 1, ValueError("Invalid JSON")
+                return
+            chunk = text_stream.read(read_size)
+            eof = not chunk
+            buffer = buffer[position:] + chunk
+            position = 0
+            continue
+        
+        row_number += 1
+        yield row_number, value
+        position = end
+        
+        if not started:
+            # A single top-level object rather than an array
+            return
+
+def chunked(iterable, size):
+    """Yield lists of at most `size` items from an iterable"""
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def _parse_date(value, field):
+    if not value:
+        raise ValueError(f"{field} is required")
+    try:
+        return datetime.fromisoformat(str(value).replace('Z', '+00:00')).date()
+    except ValueError:
+        raise ValueError(f"Invalid {field} format")
+
+def _parse_store_id(value):
+    if value in (None, ''):
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise ValueError("Invalid store_id")
+
+def parse_product_row(row):
+    """Validate a raw import row and convert it to a products table mapping"""
+    if isinstance(row, Exception):
+        raise row
+    if not isinstance(row, dict):
+        raise ValueError("Row must be an object")
+    
+    for field in ('name', 'category'):
+        if not row.get(field):
+            raise ValueError(f"{field} is required")
+    
+    try:
+        quantity = int(row.get('quantity') or 0)
+    except (TypeError, ValueError):
+        raise ValueError("Invalid quantity")
+    
+    try:
+        price = float(row.get('price') or 0.0)
+    except (TypeError, ValueError):
+        raise ValueError("Invalid price")
+    
+    return {
+        'name': row['name'],
+        'barcode': row.get('barcode') or None,
+        'category': row['category'],
+        'expiry_date': _parse_date(row.get('expiry_date'), 'expiry_date'),
+        'manufacture_date': _parse_date(row.get('manufacture_date'), 'manufacture_date'),
+        'quantity': quantity,
+        'unit': row.get('unit') or 'unit',
+        'price': price,
+        'location': row.get('location') or 'Unknown',
+        'store_id': _parse_store_id(row.get('store_id')),
+        'status': row.get('status') or ProductStatus.ACTIVE.value
+    }
+
+def bulk_insert_products(rows, chunk_size=BULK_CHUNK_SIZE, store_id=None):
+    """
+    Validate, classify and insert products in chunks, one transaction per chunk
+    
+    Args:
+        rows (iterable): (row_number, raw row) pairs, e.g. from iter_csv_rows
+        chunk_size (int): Number of rows per INSERT batch and commit
+        store_id (int): Store for rows that do not name one
+        
+    Returns:
+        dict: Totals per outcome and a per-row error report
+    """
     today = datetime.utcnow().date()
-    expired_products = Product.query.filter(
-        Product.status == ProductStatus.EXPIRED.value,
-        Product.expiry_date < today
-    ).all()
+    thresholds = dict(db.session.query(Category.name, Category.discount_threshold).all())
+    seen_barcodes = set()
+    
+    results = {
+        'total': 0,
+        'inserted': 0,
+        'by_status': {},
+        'errors': []
+    }
     
-    processed_records = []
-    
-    for product in expired_products:
-        # Get category information for waste type
-        category = Category.query.filter_by(name=product.category).first()
-        
-        if category:
-            waste_type = category.waste_type
-            recyclable = category.recyclable
-            
-            # Create waste record
-            waste_record = WasteRecord(
-                product_id=product.id,
-                quantity=product.quantity,
-                waste_type=waste_type,
-                recyclable=recyclable,
-                disposal_method='Recycle' if recyclable else 'Landfill',
-                disposal_date=today,
-                notes=f"Expired product disposed on {today.isoformat()}"
+    for chunk in chunked(rows, chunk_size):
+        products = []
+        row_numbers = []
+        
+        for row_number, row in chunk:
+            results['total'] += 1
+            try:
+                product = parse_product_row(row)
+            except ValueError as e:
+                results['errors'].append({'row': row_number, 'error': str(e)})
+                continue
+            
+            if product['barcode'] in seen_barcodes:
+                results['errors'].append({'row': row_number, 'error': f"Duplicate barcode {product['barcode']} in file"})
+                continue
+            
+            if product['barcode'] is None:
+                product['barcode'] = _unique_generated_barcode(seen_barcodes)
+                product['generated_barcode'] = True
+            
+            seen_barcodes.add(product['barcode'])
+            products.append(product)
+            row_numbers.append(row_number)
+        
+        # One IN (...) query per chunk finds barcodes that are already taken
+        existing = _existing_barcodes([product['barcode'] for product in products])
+        while existing:
+            retry = []
+            for product, row_number in zip(products, row_numbers):
+                if product['barcode'] not in existing:
+                    continue
+                if product.pop('generated_barcode', False):
+                    product['barcode'] = _unique_generated_barcode(seen_barcodes | existing)
+                    product['generated_barcode'] = True
+                    seen_barcodes.add(product['barcode'])
+                    retry.append(product['barcode'])
+                else:
+                    product['error'] = f"Barcode {product['barcode']} already exists"
+            existing = _existing_barcodes(retry)
+        
+        mappings = []
+        mapping_rows = []
+        for product, row_number in zip(products, row_numbers):
+            if 'error' in product:
+                results['errors'].append({'row': row_number, 'error': product['error']})
+                continue
+            product.pop('generated_barcode', None)
+            if product['store_id'] is None:
+                product['store_id'] = store_id
+            
+            # Classify the whole batch in memory instead of a commit per product
+            discount_threshold = thresholds.get(product['category']) or DEFAULT_DISCOUNT_THRESHOLD
+            product['status'], product['discounted_price'] = classify_expiry(
+                product['status'], product['price'], None,
+                (product['expiry_date'] - today).days, discount_threshold
             )
+            product['next_transition_date'] = transition_date_for(
+                product['status'], product['expiry_date'], discount_threshold
+            )
+            mappings.append(product)
+            mapping_rows.append(row_number)
+        
+        if not mappings:
+            continue
+        
+        try:
+            db.session.execute(db.insert(Product), mappings)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            results['errors'].extend(
+                {'row': row_number, 'error': str(e)} for row_number in mapping_rows
+            )
+            continue
+        
+        results['inserted'] += len(mappings)
+        for product in mappings:
+            results['by_status'][product['status']] = results['by_status'].get(product['status'], 0) + 1
+    
+    results['errors'].sort(key=lambda error: error['row'])
+    return results
+
+# Per-row import errors returned to the client; the rest are only counted
+MAX_REPORTED_ERRORS = 1000
+
+def bulk_import_customers(rows, chunk_size=BULK_CHUNK_SIZE):
+    """
+    Validate and insert customers in chunks, one transaction per chunk
+    
+    Duplicates are detected with one IN (...) query per chunk for emails and
+    one for phones. Earlier chunks are already committed by then, so repeats
+    anywhere in the file are caught without keeping every email in memory.
+    
+    Args:
+        rows (iterable): (row_number, raw row) pairs
+        chunk_size (int): Number of rows per INSERT batch and commit
+        
+    Returns:
+        dict: Totals and the first MAX_REPORTED_ERRORS row errors, in row order
+    """
+    results = {
+        'total': 0,
+        'added': 0,
+        'error_count': 0,
+        'errors': []
+    }
+    reported = []  # (row_number, message)
+    
+    def add_error(row_number, message):
+        results['error_count'] += 1
+        reported.append((row_number, message))
+    
+    def trim_errors():
+        # Duplicate checks report after validation, so a chunk's errors arrive out of row order;
+        # earlier chunks hold lower row numbers, so the sorted head is the file's first errors
+        reported.sort(key=lambda error: error[0])
+        del reported[MAX_REPORTED_ERRORS:]
+    
+    for chunk in chunked(rows, chunk_size):
+        trim_errors()
+        candidates = []
+        chunk_emails = set()
+        chunk_phones = set()
+        
+        for row_number, row in chunk:
+            results['total'] += 1
+            
+            if isinstance(row, Exception):
+                add_error(row_number, str(row))
+                continue
+            if not isinstance(row, dict):
+                add_error(row_number, "Row must be an object")
+                continue
             
-            db.session.add(waste_record)
+            name = str(row.get('name') or '').strip()
+            email = str(row.get('email') or '').strip()
+            phone = str(row.get('phone') or '').strip() or None
             
-            # Update product status
-            product.status = ProductStatus.DISPOSED.value
-            product.quantity = 0
+            # Basic validation
+            if not name:
+                add_error(row_number, "Name is required")
+                continue
+            if not email:
+                add_error(row_number, "Email is required")
+                continue
             
-            processed_records.append({
-                'product': product.to_dict(),
-                'waste_record': waste_record.to_dict()
-            })
+            if email in chunk_emails:
+                add_error(row_number, f"Email {email} is duplicated in the file")
+                continue
+            if phone and phone in chunk_phones:
+                add_error(row_number, f"Phone {phone} is duplicated in the file")
+                continue
+            
+            chunk_emails.add(email)
+            if phone:
+                chunk_phones.add(phone)
+            
+            candidates.append((row_number, {
+                'name': name,
+                'email': email,
+                'phone': phone,
+                'notification_preference': row.get('notification_preference') or NotificationType.EMAIL.value
+            }))
+        
+        existing_emails = set(email for (email,) in db.session.query(Customer.email).filter(
+            Customer.email.in_(chunk_emails)
+        )) if chunk_emails else set()
+        existing_phones = set(phone for (phone,) in db.session.query(Customer.phone).filter(
+            Customer.phone.in_(chunk_phones)
+        )) if chunk_phones else set()
+        
+        mappings = []
+        mapping_rows = []
+        for row_number, customer in candidates:
+            if customer['email'] in existing_emails:
+                add_error(row_number, f"Email {customer['email']} already exists")
+                continue
+            if customer['phone'] in existing_phones:
+                add_error(row_number, f"Phone {customer['phone']} already exists")
+                continue
+            mappings.append(customer)
+            mapping_rows.append(row_number)
+        
+        if not mappings:
+            continue
+        
+        try:
+            db.session.execute(db.insert(Customer), mappings)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            for row_number in mapping_rows:
+                add_error(row_number, str(e))
+            continue
+        
+        results['added'] += len(mappings)
+    
+    trim_errors()
+    results['errors'] = [f"Row {row_number}: {message}" for row_number, message in reported]
+    return results
+
+def _existing_barcodes(barcodes):
+    if not barcodes:
+        return set()
+    return set(barcode for (barcode,) in db.session.query(Product.barcode).filter(Product.barcode.in_(barcodes)))
+
+def _unique_generated_barcode(taken):
+    # generate_barcode is only second-resolution, so retry until it is unique within the batch
+    barcode = generate_barcode()
+    while barcode in taken:
+        barcode = generate_barcode()
+    return barcode
+
+def process_expired_products():
+    """Process expired products and create waste records"""
+    today = datetime.utcnow().date()
+    # The category's waste classification comes with each product; products in an unknown category are left expired
+    expired_products = db.session.execute(
+        db.select(Product, Category.waste_type, Category.recyclable).join(
+            Category, Category.name == Product.category
+        ).where(
+            Product.next_transition_date <= today,
+            Product.status == ProductStatus.EXPIRED.value
+        )
+    ).all()
     
+    disposed = []
+    rollup_entries = []
+    
+    for product, waste_type, recyclable in expired_products:
+        # Create waste record
+        waste_record = WasteRecord(
+            product_id=product.id,
+            store_id=product.store_id,
+            quantity=product.quantity,
+            waste_type=waste_type,
+            recyclable=recyclable,
+            disposal_method='Recycle' if recyclable else 'Landfill',
+            disposal_date=today,
+            notes=f"Expired product disposed on {today.isoformat()}"
+        )
+        
+        db.session.add(waste_record)
+        rollup_entries.append((today, product.store_id, product.category, waste_type, recyclable, product.quantity))
+        
+        # Update product status
+        product.status = ProductStatus.DISPOSED.value
+        product.next_transition_date = None
+        product.quantity = 0
+        
+        disposed.append((product, waste_record))
+    
+    record_waste_rollup(rollup_entries)
+    # One flush assigns every waste record its id before they are reported
+    db.session.flush()
+    processed_records = [
+        {'product': product.to_dict(), 'waste_record': waste_record.to_dict()}
+        for product, waste_record in disposed
+    ]
     db.session.commit()
     return processed_records
 
-def get_waste_statistics(start_date=None, end_date=None):
+def record_waste_rollup(entries):
+    """
+    Add newly written waste records to the daily rollup inside the current transaction
+    
+    Args:
+        entries (list): Tuples of (disposal_date, store_id, category, waste_type, recyclable, quantity)
+    """
+    totals = {}
+    for disposal_date, store_id, category, waste_type, recyclable, quantity in entries:
+        if isinstance(disposal_date, datetime):
+            disposal_date = disposal_date.date()
+        # Records without a store are rolled up under store 0
+        key = (disposal_date, store_id or 0, category or '', waste_type, bool(recyclable))
+        total_quantity, record_count = totals.get(key, (0, 0))
+        totals[key] = (total_quantity + (quantity or 0), record_count + 1)
+    
+    if not totals:
+        return
+    
+    rows = [
+        {
+            'disposal_date': disposal_date,
+            'store_id': store_id,
+            'category': category,
+            'waste_type': waste_type,
+            'recyclable': recyclable,
+            'total_quantity': total_quantity,
+            'record_count': record_count
+        }
+        for (disposal_date, store_id, category, waste_type, recyclable), (total_quantity, record_count) in totals.items()
+    ]
+    
+    table = WasteDailyRollup.__table__
+    statement = dialect_insert(table)
+    statement = statement.on_conflict_do_update(
+        index_elements=['disposal_date', 'store_id', 'category', 'waste_type', 'recyclable'],
+        set_={
+            'total_quantity': table.c.total_quantity + statement.excluded.total_quantity,
+            'record_count': table.c.record_count + statement.excluded.record_count
+        }
+    )
+    db.session.execute(statement, rows)
+
+def rebuild_waste_rollup():
+    """Recompute the daily waste rollup from the raw waste records"""
+    category = db.func.coalesce(Product.category, '')
+    store_id = db.func.coalesce(WasteRecord.store_id, 0)
+    grouped = db.select(
+        WasteRecord.disposal_date,
+        store_id,
+        category,
+        WasteRecord.waste_type,
+        WasteRecord.recyclable,
+        db.func.sum(WasteRecord.quantity),
+        db.func.count(WasteRecord.id)
+    ).select_from(WasteRecord).outerjoin(
+        Product, Product.id == WasteRecord.product_id
+    ).group_by(
+        WasteRecord.disposal_date, store_id, category, WasteRecord.waste_type, WasteRecord.recyclable
+    )
+    
+    db.session.execute(db.delete(WasteDailyRollup))
+    db.session.execute(db.insert(WasteDailyRollup).from_select(
+        ['disposal_date', 'store_id', 'category', 'waste_type', 'recyclable', 'total_quantity', 'record_count'],
+        grouped
+    ))
+    db.session.commit()
+
+def aggregate_waste(group_by, start_date=None, end_date=None, store_id=None):
+    """
+    Aggregate waste quantities from the daily rollup with a single GROUP BY query
+    
+    Args:
+        group_by (list): WasteDailyRollup columns to group by
+        start_date (date): Optional first disposal date to include
+        end_date (date): Optional last disposal date to include
+        store_id (int): Optional store to restrict to; all stores by default
+        
+    Returns:
+        list: Rows of (*group values, total_quantity, recyclable_quantity)
+    """
+    recyclable_quantity = db.func.sum(
+        db.case((WasteDailyRollup.recyclable, WasteDailyRollup.total_quantity), else_=0)
+    )
+    
+    query = db.session.query(
+        *group_by,
+        db.func.coalesce(db.func.sum(WasteDailyRollup.total_quantity), 0),
+        db.func.coalesce(recyclable_quantity, 0)
+    )
+    
+    if start_date:
+        query = query.filter(WasteDailyRollup.disposal_date >= start_date)
+    
+    if end_date:
+        query = query.filter(WasteDailyRollup.disposal_date <= end_date)
+    
+    if store_id is not None:
+        query = query.filter(WasteDailyRollup.store_id == store_id)
+    
+    return query.group_by(*group_by).all()
+
+def get_waste_statistics(start_date=None, end_date=None, store_id=None):
     """Get waste statistics for a given date range"""
     if not start_date:
         start_date = datetime.utcnow().date() - timedelta(days=30)
@@ -83,29 +678,25 @@ def get_waste_statistics(start_date=None, end_date=None):
         end_date = datetime.utcnow().date()
     
     try:
-        waste_records = WasteRecord.query.filter(
-            WasteRecord.disposal_date >= start_date,
-            WasteRecord.disposal_date <= end_date
-        ).all()
-        
-        # Calculate statistics with safe defaults
-        total_waste = sum(record.quantity for record in waste_records) if waste_records else 0
-        recyclable_waste = sum(record.quantity for record in waste_records if record.recyclable) if waste_records else 0
-        non_recyclable_waste = total_waste - recyclable_waste
+        rows = aggregate_waste([WasteDailyRollup.disposal_date, WasteDailyRollup.waste_type], start_date, end_date, store_id)
         
+        # Fold the per (date, type) totals; there are at most days x types rows
+        total_waste = 0
+        recyclable_waste = 0
         waste_by_type = {}
-        for record in waste_records:
-            waste_type = record.waste_type or 'Unspecified'
-            if waste_type not in waste_by_type:
-                waste_by_type[waste_type] = 0
-            waste_by_type[waste_type] += record.quantity
-        
         waste_by_date = {}
-        for record in waste_records:
-            date_str = record.disposal_date.isoformat()
-            if date_str not in waste_by_date:
-                waste_by_date[date_str] = 0
-            waste_by_date[date_str] += record.quantity
+        
+        for disposal_date, waste_type, total_quantity, recyclable_quantity in rows:
+            total_waste += total_quantity
+            recyclable_waste += recyclable_quantity
+            
+            waste_type = waste_type or 'Unspecified'
+            waste_by_type[waste_type] = waste_by_type.get(waste_type, 0) + total_quantity
+            
+            date_str = disposal_date.isoformat()
+            waste_by_date[date_str] = waste_by_date.get(date_str, 0) + total_quantity
+        
+        non_recyclable_waste = total_waste - recyclable_waste
         
         return {
             'total_waste': total_waste,
@@ -131,55 +722,113 @@ def get_waste_statistics(start_date=None, end_date=None):
             'end_date': end_date.isoformat()
         }
 
-def sort_inventory_by_fefo():
-    """Sort inventory by First-Expiry-First-Out (FEFO) principle"""
-    categories = Category.query.all()
-    sorted_inventory = {}
+def get_waste_by_category(start_date=None, end_date=None, store_id=None):
+    """Get total waste quantity per product category"""
+    rows = aggregate_waste([WasteDailyRollup.category], start_date, end_date, store_id)
+    
+    # Records whose product no longer exists are rolled up under ''
+    return [
+        {
+            'category': category,
+            'total_quantity': total_quantity
+        }
+        for category, total_quantity, recyclable_quantity in rows
+        if category
+    ]
+
+def get_waste_over_time(start_date, end_date, store_id=None):
+    """Get daily total and recyclable waste quantities, including days without waste"""
+    rows = aggregate_waste([WasteDailyRollup.disposal_date], start_date, end_date, store_id)
+    totals = {
+        disposal_date.isoformat(): (total_quantity, recyclable_quantity)
+        for disposal_date, total_quantity, recyclable_quantity in rows
+    }
     
-    for category in categories:
-        products = Product.query.filter_by(
-            category=category.name
-        ).filter(
-            Product.status.in_([ProductStatus.ACTIVE.value, ProductStatus.DISCOUNTED.value])
-        ).order_by(
-            Product.expiry_date.asc()
-        ).all()
+    waste_over_time = []
+    current_date = start_date
+    while current_date <= end_date:
+        date_str = current_date.isoformat()
+        total_quantity, recyclable_quantity = totals.get(date_str, (0, 0))
+        waste_over_time.append({
+            'date': date_str,
+            'total_quantity': total_quantity,
+            'recyclable_quantity': recyclable_quantity
+        })
+        current_date += timedelta(days=1)
+    
+    return waste_over_time
+
+def sort_inventory_by_fefo(categories=None, location=None, per_category=None, store_id=None):
+    """
+    Sort inventory by First-Expiry-First-Out (FEFO) principle with one windowed query
+    
+    Args:
+        categories (list): Optional category names to include
+        location (str): Optional location to restrict products to
+        per_category (int): Optional number of soonest-expiring products to keep per category
+        store_id (int): Optional store to restrict products to
         
-        sorted_inventory[category.name] = [product.to_dict() for product in products]
+    Returns:
+        dict: Category name -> active and discounted products, soonest expiry first
+    """
+    join_conditions = [
+        Product.category == Category.name,
+        Product.status.in_([ProductStatus.ACTIVE.value, ProductStatus.DISCOUNTED.value])
+    ]
+    if location:
+        join_conditions.append(Product.location == location)
+    if store_id is not None:
+        join_conditions.append(Product.store_id == store_id)
+    
+    # Number each category's products by expiry; the outer join keeps empty categories
+    position = db.func.row_number().over(
+        partition_by=Category.id,
+        order_by=(Product.expiry_date.asc(), Product.id.asc())
+    )
+    ranked = db.session.query(
+        Category.id.label('category_id'),
+        Category.name.label('category_name'),
+        *PRODUCT_ROWS.columns(),
+        position.label('position')
+    ).outerjoin(
+        Product, db.and_(*join_conditions)
+    )
+    
+    if categories:
+        ranked = ranked.filter(Category.name.in_(categories))
+    
+    ranked = ranked.subquery()
+    query = db.session.query(
+        ranked.c.category_name,
+        *[ranked.c[name] for name in PRODUCT_ROWS.field_names]
+    )
+    
+    if per_category:
+        query = query.filter(ranked.c.position <= per_category)
+    
+    rows = query.order_by(ranked.c.category_id, ranked.c.position).all()
+    
+    serialize = PRODUCT_ROWS.serializer()
+    sorted_inventory = {}
+    for row in rows:
+        products = sorted_inventory.setdefault(row[0], [])
+        if row[1] is not None:
+            products.append(serialize(row[1:]))
     
     return sorted_inventory
 
 def send_discount_notification(mail, notification):
     """Send discount notification to customer"""
-    from models import Customer, Product
-    
     customer = Customer.query.get(notification.customer_id)
     product = Product.query.get(notification.product_id)
     
-    if not customer or not product:
+    if not customer or not product or product.discounted_price is None:
         return False
     
-    subject = f"Discount Alert: {product.name} now at {product.discounted_price:.2f}"
-    body = f"""
-    Hello {customer.name},
-    
-    Good news! A product you've purchased before is now on discount:
-    
-    {product.name}
-    Original Price: ${product.price:.2f}
-    Discounted Price: ${product.discounted_price:.2f}
-    Expiry Date: {product.expiry_date.isoformat()}
-    
-    Hurry and grab it before it's gone!
-    
-    Thank you for shopping with us.
-    """
-    
     try:
-        msg = Message(
-            subject=subject,
-            recipients=[customer.email],
-            body=body
+        msg = build_discount_message(
+            customer.name, customer.email, product.name,
+            product.price, product.discounted_price, product.expiry_date
         )
         mail.send(msg)
         return True
@@ -188,28 +837,6 @@ def send_discount_notification(mail, notification):
         return False
 
 def process_pending_notifications(mail):
-    """Process pending discount notifications"""
-    from models import DiscountNotification, NotificationStatus
-    
-    pending_notifications = DiscountNotification.query.filter_by(
-        status=NotificationStatus.PENDING.value
-    ).all()
-    
-    results = {
-        'total': len(pending_notifications),
-        'sent': 0,
-        'failed': 0
-    }
-    
-    for notification in pending_notifications:
-        success = send_discount_notification(mail, notification)
-        
-        if success:
-            notification.status = NotificationStatus.SENT.value
-            results['sent'] += 1
-        else:
-            notification.status = NotificationStatus.FAILED.value
-            results['failed'] += 1
-    
-    db.session.commit()
-    return results
+    """Process pending discount notifications and retry failed ones that are due"""
+    dispatcher = NotificationDispatcher.from_config(mail, current_app.config)
+    return dispatcher.dispatch()
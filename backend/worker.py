@@ -0,0 +1,18 @@
+"""
+Standalone background worker
+
+Runs the scheduled jobs outside the web processes, e.g. next to gunicorn:
+
+    python -m backend.worker
+"""
+import os
+import sys
+
+# Add the project root directory to Python path
+sys.path.insert(0, os.path.abspath(os.path.dirname(os.path.dirname(__file__))))
+
+from backend.app import app
+from backend.scheduler import JobScheduler
+
+if __name__ == '__main__':
+    JobScheduler(app).run_forever()
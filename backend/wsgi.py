@@ -0,0 +1,19 @@
+"""
+WSGI entry point for production servers
+
+    APP_ENV=production gunicorn -c gunicorn.conf.py backend.wsgi:app
+
+Unlike `python app.py` this runs no debug reloader and no scheduler thread;
+run `python -m backend.worker` alongside for the background jobs.
+"""
+import os
+import sys
+
+# Add the project root directory to Python path
+sys.path.insert(0, os.path.abspath(os.path.dirname(os.path.dirname(__file__))))
+
+os.environ.setdefault('APP_ENV', 'production')
+
+from backend.app import app
+
+application = app
@@ -0,0 +1,64 @@
+"""
+Compare serial and process-pool throughput of label rendering
+
+    python benchmarks/bench_labels.py --count 2000 --workers 4
+
+The image cache is disabled so every label is rendered from scratch, as for
+a delivery of new products.
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import date, timedelta
+
+# Add the project root directory to Python path
+sys.path.insert(0, os.path.abspath(os.path.dirname(os.path.dirname(__file__))))
+
+from backend import labels
+from backend.image_cache import image_cache
+
+def make_products(count):
+    """Build label fields for `count` synthetic products"""
+    today = date.today()
+    return [
+        {
+            'id': i + 1,
+            'name': f'Benchmark Product {i + 1}',
+            'barcode': f'BENCH{i + 1:06d}',
+            'category': 'Dairy',
+            'price': 1.99 + i % 10,
+            'discounted_price': None,
+            'expiry_date': (today + timedelta(days=i % 30)).isoformat()
+        }
+        for i in range(count)
+    ]
+
+def run(products, code_type, workers):
+    """Render every label and return labels per second"""
+    started = time.perf_counter()
+    for png in labels.render_labels(products, code_type, workers):
+        pass
+    return len(products) / (time.perf_counter() - started)
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark serial vs parallel label rendering')
+    parser.add_argument('--count', type=int, default=2000, help='number of labels to render')
+    parser.add_argument('--workers', type=int, default=labels.DEFAULT_WORKERS, help='pool processes')
+    parser.add_argument('--code-type', default='barcode', choices=['barcode', 'qrcode', 'both'])
+    args = parser.parse_args()
+    
+    image_cache.directory = None
+    image_cache.max_bytes = 0
+    products = make_products(args.count)
+    
+    serial = run(products, args.code_type, 1)
+    parallel = run(products, args.code_type, args.workers)
+    
+    print(f"{args.count} {args.code_type} labels")
+    print(f"serial:              {serial:8.1f} labels/s")
+    print(f"parallel ({args.workers} procs): {parallel:8.1f} labels/s")
+    print(f"speedup:             {parallel / serial:8.2f}x")
+
+if __name__ == '__main__':
+    main()
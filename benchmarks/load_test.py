@@ -0,0 +1,283 @@
+"""
+Replay the dashboard traffic mix and time the scheduler jobs at a given data scale
+
+    python benchmarks/load_test.py --products 100000 --requests 5000 --output results.json
+    python benchmarks/load_test.py --products 100000 --compare results.json
+    python benchmarks/load_test.py --url http://localhost:5001 --requests 5000 --concurrency 8
+
+With no --url, a synthetic SQLite database is seeded at the requested scale
+with setup_database.py's generator and requests go through the Flask test client, followed by one timed run of
+each scheduler job. With --url, requests go to a running server over HTTP
+(e.g. gunicorn) against whatever data it serves, and jobs are not timed.
+Latency percentiles and throughput are written to --output as JSON.
+"""
+import argparse
+import json
+import os
+import random
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+# Add the project root directory to Python path
+ROOT_DIR = os.path.abspath(os.path.dirname(os.path.dirname(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+import setup_database
+
+# GET routes and their share of dashboard traffic, from the request counts in app.log
+TRAFFIC_MIX = [
+    ('/api/products', 616),
+    ('/api/waste-statistics', 380),
+    ('/api/categories', 278),
+    ('/api/waste-records', 190),
+    ('/api/waste-statistics/over-time', 180),
+    ('/api/waste-statistics/by-category', 180),
+    ('/api/notifications', 172),
+    ('/api/customers', 113)
+]
+
+def seed_database(path, products, customers, purchases, seed):
+    """Create the schema at `path` and fill it with setup_database.py's synthetic data generator"""
+    conn = sqlite3.connect(path)
+    try:
+        setup_database.apply_schema(conn)
+        counts = setup_database.generate_data(conn, products, customers, purchases, seed=seed)
+        
+        # The generated statuses are current as of today; pull expiry and transition dates
+        # a day earlier so the timed jobs have one day of transitions to process, like a daily run
+        conn.execute("""
+            UPDATE products SET expiry_date = date(expiry_date, '-1 day'),
+                                next_transition_date = date(next_transition_date, '-1 day')
+        """)
+        conn.commit()
+        return counts
+    finally:
+        conn.close()
+
+def percentiles(samples):
+    """Return count, mean and p50/p95/p99/max of latency samples in milliseconds"""
+    if not samples:
+        return {'count': 0}
+    
+    ordered = sorted(samples)
+    
+    def rank(p):
+        # Nearest-rank percentile
+        return ordered[min(len(ordered) - 1, max(0, int(round(p / 100.0 * len(ordered))) - 1))]
+    
+    return {
+        'count': len(ordered),
+        'mean_ms': round(sum(ordered) / len(ordered) * 1000, 3),
+        'p50_ms': round(rank(50) * 1000, 3),
+        'p95_ms': round(rank(95) * 1000, 3),
+        'p99_ms': round(rank(99) * 1000, 3),
+        'max_ms': round(ordered[-1] * 1000, 3)
+    }
+
+def make_test_client_sender(app):
+    """Return send(path) issuing requests through per-thread Flask test clients"""
+    local = threading.local()
+    
+    def send(path):
+        if not hasattr(local, 'client'):
+            local.client = app.test_client()
+        return local.client.get(path).status_code
+    
+    return send
+
+def make_http_sender(base_url):
+    """Return send(path) issuing requests to a running server"""
+    def send(path):
+        try:
+            with urllib.request.urlopen(base_url.rstrip('/') + path) as response:
+                response.read()
+                return response.status
+        except urllib.error.HTTPError as e:
+            return e.code
+    
+    return send
+
+def replay(send, total, concurrency, rng):
+    """
+    Send `total` requests drawn from TRAFFIC_MIX across `concurrency` threads
+    
+    Returns:
+        tuple: (latencies by path, overall latencies, failed (path, status) pairs, wall seconds)
+    """
+    paths = [path for path, weight in TRAFFIC_MIX]
+    weights = [weight for path, weight in TRAFFIC_MIX]
+    plan = rng.choices(paths, weights=weights, k=total)
+    
+    latencies = defaultdict(list)
+    errors = []
+    lock = threading.Lock()
+    
+    def run(path):
+        started = time.perf_counter()
+        status = send(path)
+        elapsed = time.perf_counter() - started
+        with lock:
+            latencies[path].append(elapsed)
+            if status >= 400:
+                errors.append((path, status))
+    
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(run, plan))
+    wall = time.perf_counter() - started
+    
+    overall = [sample for samples in latencies.values() for sample in samples]
+    return latencies, overall, errors, wall
+
+def time_jobs(app):
+    """Run each scheduler job once and return its duration and result"""
+    from backend import utils
+    
+    mail = app.extensions['mail']
+    mail.suppress = True
+    jobs = [
+        ('check_expiring_products', utils.check_expiring_products),
+        ('process_pending_notifications', lambda: utils.process_pending_notifications(mail)),
+        ('process_expired_products', utils.process_expired_products)
+    ]
+    
+    results = {}
+    with app.app_context():
+        for name, job in jobs:
+            started = time.perf_counter()
+            result = job()
+            results[name] = {
+                'duration_ms': round((time.perf_counter() - started) * 1000, 3),
+                # Sweeps return every changed product; only the count is worth keeping
+                'result': {'changed': len(result)} if isinstance(result, list) else result
+            }
+            print(f"{name:32} {results[name]['duration_ms']:10.1f} ms  {json.dumps(results[name]['result'], default=str)}")
+    return results
+
+def compare(current, baseline_path):
+    """Print p50/p95 changes against a previous results file"""
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    
+    print(f"\nCompared with {baseline_path} ({baseline.get('git_commit') or 'unknown commit'}):")
+    rows = [(path, stats, baseline['endpoints'].get(path)) for path, stats in current['endpoints'].items()]
+    rows.append(('overall', current['overall'], baseline.get('overall')))
+    for name, stats, before in rows:
+        if not before or not before.get('count'):
+            continue
+        changes = [
+            f"{key[:3]} {before[key]:.1f} -> {stats[key]:.1f} ms ({(stats[key] - before[key]) / before[key] * 100:+.0f}%)"
+            for key in ('p50_ms', 'p95_ms') if before.get(key)
+        ]
+        print(f"  {name:36} {'  '.join(changes)}")
+    
+    for name, job in current.get('jobs', {}).items():
+        before = baseline.get('jobs', {}).get(name)
+        if before and before['duration_ms']:
+            change = (job['duration_ms'] - before['duration_ms']) / before['duration_ms'] * 100
+            print(f"  {name:36} {before['duration_ms']:.1f} -> {job['duration_ms']:.1f} ms ({change:+.0f}%)")
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def main():
+    parser = argparse.ArgumentParser(description='Replay the dashboard traffic mix and time the scheduler jobs')
+    parser.add_argument('--products', type=int, default=10000, help='products to seed')
+    parser.add_argument('--customers', type=int, help='customers to seed (default products / 10)')
+    parser.add_argument('--purchases', type=int, help='purchase history rows to seed (default 5 x products)')
+    parser.add_argument('--requests', type=int, default=2000, help='requests to replay')
+    parser.add_argument('--concurrency', type=int, default=4, help='concurrent clients')
+    parser.add_argument('--url', help='replay against a running server instead of the test client')
+    parser.add_argument('--no-cache', action='store_true', help='disable the response cache (test client only)')
+    parser.add_argument('--skip-jobs', action='store_true', help='do not time the scheduler jobs')
+    parser.add_argument('--seed', type=int, default=42, help='random seed for data and request order')
+    parser.add_argument('--output', default='benchmark_results.json', help='JSON results file')
+    parser.add_argument('--compare', help='previous results file to compare against')
+    args = parser.parse_args()
+    
+    rng = random.Random(args.seed)
+    results = {
+        'started_at': datetime.utcnow().isoformat(),
+        'git_commit': git_commit(),
+        'config': {
+            'target': args.url or 'test_client',
+            'requests': args.requests,
+            'concurrency': args.concurrency,
+            'cache': not args.no_cache,
+            'seed': args.seed
+        }
+    }
+    path = None
+    
+    try:
+        if args.url:
+            send = make_http_sender(args.url)
+            app = None
+        else:
+            fd, path = tempfile.mkstemp(suffix='.db')
+            os.close(fd)
+            started = time.perf_counter()
+            results['config']['scale'] = seed_database(
+                path,
+                products=args.products,
+                customers=args.customers or max(1, args.products // 10),
+                purchases=args.purchases if args.purchases is not None else args.products * 5,
+                seed=args.seed
+            )
+            results['seed_seconds'] = round(time.perf_counter() - started, 3)
+            print(f"Seeded {results['config']['scale']} in {results['seed_seconds']:.1f}s")
+            
+            # The app reads DATABASE_URL when it is imported
+            os.environ['DATABASE_URL'] = f'sqlite:///{path}'
+            from backend.app import app
+            from backend.cache import response_cache
+            
+            # Measure the jobs' own work rather than the email rate limit
+            app.config['NOTIFICATION_RATE_LIMITS'] = {}
+            if args.no_cache:
+                response_cache.enabled = False
+            send = make_test_client_sender(app)
+        
+        latencies, overall, errors, wall = replay(send, args.requests, args.concurrency, rng)
+        results['endpoints'] = {route: percentiles(samples) for route, samples in sorted(latencies.items())}
+        results['overall'] = percentiles(overall)
+        results['overall']['throughput_rps'] = round(len(overall) / wall, 2)
+        results['errors'] = len(errors)
+        
+        print(f"\n{'endpoint':36}{'count':>7}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+        for name, stats in list(results['endpoints'].items()) + [('overall', results['overall'])]:
+            print(f"{name:36}{stats['count']:7}{stats['p50_ms']:10.2f}{stats['p95_ms']:10.2f}{stats['p99_ms']:10.2f}")
+        print(f"throughput: {results['overall']['throughput_rps']:.1f} req/s, errors: {len(errors)}\n")
+        
+        if app is not None and not args.skip_jobs:
+            results['jobs'] = time_jobs(app)
+        
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2, default=str)
+        print(f"\nResults written to {args.output}")
+        
+        if args.compare:
+            compare(results, args.compare)
+    finally:
+        if path:
+            for suffix in ('', '-wal', '-shm'):
+                if os.path.exists(path + suffix):
+                    os.remove(path + suffix)
+    
+    return 1 if errors else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,5 +1,14 @@
 -- Database Schema for Waste Management System
 
+-- Stores Table
+CREATE TABLE IF NOT EXISTS stores (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    code TEXT UNIQUE NOT NULL,
+    name TEXT NOT NULL,
+    address TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
 -- Products Table
 CREATE TABLE IF NOT EXISTS products (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -13,7 +22,9 @@ CREATE TABLE IF NOT EXISTS products (
     price REAL NOT NULL,
     discounted_price REAL,
     location TEXT NOT NULL,
+    store_id INTEGER REFERENCES stores (id),
     status TEXT NOT NULL DEFAULT 'active',
+    next_transition_date DATE,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
@@ -33,6 +44,7 @@ CREATE TABLE IF NOT EXISTS categories (
 CREATE TABLE IF NOT EXISTS waste_records (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
     product_id INTEGER NOT NULL,
+    store_id INTEGER REFERENCES stores (id),
     quantity INTEGER NOT NULL,
     waste_type TEXT NOT NULL,
     recyclable BOOLEAN NOT NULL,
@@ -43,6 +55,21 @@ CREATE TABLE IF NOT EXISTS waste_records (
     FOREIGN KEY (product_id) REFERENCES products (id)
 );
 
+-- Daily Waste Rollup Table
+-- Maintained incrementally whenever a waste record is written;
+-- rebuild with `python setup_database.py --rebuild-rollup`
+CREATE TABLE IF NOT EXISTS waste_daily_rollup (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    disposal_date DATE NOT NULL,
+    store_id INTEGER NOT NULL DEFAULT 0,
+    category TEXT NOT NULL DEFAULT '',
+    waste_type TEXT NOT NULL,
+    recyclable BOOLEAN NOT NULL,
+    total_quantity INTEGER NOT NULL DEFAULT 0,
+    record_count INTEGER NOT NULL DEFAULT 0,
+    CONSTRAINT uq_waste_daily_rollup_key UNIQUE (disposal_date, store_id, category, waste_type, recyclable)
+);
+
 -- Customers Table
 CREATE TABLE IF NOT EXISTS customers (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -59,6 +86,7 @@ CREATE TABLE IF NOT EXISTS purchase_history (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
     customer_id INTEGER NOT NULL,
     product_id INTEGER NOT NULL,
+    store_id INTEGER REFERENCES stores (id),
     quantity INTEGER NOT NULL,
     purchase_date DATE NOT NULL,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
@@ -74,11 +102,59 @@ CREATE TABLE IF NOT EXISTS discount_notifications (
     notification_date DATE NOT NULL,
     notification_type TEXT NOT NULL,
     status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    last_attempt_at TIMESTAMP,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     FOREIGN KEY (customer_id) REFERENCES customers (id),
     FOREIGN KEY (product_id) REFERENCES products (id)
 );
 
+-- Scheduled Jobs Table
+-- One row per background job: schedule, leader lock lease and last-run metrics
+CREATE TABLE IF NOT EXISTS scheduled_jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT UNIQUE NOT NULL,
+    interval_seconds INTEGER NOT NULL,
+    next_run_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    locked_by TEXT,
+    locked_until TIMESTAMP,
+    last_started_at TIMESTAMP,
+    last_finished_at TIMESTAMP,
+    last_success_at TIMESTAMP,
+    last_duration REAL,
+    last_error TEXT,
+    last_result TEXT,
+    run_count INTEGER NOT NULL DEFAULT 0,
+    failure_count INTEGER NOT NULL DEFAULT 0
+);
+
+-- Table Versions Table
+-- Change version per table, bumped in the transaction of every write; drives response cache keys and ETags
+CREATE TABLE IF NOT EXISTS table_versions (
+    table_name TEXT PRIMARY KEY,
+    version INTEGER NOT NULL DEFAULT 0
+);
+
+-- Secondary indexes
+-- Keep in sync with __table_args__ in backend/models.py
+CREATE INDEX IF NOT EXISTS ix_products_status_expiry ON products (status, expiry_date);
+CREATE INDEX IF NOT EXISTS ix_products_category_status_expiry ON products (category, status, expiry_date);
+CREATE INDEX IF NOT EXISTS ix_products_expiry_date ON products (expiry_date);
+CREATE INDEX IF NOT EXISTS ix_products_next_transition ON products (next_transition_date);
+CREATE INDEX IF NOT EXISTS ix_products_store_status_expiry ON products (store_id, status, expiry_date);
+CREATE INDEX IF NOT EXISTS ix_waste_records_disposal_date ON waste_records (disposal_date);
+CREATE INDEX IF NOT EXISTS ix_waste_records_product_id ON waste_records (product_id);
+CREATE INDEX IF NOT EXISTS ix_waste_records_store_disposal_date ON waste_records (store_id, disposal_date);
+CREATE INDEX IF NOT EXISTS ix_purchase_history_product_id ON purchase_history (product_id);
+CREATE INDEX IF NOT EXISTS ix_purchase_history_customer_id ON purchase_history (customer_id);
+CREATE INDEX IF NOT EXISTS ix_purchase_history_store_date ON purchase_history (store_id, purchase_date);
+CREATE INDEX IF NOT EXISTS ix_discount_notifications_customer_product_status ON discount_notifications (customer_id, product_id, status);
+CREATE INDEX IF NOT EXISTS ix_discount_notifications_status ON discount_notifications (status);
+CREATE UNIQUE INDEX IF NOT EXISTS uq_discount_notifications_pending
+    ON discount_notifications (customer_id, product_id) WHERE status = 'pending';
+
+PRAGMA user_version = 8;
+
 -- Insert default categories
 INSERT OR IGNORE INTO categories (name, description, waste_type, recyclable)
 VALUES 
@@ -8,6 +8,8 @@ import { customersApi, purchaseHistoryApi } from '../services/api';
 
 const Customers = () => {
   const [customers, setCustomers] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState(null);
   const [showAddModal, setShowAddModal] = useState(false);
@@ -46,7 +48,8 @@ const Customers = () => {
     
     try {
       const response = await customersApi.getAll();
-      setCustomers(response.data);
+      setCustomers(response.data.items);
+      setNextCursor(response.data.next_cursor);
     } catch (err) {
       console.error('Error fetching customers:', err);
       setError('Failed to load customers. Please try again.');
@@ -55,6 +58,21 @@ const Customers = () => {
     }
   };
   
+  const loadMoreCustomers = async () => {
+    setLoadingMore(true);
+    
+    try {
+      const response = await customersApi.getAll({ after: nextCursor });
+      setCustomers(prev => [...prev, ...response.data.items]);
+      setNextCursor(response.data.next_cursor);
+    } catch (err) {
+      console.error('Error fetching customers:', err);
+      toast.error('Failed to load more customers');
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+  
   const handleInputChange = (e) => {
     const { name, value } = e.target;
     setNewCustomer(prev => ({ ...prev, [name]: value }));
@@ -142,8 +160,8 @@ const Customers = () => {
     setShowHistoryModal(true);
     
     try {
-      const response = await purchaseHistoryApi.getByCustomer(customer.id);
-      setPurchaseHistory(response.data);
+      const response = await purchaseHistoryApi.getAll({ customer_id: customer.id, limit: 1000 });
+      setPurchaseHistory(response.data.items);
     } catch (err) {
       console.error('Error fetching purchase history:', err);
       toast.error('Failed to load purchase history');
@@ -349,6 +367,13 @@ const Customers = () => {
                     ))}
                   </tbody>
                 </Table>
+                {nextCursor && (
+                  <div className="text-center mt-3">
+                    <Button variant="outline-primary" onClick={loadMoreCustomers} disabled={loadingMore}>
+                      {loadingMore ? 'Loading...' : 'Load more'}
+                    </Button>
+                  </div>
+                )}
               </div>
             )}
           </Card.Body>
@@ -6,7 +6,7 @@ import {
   FaRocket, FaSatellite, FaMicrochip, FaDatabase, FaNetworkWired, FaTags, FaLink,
   FaArrowUp, FaArrowDown, FaPercent, FaServer, FaRegClock, FaSyncAlt
 } from 'react-icons/fa';
-import { productsApi, wasteRecordsApi, inventoryApi, notificationsApi } from '../services/api';
+import { wasteRecordsApi, inventoryApi, notificationsApi, subscribeToChanges } from '../services/api';
 import { toast } from 'react-toastify';
 import soundEffects from '../utils/soundEffects';
 import '../styles/animations.css';
@@ -47,40 +47,52 @@ const Dashboard = () => {
     }, 1000);
   }, []);
   
-  const fetchDashboardData = async () => {
-    setLoading(true);
+  // Refresh when the server reports a change (or poll if it refuses the stream); a burst of events triggers one refresh
+  useEffect(() => {
+    let refreshTimer = null;
+    let connected = false;
+    
+    const unsubscribe = subscribeToChanges((type) => {
+      if (type === 'ready' && !connected) {
+        connected = true;
+        return;
+      }
+      clearTimeout(refreshTimer);
+      refreshTimer = setTimeout(() => fetchDashboardData({ quiet: true }), 1000);
+    });
+    
+    return () => {
+      clearTimeout(refreshTimer);
+      unsubscribe();
+    };
+  }, []);
+  
+  const fetchDashboardData = async ({ quiet = false } = {}) => {
+    if (!quiet) {
+      setLoading(true);
+    }
     setError(null);
     
     try {
-      // Fetch products
-      const productsResponse = await productsApi.getAll();
-      const products = productsResponse.data;
-      
-      // Calculate product stats
-      const totalProducts = products.length;
-      const expiringProducts = products.filter(p => 
-        p.status === 'active' && p.days_until_expiry !== null && p.days_until_expiry <= 7 && p.days_until_expiry > 0
-      ).length;
-      const expiredProducts = products.filter(p => p.status === 'expired').length;
-      const discountedProducts = products.filter(p => p.status === 'discounted').length;
+      // Fetch product and notification counts
+      const summaryResponse = await inventoryApi.getSummary();
+      const summary = summaryResponse.data;
       
       // Fetch waste statistics
       const wasteStatsResponse = await wasteRecordsApi.getStatistics();
       
-      // Fetch pending notifications
-      const notificationsResponse = await notificationsApi.getAll({ status: 'pending' });
-      const pendingNotifications = notificationsResponse.data.length;
-      
       setStats({
-        totalProducts,
-        expiringProducts,
-        expiredProducts,
-        discountedProducts,
+        totalProducts: summary.total,
+        expiringProducts: summary.expiring,
+        expiredProducts: summary.expired,
+        discountedProducts: summary.discounted,
         wasteStats: wasteStatsResponse.data,
-        pendingNotifications
+        pendingNotifications: summary.pending_notifications
       });
       
-      soundEffects.playSuccess();
+      if (!quiet) {
+        soundEffects.playSuccess();
+      }
     } catch (err) {
       console.error('Error fetching dashboard data:', err);
       setError('Failed to load dashboard data. Please try again later.');
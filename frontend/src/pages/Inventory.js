@@ -19,6 +19,8 @@ import '../styles/scifi-theme.css';
 
 const Inventory = () => {
   const [products, setProducts] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [categories, setCategories] = useState([]);
   const [loading, setLoading] = useState(false);
   const [error, setError] = useState(null);
@@ -84,18 +86,22 @@ const Inventory = () => {
     setError(null);
     
     try {
-      const response = await productsApi.getAll(filterParams);
-      setProducts(response.data);
+      // The list arrives a page at a time; the statistics are counted over every matching product
+      const [response, summaryResponse] = await Promise.all([
+        productsApi.getAll(filterParams),
+        inventoryApi.getSummary(filterParams)
+      ]);
+      setProducts(response.data.items);
+      setNextCursor(response.data.next_cursor);
       
-      // Calculate inventory statistics
-      const stats = {
-        total: response.data.length,
-        active: response.data.filter(p => p.status === 'active').length,
-        discounted: response.data.filter(p => p.status === 'discounted').length,
-        expiring: response.data.filter(p => p.days_until_expiry !== null && p.days_until_expiry <= 7 && p.days_until_expiry > 0).length,
-        expired: response.data.filter(p => p.status === 'expired').length
-      };
-      setInventoryStats(stats);
+      const summary = summaryResponse.data;
+      setInventoryStats({
+        total: summary.total,
+        active: summary.active,
+        discounted: summary.discounted,
+        expiring: summary.expiring,
+        expired: summary.expired
+      });
       
     } catch (err) {
       console.error('Error fetching products:', err);
@@ -105,6 +111,21 @@ const Inventory = () => {
     }
   };
   
+  const loadMoreProducts = async () => {
+    setLoadingMore(true);
+    
+    try {
+      const response = await productsApi.getAll({ ...filters, after: nextCursor });
+      setProducts(prev => [...prev, ...response.data.items]);
+      setNextCursor(response.data.next_cursor);
+    } catch (err) {
+      console.error('Error fetching products:', err);
+      toast.error('Failed to load more products');
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+  
   const handleFilterChange = (e) => {
     const { name, value } = e.target;
     setFilters(prev => ({ ...prev, [name]: value }));
@@ -442,14 +463,23 @@ const Inventory = () => {
                   <p className="mt-3">Loading inventory data...</p>
                 </div>
               ) : (
-                <InventoryTable 
-                  products={products} 
-                  loading={loading}
-                  onEdit={handleEditProduct}
-                  onDelete={handleProductDelete}
-                  onViewBarcode={handleViewBarcode}
-                  categories={categories}
-                />
+                <>
+                  <InventoryTable 
+                    products={products} 
+                    loading={loading}
+                    onEdit={handleEditProduct}
+                    onDelete={handleProductDelete}
+                    onViewBarcode={handleViewBarcode}
+                    categories={categories}
+                  />
+                  {nextCursor && (
+                    <div className="text-center mt-3">
+                      <Button variant="outline-primary" onClick={loadMoreProducts} disabled={loadingMore}>
+                        {loadingMore ? 'Loading...' : 'Load more'}
+                      </Button>
+                    </div>
+                  )}
+                </>
               )}
             </Card.Body>
           </Card>
@@ -6,6 +6,8 @@ import { wasteRecordsApi, productsApi } from '../services/api';
 
 const WasteTracking = () => {
   const [wasteRecords, setWasteRecords] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [products, setProducts] = useState([]);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState(null);
@@ -38,7 +40,8 @@ const WasteTracking = () => {
     
     try {
       const response = await wasteRecordsApi.getAll(filters);
-      setWasteRecords(response.data);
+      setWasteRecords(response.data.items);
+      setNextCursor(response.data.next_cursor);
     } catch (err) {
       console.error('Error fetching waste records:', err);
       setError('Failed to load waste records. Please try again.');
@@ -47,10 +50,26 @@ const WasteTracking = () => {
     }
   };
   
+  const loadMoreWasteRecords = async () => {
+    setLoadingMore(true);
+    
+    try {
+      const response = await wasteRecordsApi.getAll({ ...filters, after: nextCursor });
+      setWasteRecords(prev => [...prev, ...response.data.items]);
+      setNextCursor(response.data.next_cursor);
+    } catch (err) {
+      console.error('Error fetching waste records:', err);
+      toast.error('Failed to load more waste records');
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+  
   const fetchProducts = async () => {
     try {
-      const response = await productsApi.getAll({ status: 'expired' });
-      setProducts(response.data);
+      // Soonest-expired first; the picker offers the largest page the API serves
+      const response = await productsApi.getAll({ status: 'expired', limit: 1000 });
+      setProducts(response.data.items);
     } catch (err) {
       console.error('Error fetching expired products:', err);
       toast.error('Failed to load expired products');
@@ -303,6 +322,13 @@ const WasteTracking = () => {
                     ))}
                   </tbody>
                 </Table>
+                {nextCursor && (
+                  <div className="text-center mt-3">
+                    <Button variant="outline-primary" onClick={loadMoreWasteRecords} disabled={loadingMore}>
+                      {loadingMore ? 'Loading...' : 'Load more'}
+                    </Button>
+                  </div>
+                )}
               </div>
             )}
           </Card.Body>
@@ -43,7 +43,7 @@ export const wasteRecordsApi = {
 
 // Customers API
 export const customersApi = {
-  getAll: () => api.get('/customers'),
+  getAll: (params = {}) => api.get('/customers', { params }),
   getById: (id) => api.get(`/customers/${id}`),
   create: (data) => api.post('/customers', data),
   update: (id, data) => api.put(`/customers/${id}`, data),
@@ -71,6 +71,7 @@ export const inventoryApi = {
   checkExpiry: () => api.post('/inventory/check-expiry'),
   processExpired: () => api.post('/inventory/process-expired'),
   getFefoInventory: () => api.get('/inventory/fefo'),
+  getSummary: (params = {}) => api.get('/inventory/summary', { params }),
 };
 
 // Notifications API
@@ -79,6 +80,36 @@ export const notificationsApi = {
   process: () => api.post('/notifications/process'),
 };
 
+// Change events pushed by /api/events; returns a function that closes the stream
+export const CHANGE_EVENT_TYPES = [
+  'ready', 'resync', 'invalidate', 'product.created', 'product.status', 'product.deleted',
+  'waste_record.created', 'notification.status',
+];
+
+// Polling interval once the server turns the stream away (it caps streams per worker and answers 503)
+export const CHANGE_POLL_INTERVAL = 30000;
+
+export const subscribeToChanges = (onChange) => {
+  if (typeof EventSource === 'undefined') {
+    return () => {};
+  }
+  let pollTimer = null;
+  const source = new EventSource(`${API_URL}/events`);
+  CHANGE_EVENT_TYPES.forEach((type) => {
+    source.addEventListener(type, (event) => onChange(type, JSON.parse(event.data || '{}')));
+  });
+  source.onerror = () => {
+    // A refused stream is closed for good; dropped streams reconnect on their own
+    if (source.readyState === EventSource.CLOSED && pollTimer === null) {
+      pollTimer = setInterval(() => onChange('resync', {}), CHANGE_POLL_INTERVAL);
+    }
+  };
+  return () => {
+    clearInterval(pollTimer);
+    source.close();
+  };
+};
+
 export default {
   products: productsApi,
   categories: categoriesApi,
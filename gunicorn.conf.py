@@ -0,0 +1,28 @@
+"""
+Gunicorn settings for production serving
+
+    APP_ENV=production gunicorn -c gunicorn.conf.py backend.wsgi:app
+    python -m backend.worker  # scheduled jobs, in a separate process
+
+Override any setting with the environment variables below or gunicorn's own flags.
+"""
+import multiprocessing
+import os
+
+bind = os.environ.get('BIND', '0.0.0.0:5001')
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 120))  # Label sheets and exports stream for a while
+keepalive = 5
+max_requests = 2000  # Recycle workers now and then to bound memory growth
+max_requests_jitter = 200
+accesslog = '-'
+# Request latency shows up in the access log as %(M)s milliseconds
+access_log_format = '%(h)s "%(r)s" %(s)s %(b)s %(M)sms'
+
+def post_worker_init(worker):
+    # Each /api/events stream holds a thread until it times out; --threads may differ from
+    # GUNICORN_THREADS, so derive the stream cap from the worker's real thread count
+    from backend.events import event_broker
+    event_broker.limit_to_threads(worker.cfg.threads)
@@ -1,31 +1,265 @@
 import sqlite3
 import os
+import sys
+import argparse
 import datetime
+import math
+import random
+import time
 
-# Ensure database directory exists
-os.makedirs('database', exist_ok=True)
+DATABASE_PATH = 'database/waste_management.db'
+# Resolved from this file so generate_data and apply_schema also work when imported from elsewhere
+SCHEMA_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'database', 'schema.sql')
 
-# Connect to the database
-conn = sqlite3.connect('database/waste_management.db')
-cursor = conn.cursor()
+# Must match SCHEMA_VERSION in backend/models.py and the user_version set by schema.sql
+SCHEMA_VERSION = 8
 
-# Drop existing tables if they exist
-cursor.executescript('''
-DROP TABLE IF EXISTS discount_notifications;
-DROP TABLE IF EXISTS purchase_history;
-DROP TABLE IF EXISTS waste_records;
-DROP TABLE IF EXISTS products;
-DROP TABLE IF EXISTS customers;
-DROP TABLE IF EXISTS categories;
-''')
+# Columns added after a table was first created: (version, table, column, definition).
+# CREATE TABLE IF NOT EXISTS leaves existing tables alone, so these are added explicitly.
+ADDED_COLUMNS = [
+    (3, 'discount_notifications', 'attempts', 'INTEGER NOT NULL DEFAULT 0'),
+    (3, 'discount_notifications', 'last_attempt_at', 'TIMESTAMP'),
+    (6, 'products', 'next_transition_date', 'DATE'),
+    (7, 'products', 'store_id', 'INTEGER REFERENCES stores (id)'),
+    (7, 'waste_records', 'store_id', 'INTEGER REFERENCES stores (id)'),
+    (7, 'purchase_history', 'store_id', 'INTEGER REFERENCES stores (id)'),
+]
 
-# Read and execute the schema SQL file
-with open('database/schema.sql', 'r') as f:
-    schema_sql = f.read()
-    conn.executescript(schema_sql)
+# Recomputes waste_daily_rollup from the raw waste records
+REBUILD_ROLLUP_SQL = '''
+DELETE FROM waste_daily_rollup;
+INSERT INTO waste_daily_rollup (disposal_date, store_id, category, waste_type, recyclable, total_quantity, record_count)
+SELECT w.disposal_date, COALESCE(w.store_id, 0), COALESCE(p.category, ''), w.waste_type, w.recyclable, SUM(w.quantity), COUNT(*)
+FROM waste_records w
+LEFT JOIN products p ON p.id = w.product_id
+GROUP BY w.disposal_date, COALESCE(w.store_id, 0), COALESCE(p.category, ''), w.waste_type, w.recyclable;
+'''
+
+# Recomputes products.next_transition_date; mirrors transition_date_for in backend/models.py
+REBUILD_TRANSITIONS_SQL = '''
+UPDATE products SET next_transition_date = CASE status
+    WHEN 'active' THEN date(expiry_date, '-' || COALESCE(
+        (SELECT discount_threshold FROM categories WHERE categories.name = products.category), 7
+    ) || ' days')
+    WHEN 'discounted' THEN expiry_date
+    WHEN 'expired' THEN date(expiry_date, '+1 day')
+END;
+'''
+
+# Queries behind the hot API routes and scheduler jobs; each one must be answered
+# from an index rather than a full table scan or a sort of every matching row
+HOT_QUERIES = [
+    ('GET /products?status', "SELECT * FROM products WHERE status = 'active'"),
+    ('GET /products?category&status',
+     "SELECT * FROM products WHERE category = 'Dairy' AND status = 'active' ORDER BY expiry_date"),
+    ('GET /products?expiry_days', "SELECT * FROM products WHERE expiry_date <= '2025-01-01'"),
+    ('GET /stores/<code>/products?status',
+     "SELECT * FROM products WHERE store_id = 1 AND status = 'active' ORDER BY expiry_date"),
+    ('process_expired_products',
+     "SELECT * FROM products WHERE next_transition_date <= '2025-01-01' AND status = 'expired'"),
+    ('GET /waste-records?start_date&end_date',
+     "SELECT * FROM waste_records WHERE disposal_date >= '2025-01-01' AND disposal_date <= '2025-02-01'"),
+    ('GET /stores/<code>/waste-records?start_date',
+     "SELECT * FROM waste_records WHERE store_id = 1 AND disposal_date >= '2025-01-01'"),
+    ('GET /waste-statistics',
+     "SELECT * FROM waste_daily_rollup WHERE disposal_date >= '2025-01-01' AND disposal_date <= '2025-02-01'"),
+    ('notify_customers', "SELECT DISTINCT customer_id FROM purchase_history WHERE product_id = 1"),
+    ('GET /purchase-history?customer_id', "SELECT * FROM purchase_history WHERE customer_id = 1"),
+    ('GET /stores/<code>/purchase-history', "SELECT * FROM purchase_history WHERE store_id = 1 ORDER BY purchase_date"),
+    ('notify_customers (pending check)',
+     "SELECT id FROM discount_notifications WHERE customer_id = 1 AND product_id = 1 AND status = 'pending'"),
+    ('process_pending_notifications', "SELECT * FROM discount_notifications WHERE status = 'pending'"),
+]
+
+# Rows copied into each store's own database by split_stores: (table, WHERE clause on the store id).
+# Categories and customers are shared by the chain, so every store gets all of them.
+STORE_TABLES = [
+    ('stores', 'id = ?'),
+    ('categories', None),
+    ('customers', None),
+    ('products', 'store_id = ?'),
+    ('waste_records', 'store_id = ?'),
+    ('purchase_history', 'store_id = ?'),
+    ('discount_notifications', 'product_id IN (SELECT id FROM main.products WHERE store_id = ?)'),
+]
+
+def get_schema_version(conn):
+    """Return the schema version recorded in the database"""
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+def get_table_columns(conn, table):
+    """Return the column names of a table, or an empty list if it does not exist"""
+    return [row[1] for row in conn.execute(f'PRAGMA table_info({table})')]
+
+def apply_schema(conn):
+    """Create any missing tables and indexes; existing tables and rows are left untouched"""
+    with open(SCHEMA_PATH, 'r') as f:
+        schema_sql = f.read()
+        conn.executescript(schema_sql)
+
+def rebuild_rollup(conn):
+    """Backfill waste_daily_rollup from waste_records"""
+    conn.executescript(REBUILD_ROLLUP_SQL)
+    conn.commit()
+
+def rebuild_transitions(conn):
+    """Backfill products.next_transition_date from status, expiry date and category threshold"""
+    conn.executescript(REBUILD_TRANSITIONS_SQL)
+    conn.commit()
+
+def migrate(conn):
+    """Bring an existing database up to SCHEMA_VERSION without dropping tables"""
+    current_version = get_schema_version(conn)
+    
+    # Add new columns before applying the schema, whose indexes may reference them
+    for version, table, column, definition in ADDED_COLUMNS:
+        if current_version >= version:
+            continue
+        columns = get_table_columns(conn, table)
+        if columns and column not in columns:
+            conn.execute(f'ALTER TABLE {table} ADD COLUMN {column} {definition}')
+    
+    # Version 7 added store_id to the rollup key; the table is derived, so it is rebuilt
+    if current_version < 7:
+        conn.execute('DROP TABLE IF EXISTS waste_daily_rollup')
+    
+    # Version 4 made pending notifications unique per customer and product
+    if current_version < 4 and get_table_columns(conn, 'discount_notifications'):
+        conn.execute('''
+            DELETE FROM discount_notifications
+            WHERE status = 'pending' AND id NOT IN (
+                SELECT MIN(id) FROM discount_notifications WHERE status = 'pending' GROUP BY customer_id, product_id
+            )
+        ''')
+    
+    apply_schema(conn)
+    
+    # Version 7 introduced stores; existing rows become the chain's first store
+    if current_version < 7 and not conn.execute('SELECT 1 FROM stores LIMIT 1').fetchone():
+        cursor = conn.execute("INSERT INTO stores (code, name) VALUES ('S001', 'Main Store')")
+        for table in ('products', 'waste_records', 'purchase_history'):
+            conn.execute(f'UPDATE {table} SET store_id = ? WHERE store_id IS NULL', (cursor.lastrowid,))
+    
+    # Version 2 introduced the daily waste rollup and version 7 re-keyed it by store
+    if current_version < 7:
+        rebuild_rollup(conn)
+    
+    # Version 6 drives the expiry sweeps from next_transition_date
+    if current_version < 6:
+        rebuild_transitions(conn)
+    
+    # Without statistics SQLite prefers any equality index, e.g. (status, expiry_date) for
+    # the incremental sweep, and sorts every matching row instead of walking the keyset index
+    conn.execute('ANALYZE')
+    
+    conn.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+    conn.commit()
+    print(f"Database migrated from schema version {current_version} to {SCHEMA_VERSION}.")
+
+def split_stores(conn, directory):
+    """
+    Copy each store's rows into <directory>/<code>.db, the layout used when STORE_DATABASE_DIR is set
+    
+    The main database is left as it is; it keeps serving the store registry and
+    the job leases. Re-running the split refreshes the store files.
+    
+    Returns:
+        dict: Store code -> products copied
+    """
+    os.makedirs(directory, exist_ok=True)
+    copied = {}
+    
+    for store_id, code in conn.execute('SELECT id, code FROM stores ORDER BY id').fetchall():
+        path = os.path.join(directory, f'{code}.db')
+        store_conn = sqlite3.connect(path)
+        apply_schema(store_conn)
+        store_conn.close()
+        
+        conn.execute('ATTACH DATABASE ? AS store', (path,))
+        try:
+            for table, where in STORE_TABLES:
+                # Columns added by migrate sit at the end of the table, so name them explicitly
+                columns = ', '.join(get_table_columns(conn, table))
+                sql = f'INSERT OR REPLACE INTO store.{table} ({columns}) SELECT {columns} FROM main.{table}'
+                if where:
+                    conn.execute(f'{sql} WHERE {where}', (store_id,))
+                else:
+                    conn.execute(sql)
+            conn.commit()
+            copied[code] = conn.execute('SELECT COUNT(*) FROM store.products').fetchone()[0]
+        finally:
+            conn.execute('DETACH DATABASE store')
+        
+        store_conn = sqlite3.connect(path)
+        try:
+            rebuild_rollup(store_conn)
+        finally:
+            store_conn.close()
+    
+    return copied
+
+def sweep_queries():
+    """Return (name, SQL) of the expiry sweep chunks, compiled from the queries backend/utils.py runs"""
+    from sqlalchemy.dialects import sqlite
+    from backend.utils import sweep_passes, sweep_statement
+    
+    day = datetime.date(2025, 1, 1)
+    queries = []
+    for name, horizon in (('check_expiring_products', None), ('check_expiring_products (full)', day)):
+        for number, (criteria, keyset) in enumerate(sweep_passes(day, horizon), start=1):
+            # A later chunk, so the keyset condition is part of the plan
+            statement = sweep_statement(criteria, keyset, after=(day, 1))
+            sql = statement.compile(dialect=sqlite.dialect(), compile_kwargs={'literal_binds': True})
+            queries.append((f'{name} pass {number}', str(sql)))
+    return queries
+
+def check_query_plans(conn):
+    """Run EXPLAIN QUERY PLAN on the hot queries and report any full table scans or sorts"""
+    failures = []
+    
+    for name, sql in HOT_QUERIES + sweep_queries():
+        plan = [row[3] for row in conn.execute(f'EXPLAIN QUERY PLAN {sql}')]
+        
+        # "SCAN <table>" without "USING ... INDEX" means SQLite reads every row, and
+        # "USE TEMP B-TREE FOR ORDER BY" that it reads every match before returning the first
+        if any(step.startswith('SCAN ') and 'INDEX' not in step for step in plan):
+            status = 'FULL SCAN'
+        elif any(step.startswith('USE TEMP B-TREE FOR') and 'ORDER BY' in step for step in plan):
+            status = 'SORT'
+        else:
+            status = 'ok'
+        print(f"{status:9} {name}: {'; '.join(plan)}")
+        
+        if status != 'ok':
+            failures.append(name)
+    
+    return failures
+
+def reset_database(conn):
+    """Drop every table and recreate the schema"""
+    cursor = conn.cursor()
+    
+    # Drop existing tables if they exist
+    cursor.executescript('''
+    DROP TABLE IF EXISTS table_versions;
+    DROP TABLE IF EXISTS scheduled_jobs;
+    DROP TABLE IF EXISTS discount_notifications;
+    DROP TABLE IF EXISTS purchase_history;
+    DROP TABLE IF EXISTS waste_daily_rollup;
+    DROP TABLE IF EXISTS waste_records;
+    DROP TABLE IF EXISTS products;
+    DROP TABLE IF EXISTS customers;
+    DROP TABLE IF EXISTS categories;
+    DROP TABLE IF EXISTS stores;
+    ''')
+    
+    # Read and execute the schema SQL file
+    apply_schema(conn)
 
 # Insert sample data for demonstration
-def insert_sample_data():
+def insert_sample_data(conn):
+    cursor = conn.cursor()
+    
     # Sample products with different expiry dates
     products = [
         ('Milk 1L', 'MILK001', 'Dairy', (datetime.date.today() + datetime.timedelta(days=7)).isoformat(), 
@@ -103,10 +337,317 @@ def insert_sample_data():
         VALUES (?, ?, ?, ?, ?)
     ''', discount_notifications)
     
+    # Everything above belongs to a single sample store
+    cursor.execute("INSERT INTO stores (code, name, address) VALUES ('S001', 'Main Dark Store', '1 Warehouse Road')")
+    cursor.executescript('''
+    UPDATE products SET store_id = 1;
+    UPDATE waste_records SET store_id = 1;
+    UPDATE purchase_history SET store_id = 1;
+    ''')
+    
     conn.commit()
 
-# Insert sample data
-insert_sample_data()
+# Synthetic data generator (--generate)
+
+# Category: (share of the assortment, shelf life range in days, price range, units)
+GENERATOR_CATEGORIES = {
+    'Dairy': (0.14, (7, 21), (0.99, 8.99), ['bottle', 'container', 'pack']),
+    'Bakery': (0.08, (2, 7), (0.99, 6.99), ['loaf', 'pack', 'piece']),
+    'Produce': (0.16, (3, 14), (0.49, 7.99), ['kg', 'bag', 'bunch']),
+    'Meat': (0.07, (3, 10), (3.99, 24.99), ['package', 'kg']),
+    'Seafood': (0.03, (1, 5), (4.99, 29.99), ['package', 'kg']),
+    'Frozen Foods': (0.07, (90, 365), (1.99, 14.99), ['box', 'bag']),
+    'Canned Goods': (0.07, (365, 1095), (0.79, 4.99), ['can', 'jar']),
+    'Dry Goods': (0.10, (180, 720), (0.99, 9.99), ['package', 'bag', 'box']),
+    'Beverages': (0.10, (90, 365), (0.79, 12.99), ['bottle', 'can', 'pack']),
+    'Snacks': (0.09, (60, 270), (0.79, 5.99), ['bag', 'bar', 'box']),
+    'Household': (0.05, (730, 1460), (1.49, 19.99), ['bottle', 'pack']),
+    'Personal Care': (0.04, (365, 1095), (1.49, 14.99), ['bottle', 'tube', 'pack'])
+}
+PRODUCT_ZIPF_EXPONENT = 0.9   # Purchase popularity by product rank
+CUSTOMER_ZIPF_EXPONENT = 0.8  # Regulars buy far more often than one-off customers
+NOTIFICATION_PREFERENCES = (['email', 'sms', 'both'], [0.6, 0.25, 0.15])
+GENERATOR_CHUNK_SIZE = 50000
+
+# Applied while loading and reverted afterwards; a crash mid-load means regenerating anyway
+LOAD_PRAGMAS = [
+    'PRAGMA journal_mode = MEMORY',
+    'PRAGMA synchronous = OFF',
+    'PRAGMA cache_size = -262144',
+    'PRAGMA temp_store = MEMORY'
+]
+SERVE_PRAGMAS = [
+    'PRAGMA journal_mode = WAL',
+    'PRAGMA synchronous = NORMAL'
+]
+
+def zipf_rank(rng, n, exponent):
+    """Draw a rank in [1, n] with probability roughly proportional to 1 / rank**exponent"""
+    # Inverse CDF of the continuous bounded power law; constant memory however large n is
+    if exponent == 1:
+        return min(n, int(math.exp(rng.random() * math.log(n + 1))))
+    u = rng.random()
+    a = 1 - exponent
+    return min(n, int(((math.pow(n + 1, a) - 1) * u + 1) ** (1 / a)))
+
+def rank_stride(n):
+    """Return a stride coprime with n, so (rank * stride) % n spreads popular ranks across ids"""
+    stride = max(1, int(n * 0.618)) | 1
+    while math.gcd(stride, n) != 1:
+        stride += 2
+    return stride
+
+def generated_discounted_price(price, days_until_expiry, discount_threshold):
+    """Mirrors calculate_discounted_price in backend/models.py"""
+    discount = round(30 + 40 * (1 - days_until_expiry / discount_threshold))
+    return round(price * (1 - discount / 100), 2)
+
+def insert_chunked(conn, sql, rows, chunk_size=GENERATOR_CHUNK_SIZE):
+    """executemany `rows` in chunks and commit once; returns the row count"""
+    total = 0
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            conn.executemany(sql, chunk)
+            total += len(chunk)
+            chunk = []
+    if chunk:
+        conn.executemany(sql, chunk)
+        total += len(chunk)
+    conn.commit()
+    return total
+
+def generate_data(conn, products, customers, purchases, history_days=180, seed=42, stores=1):
+    """
+    Fill an empty database with reproducible synthetic store data
+    
+    Products get a category-specific shelf life and a manufacture date in the
+    last `history_days` days, so status follows from expiry: products past
+    expiry are disposed with a waste record the day after, mirroring
+    process_expired_products. Products are spread round-robin over `stores`
+    stores, and their waste records and purchases carry the product's store.
+    Purchases pick products and customers from Zipf distributions. Secondary indexes are dropped for the load and
+    rebuilt from the schema afterwards.
+    
+    Args:
+        conn (sqlite3.Connection): Connection to a freshly reset database
+        products (int): Products to generate
+        customers (int): Customers to generate
+        purchases (int): Purchase history rows to generate
+        history_days (int): Days of history covered by manufacture and purchase dates
+        seed (int): Random seed; the same arguments and seed give the same data
+        stores (int): Stores to create (S001, S002, ...)
+    
+    Returns:
+        dict: Rows inserted per table
+    """
+    rng = random.Random(seed)
+    today = datetime.date.today()
+    
+    categories = {
+        name: (waste_type, recyclable, threshold if threshold is not None else 7)
+        for name, waste_type, recyclable, threshold in conn.execute(
+            'SELECT name, waste_type, recyclable, discount_threshold FROM categories'
+        )
+    }
+    category_names = [name for name in GENERATOR_CATEGORIES if name in categories]
+    category_weights = [GENERATOR_CATEGORIES[name][0] for name in category_names]
+    
+    for pragma in LOAD_PRAGMAS:
+        conn.execute(pragma)
+    
+    # Indexes are cheaper to build once over sorted data than to maintain row by row
+    indexes = [row[0] for row in conn.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'index' AND sql IS NOT NULL "
+        "AND tbl_name IN ('products', 'purchase_history', 'waste_records')"
+    )]
+    for index in indexes:
+        conn.execute(f'DROP INDEX {index}')
+    
+    conn.executemany('INSERT INTO stores (code, name) VALUES (?, ?)', [
+        (f'S{store_id:03d}', f'Dark Store {store_id}') for store_id in range(1, stores + 1)
+    ])
+    
+    def store_of(product_id):
+        return (product_id - 1) % stores + 1
+    
+    waste_records = []
+    
+    def product_rows():
+        for product_id in range(1, products + 1):
+            category = rng.choices(category_names, weights=category_weights)[0]
+            _, (shelf_min, shelf_max), (price_min, price_max), units = GENERATOR_CATEGORIES[category]
+            waste_type, recyclable, threshold = categories[category]
+            
+            manufacture_date = today - datetime.timedelta(days=rng.randint(0, history_days))
+            expiry_date = manufacture_date + datetime.timedelta(days=rng.randint(shelf_min, shelf_max))
+            days_until_expiry = (expiry_date - today).days
+            price = round(rng.uniform(price_min, price_max), 2)
+            quantity = rng.randint(5, 120)
+            discounted_price = None
+            
+            if days_until_expiry < 0:
+                status = 'disposed'
+                waste_records.append((product_id, store_of(product_id), quantity, waste_type, recyclable, 'Standard disposal',
+                                      (expiry_date + datetime.timedelta(days=1)).isoformat(), 'Expired product'))
+                quantity = 0
+            elif days_until_expiry == 0:
+                status = 'expired'
+            elif days_until_expiry <= threshold:
+                status = 'discounted'
+                discounted_price = generated_discounted_price(price, days_until_expiry, threshold)
+            else:
+                status = 'active'
+            
+            yield (f'{category} Item {product_id}', f'GEN{product_id:09d}', category, expiry_date.isoformat(),
+                   manufacture_date.isoformat(), quantity, rng.choice(units), price, discounted_price,
+                   f'{chr(65 + product_id % 12)}{product_id % 40 + 1}', store_of(product_id), status)
+            
+            # Waste records ride along with their products, one batch per product chunk
+            if len(waste_records) >= GENERATOR_CHUNK_SIZE:
+                flush_waste()
+    
+    def flush_waste():
+        conn.executemany("""
+            INSERT INTO waste_records (product_id, store_id, quantity, waste_type, recyclable, disposal_method, disposal_date, notes)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        """, waste_records)
+        counts['waste_records'] += len(waste_records)
+        waste_records.clear()
+    
+    def customer_rows():
+        preferences, preference_weights = NOTIFICATION_PREFERENCES
+        for customer_id in range(1, customers + 1):
+            yield (f'Customer {customer_id}', f'customer{customer_id}@example.com', f'+1{customer_id:010d}',
+                   rng.choices(preferences, weights=preference_weights)[0])
+    
+    def purchase_rows():
+        product_stride = rank_stride(products)
+        customer_stride = rank_stride(customers)
+        for _ in range(purchases):
+            product_id = zipf_rank(rng, products, PRODUCT_ZIPF_EXPONENT) * product_stride % products + 1
+            customer_id = zipf_rank(rng, customers, CUSTOMER_ZIPF_EXPONENT) * customer_stride % customers + 1
+            purchase_date = today - datetime.timedelta(days=rng.randint(0, history_days))
+            yield (customer_id, product_id, store_of(product_id), rng.choices((1, 2, 3, 4), weights=(70, 20, 7, 3))[0],
+                   purchase_date.isoformat())
+    
+    counts = {'stores': stores, 'products': 0, 'waste_records': 0}
+    counts['products'] = insert_chunked(conn, """
+        INSERT INTO products (name, barcode, category, expiry_date, manufacture_date, quantity, unit, price, discounted_price, location, store_id, status)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """, product_rows())
+    if waste_records:
+        flush_waste()
+    conn.commit()
+    
+    counts['customers'] = insert_chunked(conn, """
+        INSERT INTO customers (name, email, phone, notification_preference)
+        VALUES (?, ?, ?, ?)
+    """, customer_rows())
+    
+    if products and customers:
+        counts['purchase_history'] = insert_chunked(conn, """
+            INSERT INTO purchase_history (customer_id, product_id, store_id, quantity, purchase_date)
+            VALUES (?, ?, ?, ?, ?)
+        """, purchase_rows())
+    
+    # Recreate the dropped indexes, then derived data and planner statistics
+    apply_schema(conn)
+    rebuild_rollup(conn)
+    rebuild_transitions(conn)
+    conn.execute('ANALYZE')
+    
+    for pragma in SERVE_PRAGMAS:
+        conn.execute(pragma)
+    conn.commit()
+    
+    return counts
+
+def main():
+    parser = argparse.ArgumentParser(description='Set up the waste management database')
+    parser.add_argument('--migrate', action='store_true',
+                        help='create missing tables and indexes on an existing database without dropping data')
+    parser.add_argument('--check-plans', action='store_true',
+                        help='fail if a hot query falls back to a full table scan or sort')
+    parser.add_argument('--rebuild-rollup', action='store_true',
+                        help='recompute the daily waste rollup from the raw waste records')
+    parser.add_argument('--rebuild-transitions', action='store_true',
+                        help='recompute the next expiry transition date of every product')
+    parser.add_argument('--database', default=DATABASE_PATH, help='SQLite database file to set up')
+    parser.add_argument('--generate', action='store_true',
+                        help='reset the database and fill it with synthetic data at the scale below')
+    parser.add_argument('--products', type=int, default=100000, help='products to generate')
+    parser.add_argument('--customers', type=int, help='customers to generate (default products / 10)')
+    parser.add_argument('--purchases', type=int, help='purchase history rows to generate (default 5 x products)')
+    parser.add_argument('--history-days', type=int, default=180, help='days of manufacture, purchase and waste history')
+    parser.add_argument('--stores', type=int, default=1, help='stores to spread generated products over')
+    parser.add_argument('--seed', type=int, default=42, help='random seed for --generate')
+    parser.add_argument('--split-stores', metavar='DIRECTORY',
+                        help='copy each store into its own database file in DIRECTORY (for STORE_DATABASE_DIR)')
+    args = parser.parse_args()
+    
+    # Ensure database directory exists
+    os.makedirs(os.path.dirname(args.database) or '.', exist_ok=True)
+    
+    # Connect to the database
+    conn = sqlite3.connect(args.database)
+    
+    try:
+        if args.generate:
+            reset_database(conn)
+            started = time.perf_counter()
+            counts = generate_data(
+                conn,
+                products=args.products,
+                customers=args.customers if args.customers is not None else max(1, args.products // 10),
+                purchases=args.purchases if args.purchases is not None else args.products * 5,
+                history_days=args.history_days,
+                seed=args.seed,
+                stores=args.stores
+            )
+            summary = ', '.join(f'{count} {table}' for table, count in counts.items())
+            print(f"Generated {summary} in {time.perf_counter() - started:.1f}s.")
+            return 0
+        
+        if args.split_stores:
+            copied = split_stores(conn, args.split_stores)
+            for code, count in copied.items():
+                print(f"Store {code}: {count} products copied to {os.path.join(args.split_stores, code + '.db')}.")
+            return 0
+        
+        if args.migrate or args.check_plans or args.rebuild_rollup or args.rebuild_transitions:
+            if args.migrate:
+                migrate(conn)
+            
+            if args.rebuild_rollup:
+                rebuild_rollup(conn)
+                print("Daily waste rollup rebuilt.")
+            
+            if args.rebuild_transitions:
+                rebuild_transitions(conn)
+                print("Product transition dates rebuilt.")
+            
+            if args.check_plans:
+                failures = check_query_plans(conn)
+                if failures:
+                    print(f"{len(failures)} hot queries fall back to a full table scan or sort; "
+                          f"run --migrate to add missing indexes and refresh planner statistics.")
+                    return 1
+            
+            return 0
+        
+        reset_database(conn)
+        
+        # Insert sample data
+        insert_sample_data(conn)
+        rebuild_rollup(conn)
+        rebuild_transitions(conn)
+        
+        print("Database setup complete with sample data.")
+        return 0
+    finally:
+        conn.close()
 
-print("Database setup complete with sample data.")
-conn.close()
+if __name__ == '__main__':
+    sys.exit(main())
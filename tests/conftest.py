@@ -0,0 +1,113 @@
+"""
+Shared fixtures: the app runs against a throwaway SQLite database rebuilt from
+database/schema.sql for every test
+
+    python -m pytest tests
+"""
+from datetime import datetime, timedelta
+import os
+import sqlite3
+import tempfile
+import pytest
+
+# backend.app reads its settings at import time, so they are set before it is imported
+TEST_DIR = tempfile.mkdtemp(prefix='waste-management-tests-')
+TEST_DATABASE = os.path.join(TEST_DIR, 'test.db')
+os.environ['DATABASE_URL'] = f'sqlite:///{TEST_DATABASE}'
+os.environ['IMAGE_CACHE_DIR'] = os.path.join(TEST_DIR, 'image_cache')
+os.environ['SCHEDULER_IN_PROCESS'] = 'false'
+os.environ.pop('EVENT_MAX_STREAMS', None)
+
+import setup_database
+from backend.app import app as flask_app
+from backend.models import db
+from backend.cache import response_cache
+from backend.events import event_broker
+from backend.scan_index import barcode_index
+from backend import notifications
+
+def day(offset):
+    """Return today's date (as the app sees it) moved by `offset` days, in ISO format"""
+    return (datetime.utcnow().date() + timedelta(days=offset)).isoformat()
+
+@pytest.fixture
+def app(monkeypatch):
+    """The Flask app with an empty database holding only the default categories"""
+    with flask_app.app_context():
+        db.session.remove()
+        db.engine.dispose()
+    
+    conn = sqlite3.connect(TEST_DATABASE)
+    try:
+        setup_database.reset_database(conn)
+        conn.commit()
+    finally:
+        conn.close()
+    
+    # Per-process state outlives a test, so it starts empty
+    response_cache.clear()
+    barcode_index.invalidate()
+    event_broker.max_streams = None
+    
+    monkeypatch.setitem(flask_app.config, 'TESTING', True)
+    monkeypatch.setitem(flask_app.config, 'NOTIFICATION_RATE_LIMITS', {})
+    monkeypatch.setattr(flask_app.extensions['mail'], 'suppress', True)
+    monkeypatch.setattr(notifications, 'SEND_RETRY_DELAY', 0)
+    
+    yield flask_app
+    
+    with flask_app.app_context():
+        db.session.remove()
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+@pytest.fixture
+def create_product(client):
+    """Create a product through the API; expiry is given in days from today"""
+    counter = iter(range(1, 1000000))
+    
+    def create(expires_in=30, prefix='/api', **fields):
+        number = next(counter)
+        data = {
+            'name': f'Product {number}',
+            'barcode': f'TEST{number:08d}',
+            'category': 'Dairy',
+            'expiry_date': day(expires_in),
+            'manufacture_date': day(-1),
+            'quantity': 10,
+            'price': 10.0,
+            'location': 'A1'
+        }
+        data.update(fields)
+        response = client.post(f'{prefix}/products', json=data)
+        assert response.status_code == 201, response.get_json()
+        return response.get_json()
+    
+    return create
+
+@pytest.fixture
+def create_customer(client):
+    """Create a customer through the API"""
+    counter = iter(range(1, 1000000))
+    
+    def create(**fields):
+        number = next(counter)
+        data = {'name': f'Customer {number}', 'email': f'customer{number}@example.com'}
+        data.update(fields)
+        response = client.post('/api/customers', json=data)
+        assert response.status_code == 201, response.get_json()
+        return response.get_json()
+    
+    return create
+
+@pytest.fixture
+def create_store(client):
+    """Register a store through the API"""
+    def create(code):
+        response = client.post('/api/stores', json={'code': code, 'name': f'Store {code}'})
+        assert response.status_code == 201, response.get_json()
+        return response.get_json()
+    
+    return create
@@ -0,0 +1,96 @@
+"""
+A minimal SMTP server on localhost that records what the dispatcher sends
+"""
+import socketserver
+import threading
+import time
+
+class SMTPSink:
+    """
+    Accepts mail on a free local port, one thread per connection
+    
+    drop_after: hang up without a reply to QUIT after this many messages on a connection
+    reject: reply 550 to every RCPT TO
+    """
+    
+    def __init__(self, drop_after=None, reject=False):
+        self.drop_after = drop_after
+        self.reject = reject
+        self.messages = []
+        self.connections = 0
+        self.quits = 0
+        self.closed = 0
+        self._lock = threading.Lock()
+        
+        sink = self
+        
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                sink._count('connections')
+                try:
+                    sink._converse(self.rfile, self.wfile)
+                finally:
+                    sink._count('closed')
+        
+        self.server = socketserver.ThreadingTCPServer(('127.0.0.1', 0), Handler)
+        self.server.daemon_threads = True
+        self.port = self.server.server_address[1]
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+    
+    def __enter__(self):
+        self._thread.start()
+        return self
+    
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+    
+    def _count(self, name):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+    
+    def _converse(self, rfile, wfile):
+        def reply(line):
+            wfile.write(line.encode() + b'\r\n')
+        
+        reply('220 sink')
+        data = None
+        sent = 0
+        
+        for raw in rfile:
+            line = raw.decode().rstrip('\r\n')
+            
+            if data is not None:
+                if line != '.':
+                    data.append(line)
+                    continue
+                with self._lock:
+                    self.messages.append('\n'.join(data))
+                data = None
+                sent += 1
+                reply('250 ok')
+                if self.drop_after and sent >= self.drop_after:
+                    return
+                continue
+            
+            command = line[:4].upper()
+            if command == 'EHLO':
+                reply('250-sink')
+                reply('250 OK')
+            elif command == 'RCPT' and self.reject:
+                reply('550 no such user')
+            elif command == 'DATA':
+                data = []
+                reply('354 go ahead')
+            elif command == 'QUIT':
+                self._count('quits')
+                reply('221 bye')
+                return
+            else:
+                reply('250 ok')
+    
+    def wait_closed(self, timeout=2):
+        """Wait until the server side of every connection has finished"""
+        deadline = time.monotonic() + timeout
+        while self.closed < self.connections and time.monotonic() < deadline:
+            time.sleep(0.01)
@@ -0,0 +1,121 @@
+import pytest
+from backend.models import db, DiscountNotification, NotificationStatus
+from tests.conftest import day
+from tests.smtp_sink import SMTPSink
+
+@pytest.fixture
+def use_sink(app, monkeypatch):
+    """Point the mail extension at a local SMTP sink and return a function that starts one"""
+    mail = app.extensions['mail']
+    monkeypatch.setitem(app.config, 'NOTIFICATION_WORKERS', 2)
+    started = []
+    
+    def start(**options):
+        sink = SMTPSink(**options).__enter__()
+        started.append(sink)
+        monkeypatch.setattr(mail, 'server', '127.0.0.1')
+        monkeypatch.setattr(mail, 'port', sink.port)
+        monkeypatch.setattr(mail, 'use_tls', False)
+        monkeypatch.setattr(mail, 'use_ssl', False)
+        monkeypatch.setattr(mail, 'username', None)
+        monkeypatch.setattr(mail, 'password', None)
+        monkeypatch.setattr(mail, 'suppress', False)
+        return sink
+    
+    yield start
+    
+    for sink in started:
+        sink.__exit__(None, None, None)
+
+@pytest.fixture
+def queue_notifications(client, create_product, create_customer):
+    """Have `count` customers buy a product, then discount it so each of them is notified"""
+    def queue(count):
+        product = create_product(expires_in=30)
+        for _ in range(count):
+            customer = create_customer()
+            response = client.post('/api/purchase-history', json={
+                'customer_id': customer['id'],
+                'product_id': product['id']
+            })
+            assert response.status_code == 201
+        
+        response = client.put(f"/api/products/{product['id']}", json={'expiry_date': day(2)})
+        assert response.get_json()['status'] == 'discounted'
+        return product
+    
+    return queue
+
+def statuses(app):
+    with app.app_context():
+        return [
+            (row.status, row.attempts)
+            for row in db.session.query(DiscountNotification).order_by(DiscountNotification.id)
+        ]
+
+def test_pending_notifications_are_sent(app, client, use_sink, queue_notifications):
+    sink = use_sink()
+    product = queue_notifications(5)
+    
+    results = client.post('/api/notifications/process').get_json()
+    
+    assert results == {'total': 5, 'sent': 5, 'failed': 0, 'retried': 0}
+    assert len(sink.messages) == 5
+    assert all(product['name'] in message for message in sink.messages)
+    assert statuses(app) == [(NotificationStatus.SENT.value, 1)] * 5
+    
+    # Sent notifications are not picked up again
+    assert client.post('/api/notifications/process').get_json()['total'] == 0
+
+def test_each_worker_reuses_one_connection_and_closes_it(client, use_sink, queue_notifications):
+    sink = use_sink()
+    queue_notifications(6)
+    
+    client.post('/api/notifications/process')
+    sink.wait_closed()
+    
+    assert len(sink.messages) == 6
+    assert sink.connections == 2
+    assert sink.quits == 2
+    assert sink.closed == 2
+
+def test_dropped_connections_are_reopened_and_closed(app, client, use_sink, queue_notifications):
+    sink = use_sink(drop_after=2)
+    queue_notifications(8)
+    
+    results = client.post('/api/notifications/process').get_json()
+    sink.wait_closed()
+    
+    assert results['sent'] == 8
+    assert len(sink.messages) == 8
+    assert sink.connections > 2
+    assert sink.closed == sink.connections
+    assert statuses(app) == [(NotificationStatus.SENT.value, 1)] * 8
+
+def test_rejected_messages_fail_with_an_attempt_recorded(app, client, use_sink, queue_notifications):
+    sink = use_sink(reject=True)
+    queue_notifications(3)
+    
+    results = client.post('/api/notifications/process').get_json()
+    sink.wait_closed()
+    
+    assert results == {'total': 3, 'sent': 0, 'failed': 3, 'retried': 0}
+    assert sink.messages == []
+    assert sink.closed == sink.connections
+    assert statuses(app) == [(NotificationStatus.FAILED.value, 1)] * 3
+    
+    # FAILED notifications wait out the retry backoff before the next attempt
+    assert client.post('/api/notifications/process').get_json()['total'] == 0
+
+def test_failed_notifications_are_retried_once_due(app, client, use_sink, queue_notifications, monkeypatch):
+    use_sink(reject=True)
+    queue_notifications(2)
+    client.post('/api/notifications/process')
+    
+    monkeypatch.setitem(app.config, 'NOTIFICATION_RETRY_BACKOFF', 0)
+    sink = use_sink()
+    results = client.post('/api/notifications/process').get_json()
+    
+    assert results == {'total': 2, 'sent': 2, 'failed': 0, 'retried': 2}
+    assert len(sink.messages) == 2
+    assert statuses(app) == [(NotificationStatus.SENT.value, 2)] * 2
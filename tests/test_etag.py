@@ -0,0 +1,65 @@
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+from backend.models import Product
+from tests.conftest import TEST_DATABASE
+
+def test_list_responses_carry_a_strong_etag(client, create_product):
+    create_product()
+    
+    response = client.get('/api/products')
+    
+    assert response.status_code == 200
+    assert response.headers['ETag'].startswith('"')
+    assert response.headers['Cache-Control'] == 'no-cache'
+
+def test_matching_if_none_match_gets_a_304(client, create_product):
+    create_product()
+    etag = client.get('/api/products').headers['ETag']
+    
+    response = client.get('/api/products', headers={'If-None-Match': etag})
+    
+    assert response.status_code == 304
+    assert response.get_data() == b''
+    assert response.headers['ETag'] == etag
+
+def test_etag_depends_on_the_query(client, create_product):
+    create_product()
+    
+    assert client.get('/api/products').headers['ETag'] != client.get('/api/products?limit=1').headers['ETag']
+
+def test_a_write_changes_the_etag(client, create_product):
+    product = create_product(price=10.0)
+    etag = client.get('/api/products').headers['ETag']
+    
+    assert client.put(f"/api/products/{product['id']}", json={'price': 12.0}).status_code == 200
+    response = client.get('/api/products', headers={'If-None-Match': etag})
+    
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+    assert response.get_json()['items'][0]['price'] == 12.0
+
+def test_a_write_from_another_process_changes_the_etag(app, client, create_product):
+    product = create_product(price=10.0)
+    etag = client.get('/api/products').headers['ETag']
+    
+    # Another gunicorn worker or the job worker: its own engine, no shared process state
+    engine = create_engine(f'sqlite:///{TEST_DATABASE}')
+    try:
+        with Session(engine) as session:
+            session.get(Product, product['id']).price = 15.0
+            session.commit()
+    finally:
+        engine.dispose()
+    
+    response = client.get('/api/products', headers={'If-None-Match': etag})
+    
+    assert response.status_code == 200
+    assert response.get_json()['items'][0]['price'] == 15.0
+
+def test_unrelated_writes_keep_the_etag(client, create_product, create_customer):
+    create_product()
+    etag = client.get('/api/products').headers['ETag']
+    
+    create_customer()
+    
+    assert client.get('/api/products', headers={'If-None-Match': etag}).status_code == 304
@@ -0,0 +1,96 @@
+import pytest
+from backend.events import EventBroker, event_broker
+
+@pytest.fixture
+def broker(app, monkeypatch):
+    monkeypatch.setattr(event_broker, 'heartbeat', 0.05)
+    monkeypatch.setattr(event_broker, 'stream_timeout', 5)
+    yield event_broker
+    assert event_broker.stats()['open_streams'] == 0
+
+def open_stream(client, url='/api/events'):
+    response = client.get(url, buffered=False)
+    assert response.status_code == 200
+    chunks = iter(response.response)
+    assert 'event: ready' in next(chunks).decode()
+    return response, chunks
+
+def next_event(chunks):
+    """Return the next chunk that is not a keep-alive"""
+    for chunk in chunks:
+        chunk = chunk.decode()
+        if not chunk.startswith(':'):
+            return chunk
+
+def test_commits_are_streamed(client, broker, create_product):
+    response, chunks = open_stream(client)
+    try:
+        product = create_product()
+        
+        chunk = next_event(chunks)
+        assert 'event: product.created' in chunk
+        assert f'"id":{product["id"]}' in chunk
+    finally:
+        response.close()
+
+def test_store_streams_skip_other_stores(client, broker, create_store, create_product):
+    create_store('north')
+    create_store('south')
+    response, chunks = open_stream(client, '/api/stores/north/events')
+    try:
+        create_product(prefix='/api/stores/south')
+        product = create_product(prefix='/api/stores/north')
+        
+        assert f'"id":{product["id"]}' in next_event(chunks)
+    finally:
+        response.close()
+
+def test_a_full_worker_refuses_streams(client, broker, monkeypatch):
+    monkeypatch.setattr(broker, 'max_streams', 1)
+    response, chunks = open_stream(client)
+    try:
+        refused = client.get('/api/events')
+        
+        assert refused.status_code == 503
+        assert refused.headers['Retry-After'] == '30'
+        assert broker.stats()['open_streams'] == 1
+    finally:
+        response.close()
+    
+    assert broker.stats()['open_streams'] == 0
+    response, chunks = open_stream(client)
+    response.close()
+
+def test_a_stream_closed_before_its_first_chunk_frees_its_slot(client, broker, monkeypatch):
+    monkeypatch.setattr(broker, 'max_streams', 1)
+    
+    response = client.get('/api/events', buffered=False)
+    assert broker.stats()['open_streams'] == 1
+    response.close()
+    
+    assert broker.stats()['open_streams'] == 0
+
+def test_an_ended_stream_frees_its_slot(client, broker, monkeypatch):
+    monkeypatch.setattr(broker, 'stream_timeout', 0.1)
+    response, chunks = open_stream(client)
+    
+    list(chunks)
+    response.close()
+    
+    assert broker.stats()['open_streams'] == 0
+
+@pytest.mark.parametrize('configured, threads, expected', [
+    (None, 4, 2),
+    (None, 1, 0),
+    (None, 9, 4),
+    (3, 8, 3),
+    (8, 4, 3),
+    (2, 1, 0),
+])
+def test_the_stream_cap_leaves_a_thread_for_requests(configured, threads, expected):
+    broker = EventBroker()
+    broker.max_streams = configured
+    
+    broker.limit_to_threads(threads)
+    
+    assert broker.max_streams == expected
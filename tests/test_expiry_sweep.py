@@ -0,0 +1,83 @@
+from datetime import datetime, timedelta
+from backend.models import db, Product
+from backend import utils
+
+def age(product_ids, days):
+    """Move products `days` closer to expiry without running the flush hooks, as the passing of time would"""
+    db.session.execute(
+        db.update(Product).where(Product.id.in_(product_ids)).values(
+            expiry_date=db.func.date(Product.expiry_date, f'-{days} days'),
+            next_transition_date=db.func.date(Product.next_transition_date, f'-{days} days')
+        )
+    )
+    db.session.commit()
+
+def statuses():
+    return dict(db.session.query(Product.id, Product.status))
+
+def test_incremental_sweep_discounts_products_entering_their_window(app, create_product):
+    due = create_product(expires_in=10)
+    later = create_product(expires_in=60)
+    
+    with app.app_context():
+        age([due['id'], later['id']], 5)
+        updated = utils.check_expiring_products()
+        
+        assert [(item['product']['id'], item['new_status']) for item in updated] == [(due['id'], 'discounted')]
+        assert statuses() == {due['id']: 'discounted', later['id']: 'active'}
+        
+        product = db.session.get(Product, due['id'])
+        assert 0 < product.discounted_price < product.price
+        assert product.next_transition_date == product.expiry_date
+
+def test_incremental_sweep_walks_every_chunk(app, create_product):
+    products = [create_product(expires_in=10) for _ in range(7)]
+    
+    with app.app_context():
+        age([product['id'] for product in products], 5)
+        updated = utils.check_expiring_products(chunk_size=3)
+        
+        assert sorted(item['product']['id'] for item in updated) == [product['id'] for product in products]
+        assert set(statuses().values()) == {'discounted'}
+
+def test_incremental_sweep_expires_discounted_products(app, create_product):
+    product = create_product(expires_in=3)
+    assert product['status'] == 'discounted'
+    
+    with app.app_context():
+        age([product['id']], 3)
+        updated = utils.check_expiring_products()
+        
+        assert [item['new_status'] for item in updated] == ['expired']
+
+def test_full_sweep_repairs_stale_transition_dates(app, create_product):
+    product = create_product(expires_in=3)
+    
+    with app.app_context():
+        # An edit made outside the API moved the expiry date but not the transition date
+        db.session.execute(db.update(Product).where(Product.id == product['id']).values(
+            expiry_date=datetime.utcnow().date() - timedelta(days=1)
+        ))
+        db.session.commit()
+        
+        assert utils.check_expiring_products() == []
+        
+        updated = utils.check_expiring_products(full=True)
+        assert [(item['old_status'], item['new_status']) for item in updated] == [('discounted', 'expired')]
+
+def test_process_expired_products_records_waste(app, create_product):
+    expired = create_product(expires_in=0, quantity=4)
+    create_product(expires_in=30)
+    assert expired['status'] == 'expired'
+    
+    with app.app_context():
+        age([expired['id']], 1)
+        processed = utils.process_expired_products()
+        
+        assert len(processed) == 1
+        record = processed[0]['waste_record']
+        assert record['id'] is not None
+        assert (record['product_id'], record['quantity'], record['waste_type']) == (expired['id'], 4, 'Organic')
+        
+        product = db.session.get(Product, expired['id'])
+        assert (product.status, product.quantity, product.next_transition_date) == ('disposed', 0, None)
@@ -0,0 +1,103 @@
+import pytest
+from sqlalchemy.exc import IntegrityError
+from backend import models
+from backend.models import db, DiscountNotification, NotificationStatus, queue_discount_notifications
+from tests.conftest import day
+
+@pytest.fixture
+def buy(client):
+    def buy(customer, product):
+        response = client.post('/api/purchase-history', json={
+            'customer_id': customer['id'],
+            'product_id': product['id']
+        })
+        assert response.status_code == 201
+    
+    return buy
+
+def discount(client, product):
+    response = client.put(f"/api/products/{product['id']}", json={'expiry_date': day(2)})
+    assert response.get_json()['status'] == 'discounted'
+
+def pending_pairs(app):
+    with app.app_context():
+        return sorted(
+            db.session.query(DiscountNotification.customer_id, DiscountNotification.product_id)
+            .filter(DiscountNotification.status == NotificationStatus.PENDING.value)
+            .all()
+        )
+
+def test_every_buyer_is_notified_once(app, client, create_product, create_customer, buy):
+    product = create_product()
+    alice = create_customer()
+    bob = create_customer()
+    create_customer()  # Never bought it
+    buy(alice, product)
+    buy(alice, product)
+    buy(bob, product)
+    
+    discount(client, product)
+    
+    assert pending_pairs(app) == [(alice['id'], product['id']), (bob['id'], product['id'])]
+    notification = client.get('/api/notifications').get_json()['items'][0]
+    assert notification['notification_type'] == 'email'
+    assert notification['notification_date'] == day(0)
+
+def test_queueing_again_skips_pending_pairs(app, client, create_product, create_customer, buy):
+    product = create_product()
+    buy(create_customer(), product)
+    buy(create_customer(), product)
+    discount(client, product)
+    
+    with app.app_context():
+        queued = queue_discount_notifications([product['id']])
+        db.session.commit()
+    
+    assert queued == 0
+    assert len(pending_pairs(app)) == 2
+
+def test_a_new_notification_follows_a_sent_one(app, client, create_product, create_customer, buy):
+    product = create_product()
+    customer = create_customer()
+    buy(customer, product)
+    discount(client, product)
+    
+    with app.app_context():
+        db.session.query(DiscountNotification).update({'status': NotificationStatus.SENT.value})
+        queued = queue_discount_notifications([product['id']])
+        db.session.commit()
+        total = db.session.query(DiscountNotification).count()
+    
+    assert queued == 1
+    assert total == 2
+    assert pending_pairs(app) == [(customer['id'], product['id'])]
+
+def test_the_partial_index_rejects_a_second_pending_row(app, client, create_product, create_customer, buy):
+    product = create_product()
+    customer = create_customer()
+    buy(customer, product)
+    discount(client, product)
+    
+    with app.app_context():
+        db.session.add(DiscountNotification(
+            customer_id=customer['id'],
+            product_id=product['id'],
+            status=NotificationStatus.PENDING.value
+        ))
+        with pytest.raises(IntegrityError):
+            db.session.commit()
+        db.session.rollback()
+
+def test_fan_out_spans_chunks(app, create_product, create_customer, buy, monkeypatch):
+    monkeypatch.setattr(models, 'FAN_OUT_CHUNK_SIZE', 2)
+    customer = create_customer()
+    products = [create_product() for _ in range(5)]
+    for product in products:
+        buy(customer, product)
+    
+    with app.app_context():
+        queued = queue_discount_notifications([product['id'] for product in products])
+        db.session.commit()
+    
+    assert queued == 5
+    assert pending_pairs(app) == [(customer['id'], product['id']) for product in products]
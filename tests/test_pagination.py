@@ -0,0 +1,74 @@
+from backend import pagination
+
+def walk(client, url, limit, **filters):
+    """Follow next_cursor from the first page to the last and return every page's ids"""
+    pages = []
+    cursor = None
+    while True:
+        params = dict(filters, limit=limit)
+        if cursor:
+            params['after'] = cursor
+        body = client.get(url, query_string=params).get_json()
+        pages.append([item['id'] for item in body['items']])
+        cursor = body['next_cursor']
+        if cursor is None:
+            return pages
+
+def test_products_page_in_expiry_then_id_order(client, create_product):
+    # Equal expiry dates force the cursor to break ties on the id
+    ids = [create_product(expires_in=30)['id'] for _ in range(5)]
+    ids.insert(0, create_product(expires_in=20)['id'])
+    ids.append(create_product(expires_in=40)['id'])
+    
+    pages = walk(client, '/api/products', limit=3)
+    
+    assert [len(page) for page in pages] == [3, 3, 1]
+    assert [product_id for page in pages for product_id in page] == ids
+
+def test_requests_without_limit_get_the_default_page(client, create_product, monkeypatch):
+    monkeypatch.setattr(pagination, 'DEFAULT_PAGE_SIZE', 2)
+    for _ in range(3):
+        create_product()
+    
+    body = client.get('/api/products').get_json()
+    
+    assert len(body['items']) == 2
+    assert body['next_cursor'] is not None
+
+def test_limit_is_capped(client, create_product, monkeypatch):
+    monkeypatch.setattr(pagination, 'MAX_PAGE_SIZE', 2)
+    for _ in range(3):
+        create_product()
+    
+    assert len(client.get('/api/products?limit=1000').get_json()['items']) == 2
+
+def test_filters_apply_to_every_page(client, create_product):
+    dairy = [create_product(category='Dairy')['id'] for _ in range(3)]
+    create_product(category='Bakery')
+    
+    pages = walk(client, '/api/products', limit=2, category='Dairy')
+    
+    assert [product_id for page in pages for product_id in page] == dairy
+
+def test_fields_projection(client, create_product):
+    create_product(name='Milk')
+    
+    body = client.get('/api/products?fields=id,name').get_json()
+    
+    assert [set(item) for item in body['items']] == [{'id', 'name'}]
+    assert body['items'][0]['name'] == 'Milk'
+
+def test_customers_share_the_cursor_contract(client, create_customer):
+    ids = [create_customer()['id'] for _ in range(3)]
+    
+    pages = walk(client, '/api/customers', limit=2)
+    
+    assert pages == [ids[:2], ids[2:]]
+
+def test_invalid_parameters_are_rejected(client, create_product):
+    create_product()
+    
+    for query in ('limit=0', 'limit=abc', 'after=not-a-cursor', 'fields=id,secret'):
+        response = client.get(f'/api/products?{query}')
+        assert response.status_code == 400, query
+        assert 'error' in response.get_json()
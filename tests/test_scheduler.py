@@ -0,0 +1,103 @@
+from datetime import datetime, timedelta
+import pytest
+from backend.models import db, ScheduledJob
+from backend.scheduler import JobScheduler
+
+@pytest.fixture
+def ctx(app):
+    with app.app_context():
+        yield
+
+def scheduler(app, job, worker_id, interval=60):
+    scheduler = JobScheduler(app, jobs={'job': (job, interval)}, worker_id=worker_id)
+    scheduler.register_jobs()
+    return scheduler
+
+def job_row():
+    db.session.expire_all()
+    return ScheduledJob.query.filter_by(name='job').one()
+
+def test_a_due_job_runs_and_records_its_result(app, ctx):
+    a = scheduler(app, lambda app: {'done': 1}, 'a')
+    
+    assert a.run_pending() == ['job']
+    
+    row = job_row()
+    assert row.run_count == 1
+    assert row.failure_count == 0
+    assert row.locked_by is None
+    assert row.to_dict()['last_result'] == {'done': 1}
+    assert row.next_run_at == row.last_started_at + timedelta(seconds=60)
+
+def test_a_job_is_not_rerun_before_its_interval(app, ctx):
+    runs = []
+    a = scheduler(app, runs.append, 'a')
+    b = scheduler(app, runs.append, 'b')
+    
+    assert a.run_job('job')
+    assert not a.run_job('job')
+    assert not b.run_job('job')
+    assert b.run_job('job', force=True)
+    assert len(runs) == 2
+
+def test_a_held_lease_blocks_other_workers(app, ctx):
+    results = []
+    
+    def job(app):
+        # Another worker polls while this run still holds the lease
+        results.append(b.run_job('job', force=True))
+    
+    a = scheduler(app, job, 'a')
+    b = scheduler(app, lambda app: None, 'b')
+    
+    assert a.run_job('job')
+    assert results == [False]
+    assert job_row().run_count == 1
+
+def test_an_expired_lease_is_taken_over(app, ctx):
+    a = scheduler(app, lambda app: None, 'a')
+    b = scheduler(app, lambda app: None, 'b')
+    
+    # Worker a took the lease and died without releasing it
+    assert a._acquire('job', force=False)
+    assert not b._acquire('job', force=True)
+    
+    db.session.execute(db.update(ScheduledJob).values(locked_until=datetime.utcnow() - timedelta(seconds=1)))
+    db.session.commit()
+    
+    assert b.run_job('job', force=True)
+    row = job_row()
+    assert row.locked_by is None
+    assert row.run_count == 1
+
+def test_a_failing_job_releases_its_lease(app, ctx):
+    def job(app):
+        raise RuntimeError('boom')
+    
+    a = scheduler(app, job, 'a')
+    
+    assert a.run_job('job')
+    
+    row = job_row()
+    assert row.failure_count == 1
+    assert row.run_count == 1
+    assert row.last_error == 'boom'
+    assert row.last_success_at is None
+    assert row.locked_by is None
+    assert row.locked_until is None
+
+def test_configured_intervals_override_the_defaults(app, ctx, monkeypatch):
+    monkeypatch.setitem(app.config, 'SCHEDULER_INTERVALS', {'job': 5})
+    scheduler(app, lambda app: None, 'a')
+    
+    assert job_row().interval_seconds == 5
+
+def test_jobs_are_listed(app, client):
+    with app.app_context():
+        scheduler(app, lambda app: None, 'a').run_job('job')
+    
+    jobs = client.get('/api/jobs').get_json()
+    
+    assert [job['name'] for job in jobs] == ['job']
+    assert jobs[0]['running'] is False
+    assert jobs[0]['run_count'] == 1
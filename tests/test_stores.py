@@ -0,0 +1,94 @@
+import pytest
+from tests.conftest import day
+
+@pytest.fixture
+def stores(create_store, create_product):
+    """Two stores with two products each; returns {code: [product, ...]}"""
+    create_store('north')
+    create_store('south')
+    return {
+        code: [create_product(prefix=f'/api/stores/{code}') for _ in range(2)]
+        for code in ('north', 'south')
+    }
+
+def ids(items):
+    return sorted(item['id'] for item in items)
+
+def test_products_are_created_in_the_urls_store(stores):
+    assert {product['store_id'] for product in stores['north']} != {product['store_id'] for product in stores['south']}
+
+def test_lists_are_scoped_to_the_store(client, stores):
+    north = client.get('/api/stores/north/products').get_json()['items']
+    everything = client.get('/api/products').get_json()['items']
+    
+    assert ids(north) == ids(stores['north'])
+    assert len(everything) == 4
+
+def test_store_id_parameter_scopes_a_list(client, stores):
+    store_id = stores['south'][0]['store_id']
+    
+    south = client.get('/api/products', query_string={'store_id': store_id}).get_json()['items']
+    
+    assert ids(south) == ids(stores['south'])
+
+def test_unknown_store_is_a_404(client, stores):
+    assert client.get('/api/stores/west/products').status_code == 404
+
+def test_another_stores_product_is_not_found(client, stores):
+    url = f"/api/stores/north/products/{stores['south'][0]['id']}"
+    
+    assert client.get(url).status_code == 404
+    assert client.put(url, json={'price': 1.0}).status_code == 404
+    assert client.delete(url).status_code == 404
+    
+    product = client.get(f"/api/products/{stores['south'][0]['id']}").get_json()
+    assert product['price'] == 10.0
+
+def test_labels_for_another_stores_product_are_not_found(client, stores):
+    response = client.post('/api/stores/north/products/labels', json={
+        'product_ids': [stores['north'][0]['id'], stores['south'][0]['id']],
+        'format': 'zip'
+    })
+    
+    assert response.status_code == 404
+    assert str(stores['south'][0]['id']) in response.get_json()['error']
+
+def test_waste_record_for_another_stores_product_is_not_found(client, stores):
+    data = {'product_id': stores['south'][0]['id'], 'quantity': 1, 'waste_type': 'Organic'}
+    
+    assert client.post('/api/stores/north/waste-records', json=data).status_code == 404
+    assert client.post('/api/stores/south/waste-records', json=data).status_code == 201
+
+@pytest.mark.parametrize('data', [{}, {'product_id': None}, {'product_id': 'milk'}])
+def test_waste_record_needs_a_product(client, stores, data):
+    response = client.post('/api/stores/north/waste-records', json=dict(data, quantity=1))
+    
+    assert response.status_code == 400
+    assert response.get_json() == {'error': 'product_id is required'}
+
+def test_waste_records_take_their_products_store(client, stores):
+    product = stores['south'][0]
+    
+    record = client.post('/api/waste-records', json={
+        'product_id': product['id'],
+        'quantity': 1,
+        'waste_type': 'Organic'
+    }).get_json()
+    
+    assert record['store_id'] == product['store_id']
+    assert client.get('/api/stores/north/waste-records').get_json()['items'] == []
+    assert len(client.get('/api/stores/south/waste-records').get_json()['items']) == 1
+
+def test_notifications_and_summary_are_scoped(client, stores, create_customer):
+    customer = create_customer()
+    product = stores['south'][0]
+    client.post('/api/purchase-history', json={'customer_id': customer['id'], 'product_id': product['id']})
+    client.put(f"/api/products/{product['id']}", json={'expiry_date': day(2)})
+    
+    assert client.get('/api/stores/north/notifications').get_json()['items'] == []
+    assert len(client.get('/api/stores/south/notifications').get_json()['items']) == 1
+    
+    north = client.get('/api/stores/north/inventory/summary').get_json()
+    south = client.get('/api/stores/south/inventory/summary').get_json()
+    assert (north['total'], north['discounted'], north['pending_notifications']) == (2, 0, 0)
+    assert (south['total'], south['discounted'], south['pending_notifications']) == (2, 1, 1)
@@ -0,0 +1,74 @@
+from datetime import date, timedelta
+from backend.models import db, Product, calculate_discounted_price
+from tests.conftest import day
+
+def stored(app, product):
+    with app.app_context():
+        return db.session.get(Product, product['id'])
+
+def category_id(client, name):
+    return next(category['id'] for category in client.get('/api/categories').get_json() if category['name'] == name)
+
+def test_a_new_product_outside_its_window_stays_active(app, create_product):
+    product = create_product(expires_in=30)
+    
+    assert product['status'] == 'active'
+    assert product['discounted_price'] is None
+    assert stored(app, product).next_transition_date == date.fromisoformat(day(30 - 7))
+
+def test_a_new_product_inside_its_window_is_discounted(app, create_product):
+    product = create_product(expires_in=2, price=10.0)
+    
+    assert product['status'] == 'discounted'
+    assert product['discounted_price'] == calculate_discounted_price(10.0, 2, 7)
+    assert stored(app, product).next_transition_date == date.fromisoformat(day(2))
+
+def test_a_new_product_past_its_expiry_is_expired(app, create_product):
+    product = create_product(expires_in=0)
+    
+    assert product['status'] == 'expired'
+    assert stored(app, product).next_transition_date == date.fromisoformat(day(1))
+
+def test_moving_the_expiry_date_into_the_window_discounts(client, create_product):
+    product = create_product(expires_in=30, price=10.0)
+    
+    updated = client.put(f"/api/products/{product['id']}", json={'expiry_date': day(3)}).get_json()
+    
+    assert updated['status'] == 'discounted'
+    assert updated['discounted_price'] == calculate_discounted_price(10.0, 3, 7)
+
+def test_a_new_price_reprices_a_discounted_product(client, create_product):
+    product = create_product(expires_in=2, price=10.0)
+    
+    updated = client.put(f"/api/products/{product['id']}", json={'price': 20.0}).get_json()
+    
+    assert updated['status'] == 'discounted'
+    assert updated['discounted_price'] == calculate_discounted_price(20.0, 2, 7)
+
+def test_an_explicit_discounted_price_is_kept(client, create_product):
+    product = create_product(expires_in=2, price=10.0)
+    
+    updated = client.put(f"/api/products/{product['id']}", json={'price': 20.0, 'discounted_price': 15.0}).get_json()
+    
+    assert updated['discounted_price'] == 15.0
+
+def test_a_wider_category_window_discounts_active_products(app, client, create_product):
+    inside = create_product(expires_in=10, price=10.0)
+    outside = create_product(expires_in=30)
+    other = create_product(expires_in=10, category='Bakery')
+    
+    response = client.put(f"/api/categories/{category_id(client, 'Dairy')}", json={'discount_threshold': 14})
+    assert response.status_code == 200
+    
+    assert client.get(f"/api/products/{inside['id']}").get_json()['discounted_price'] == calculate_discounted_price(10.0, 10, 14)
+    assert client.get(f"/api/products/{outside['id']}").get_json()['status'] == 'active'
+    assert client.get(f"/api/products/{other['id']}").get_json()['status'] == 'active'
+    assert stored(app, outside).next_transition_date == date.fromisoformat(day(30)) - timedelta(days=14)
+
+def test_disposed_products_are_left_alone(app, client, create_product):
+    product = create_product(expires_in=2)
+    client.put(f"/api/products/{product['id']}", json={'status': 'disposed'})
+    
+    updated = client.put(f"/api/products/{product['id']}", json={'expiry_date': day(-5)}).get_json()
+    
+    assert updated['status'] == 'disposed'
@@ -0,0 +1,77 @@
+import sqlite3
+import setup_database
+from backend.models import db, WasteDailyRollup
+from tests.conftest import TEST_DATABASE, day
+
+def record_waste(client, product, quantity, waste_type='Organic', recyclable=True, disposal_date=None):
+    response = client.post('/api/waste-records', json={
+        'product_id': product['id'],
+        'quantity': quantity,
+        'waste_type': waste_type,
+        'recyclable': recyclable,
+        'disposal_method': 'Compost',
+        'disposal_date': disposal_date or day(0)
+    })
+    assert response.status_code == 201, response.get_json()
+    return response.get_json()
+
+def rollup_rows():
+    return sorted(
+        (row.disposal_date.isoformat(), row.store_id, row.category, row.waste_type, row.recyclable,
+         row.total_quantity, row.record_count)
+        for row in WasteDailyRollup.query
+    )
+
+def test_records_with_the_same_key_are_added_to_one_row(app, client, create_product):
+    milk = create_product(category='Dairy')
+    yogurt = create_product(category='Dairy')
+    bread = create_product(category='Bakery')
+    
+    record_waste(client, milk, 3)
+    record_waste(client, yogurt, 4)
+    record_waste(client, bread, 2, waste_type='Mixed', recyclable=False)
+    
+    with app.app_context():
+        assert rollup_rows() == [
+            (day(0), 0, 'Bakery', 'Mixed', False, 2, 1),
+            (day(0), 0, 'Dairy', 'Organic', True, 7, 2)
+        ]
+
+def test_incremental_rollup_matches_a_rebuild(app, client, create_product):
+    for offset, quantity in ((-2, 1), (-2, 5), (-1, 2), (0, 3)):
+        record_waste(client, create_product(), quantity, disposal_date=day(offset))
+    record_waste(client, create_product(category='Bakery'), 6, waste_type='Mixed', recyclable=False)
+    
+    with app.app_context():
+        incremental = rollup_rows()
+        db.session.remove()
+    
+    conn = sqlite3.connect(TEST_DATABASE)
+    try:
+        setup_database.rebuild_rollup(conn)
+    finally:
+        conn.close()
+    
+    with app.app_context():
+        assert rollup_rows() == incremental
+
+def test_statistics_are_served_from_the_rollup(client, create_product):
+    record_waste(client, create_product(), 3)
+    record_waste(client, create_product(), 5, waste_type='Mixed', recyclable=False, disposal_date=day(-1))
+    
+    statistics = client.get('/api/waste-statistics').get_json()
+    
+    assert statistics['total_waste'] == 8
+    assert statistics['recyclable_waste'] == 3
+    assert statistics['waste_by_type'] == {'Organic': 3, 'Mixed': 5}
+    assert statistics['waste_by_date'] == {day(0): 3, day(-1): 5}
+    
+    by_category = client.get('/api/waste-statistics/by-category').get_json()
+    assert by_category == [{'category': 'Dairy', 'total_quantity': 8}]
+
+def test_new_records_show_up_in_cached_statistics(client, create_product):
+    record_waste(client, create_product(), 3)
+    assert client.get('/api/waste-statistics').get_json()['total_waste'] == 3
+    
+    record_waste(client, create_product(), 4)
+    assert client.get('/api/waste-statistics').get_json()['total_waste'] == 7